@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+"""\
+Add up the reagents needed for a whole batch of reactions (e.g. everything
+being setup today) across every protocol, and print a single list of what to
+pull from the freezer.
+
+Usage:
+    batch_reagents.py <requests> [options]
+
+Arguments:
+    <requests>
+        A file (or "-" for stdin) with one JSON request per line, in the same
+        format as for `wetlab_server.py`, e.g.:
+
+            {"command": "golden_gate", "params": {"frags": ["bb:50:3000", "ins:20:500"], "num_reactions": 12}}
+            {"command": "ivt", "params": {"num_reactions": 4}}
+
+        Each command must be able to make a reaction table (i.e. it must have
+        a `make_reaction()` function).  Parameters that only affect the rest
+        of the protocol (e.g. "cleanup" for ivt) are ignored.
+
+Options:
+    -d --dead-volume UL     [default: 5]
+        The volume of each reagent that can't be recovered from each tube.
+
+    -t --tube-volume UL     [default: 1500]
+        The most that one tube can hold.  Reagents that need more than this are
+        split across several tubes, each with its own dead volume.
+
+    -o --output PATH
+        Save the pull list to the given path, as CSV.
+
+Reagents are combined across protocols if they have the same name (ignoring
+case and the synonyms listed in `reagent_aliases`) and the same stock
+concentration.  Master mix reagents include the extra volume that each
+protocol makes for its master mix.
+"""
+
+import json
+
+# Different protocols use different names for the same reagent.  Map each
+# (lowercase) name to the name to use in the pull list.
+reagent_aliases = {
+        'water': 'nuclease-free water',
+        'nuclease-free water': 'nuclease-free water',
+        'h2o': 'nuclease-free water',
+        'rntps': 'rNTP mix',
+        'rntp mix': 'rNTP mix',
+        'ntp mix': 'rNTP mix',
+}
+
+# Most commands' `make_reaction()` functions return just the reaction.  For the
+# others, map the command to a function that picks the reaction and any
+# warnings out of what `make_reaction()` returns.
+reaction_unpackers = {
+        # (reaction, incubation time)
+        'gibson': lambda x: (x[0], []),
+        # (reaction, incubation time, incubation temperature, warning)
+        'ivt': lambda x: (x[0], [x[3]] if x[3] else []),
+}
+
+def load_requests(f):
+    """
+    Read the requests from the given file object, either one JSON object per
+    line, or a single JSON list.
+    """
+    text = f.read()
+
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+
+    return [json.loads(x) for x in text.splitlines() if x.strip()]
+
+def make_reaction_table(request):
+    """
+    Make the reaction described by the given request, and return the volume
+    of each reagent needed for one reaction (in μL), along with the number of
+    reactions and the scale of the master mix (i.e. the number of reactions
+    including any extra, which differs between protocols).  Any warning about
+    the reaction is printed to stderr.
+    """
+    import sys
+    import inspect
+    from importlib import import_module
+    from wetlab import subcommands
+    from worklist import uL_from_volume
+
+    command = request.get('command')
+    if command not in subcommands:
+        raise ValueError(f"unknown command: {command!r}")
+
+    module = import_module(subcommands[command])
+    if not hasattr(module, 'make_reaction'):
+        raise ValueError(f"'{command}' can't make reaction tables")
+
+    params = dict(request.get('params', {}))
+    num_reactions = params.get('num_reactions')
+    if num_reactions is not None and (
+            type(num_reactions) is not int or num_reactions < 1):
+        raise ValueError(f"{command}: num_reactions must be a positive integer, not {num_reactions!r}")
+
+    if isinstance(params.get('frags'), list):
+        import golden_gate
+        params['frags'] = golden_gate.fragments_from_strs(params['frags'])
+
+    signature = inspect.signature(module.make_reaction)
+    if not any(x.kind == x.VAR_KEYWORD for x in signature.parameters.values()):
+        params = {k: v for k, v in params.items() if k in signature.parameters}
+
+    try:
+        result = module.make_reaction(**params)
+    except TypeError as err:
+        raise ValueError(f"{command}: {err}") from None
+
+    unpack = reaction_unpackers.get(command, lambda x: (x, []))
+    reaction, warnings = unpack(result)
+
+    for warning in warnings:
+        print(f"Warning: {command}: {warning}", file=sys.stderr)
+
+    table = [
+            (
+                reagent.name,
+                reagent.stock_conc_str,
+                uL_from_volume(float(reagent.volume), reagent.volume_unit),
+                bool(reagent.master_mix),
+            )
+            for reagent in reaction.reagents.values()
+    ]
+
+    # Use the number of reactions that was asked for, where possible, since 
+    # some protocols (e.g. pcr) count an extra reaction for the master mix.
+    if num_reactions is None:
+        num_reactions = reaction.num_reactions
+
+    return table, num_reactions, reaction.scale
+
+def plan_batch(requests, dead_volume_uL=5, tube_volume_uL=1500):
+    """
+    Return a pull list of every reagent needed for the given requests.
+
+    The pull list is a list of dictionaries, one for each reagent, giving the
+    reagent's name, stock concentration, the commands that use it, the volume
+    needed by the reactions themselves, the number of tubes to use, and the
+    total volume to pull (including the dead volume in each tube).
+
+    Identical requests share the same reaction table, so only one reaction is
+    made for each distinct request no matter how many times it appears.  The
+    totals are then added up with numpy.
+    """
+    import numpy as np
+
+    tables = {}
+    reagents = {}
+    index = {}
+    rows = []
+
+    for request in requests:
+        key = json.dumps(request, sort_keys=True)
+        if key not in tables:
+            tables[key] = make_reaction_table(request)
+
+        table, num_reactions, scale = tables[key]
+
+        for name, stock_conc, volume_uL, master_mix in table:
+            name = reagent_aliases.get(name.lower(), name)
+            reagent_key = name.lower(), stock_conc
+
+            if reagent_key not in reagents:
+                reagents[reagent_key] = {
+                        'reagent': name,
+                        'stock_conc': stock_conc,
+                        'commands': [],
+                }
+
+                index[reagent_key] = len(index)
+
+            commands = reagents[reagent_key]['commands']
+            if request['command'] not in commands:
+                commands.append(request['command'])
+
+            rows.append((
+                index[reagent_key],
+                volume_uL * (scale if master_mix else num_reactions),
+            ))
+
+    rows = np.array(rows, dtype=float).reshape(-1, 2)
+    needed_uL = np.bincount(
+            rows[:,0].astype(int), weights=rows[:,1], minlength=len(reagents))
+
+    usable_uL = tube_volume_uL - dead_volume_uL
+    if usable_uL <= 0:
+        raise ValueError("the dead volume must be smaller than the tube volume")
+
+    num_tubes = np.maximum(np.ceil(needed_uL / usable_uL), 1).astype(int)
+    total_uL = needed_uL + num_tubes * dead_volume_uL
+
+    pull_list = []
+
+    for reagent, needed, tubes, total in zip(reagents.values(), needed_uL, num_tubes, total_uL):
+        # Ignore reagents that are only present due to rounding errors.
+        if needed < 1e-6:
+            continue
+
+        pull_list.append({
+            **reagent,
+            'needed_uL': float(needed),
+            'tubes': int(tubes),
+            'total_uL': float(total),
+        })
+
+    return pull_list
+
+def test_plan_batch(capsys):
+    import golden_gate, gibson_assembly, ivt, pcr
+    from pytest import approx, raises
+
+    frags = ['bb:50:3000', 'ins:20:500']
+    requests = [
+        {'command': 'golden_gate', 'params': {'frags': frags, 'num_reactions': 4, 'dna_vol_uL': 5}},
+        {'command': 'golden_gate', 'params': {'frags': frags, 'num_reactions': 8, 'dna_vol_uL': 5}},
+        {'command': 'ivt', 'params': {'num_reactions': 3, 'cleanup': 'none'}},
+        {'command': 'pcr', 'params': {
+            'template': 'p1', 'fwd_primer': 'o1', 'rev_primer': 'o2',
+            'num_reactions': 10,
+        }},
+        {'command': 'gibson', 'params': {'frags': ['vec:50:3000', 'frag:20:500'], 'num_reactions': 2}},
+    ]
+    pull_list = plan_batch(requests, dead_volume_uL=5, tube_volume_uL=100)
+
+    # None of these reactions have any warnings.
+    assert capsys.readouterr().err == ''
+    reagents = {x['reagent']: x for x in pull_list}
+
+    # Water is shared by all three protocols, under different names.
+    gg = golden_gate.make_reaction(golden_gate.fragments_from_strs(frags), 12, dna_vol_uL=5)
+    rxn = ivt.make_reaction(3)[0]
+    pcr_rxn = pcr.make_reaction('p1', 'o1', 'o2', 10)
+    gibson, _ = gibson_assembly.make_reaction(
+            golden_gate.fragments_from_strs(['vec:50:3000', 'frag:20:500']), 2)
+
+    water = reagents['nuclease-free water']
+    assert water['commands'] == ['golden_gate', 'ivt', 'pcr', 'gibson']
+    assert water['needed_uL'] == approx(
+            gg['Water'].volume * gg.scale +
+            rxn['nuclease-free water'].volume * rxn.scale +
+            pcr_rxn['water'].volume * pcr_rxn.scale +
+            gibson['Water'].volume * gibson.scale
+    )
+
+    mm = reagents['Gibson master mix (NEB E2611)']
+    assert mm['needed_uL'] == approx(5 * gibson.scale)
+    assert reagents['vec']['needed_uL'] == approx(gibson['vec'].volume * 2)
+
+    # Reagents that aren't in the master mix don't get any extra.
+    assert reagents['bb']['needed_uL'] == approx(gg['bb'].volume * 12)
+    assert reagents['T4 ligase buffer']['needed_uL'] == approx(gg.scale)
+
+    # Each tube has its own dead volume.
+    for reagent in pull_list:
+        assert reagent['tubes'] == -(-reagent['needed_uL'] // 95)
+        assert reagent['total_uL'] == approx(
+                reagent['needed_uL'] + 5 * reagent['tubes'])
+
+    assert reagents['nuclease-free water']['tubes'] > 1
+
+    with raises(ValueError, match='xxx'):
+        plan_batch([{'command': 'xxx'}])
+    with raises(ValueError):
+        plan_batch([{'command': 'which_gel_tray'}])
+    with raises(ValueError, match='positive integer'):
+        plan_batch([{'command': 'ivt', 'params': {'num_reactions': '4'}}])
+    with raises(ValueError, match='golden_gate: .*frags'):
+        plan_batch([{'command': 'golden_gate', 'params': {'num_reactions': 2}}])
+
+    plan_batch([{'command': 'ivt', 'params': {
+        'num_reactions': 1, 'dna_ng_uL': 50, 'dna_ng': 100000,
+    }}])
+    assert capsys.readouterr().err.startswith('Warning: ivt: Cannot reach')
+
+
+def main(argv=None):
+    import sys
+    import docopt
+    from tabulate import tabulate
+
+    args = docopt.docopt(__doc__, argv=argv)
+    path = args['<requests>']
+
+    try:
+        with (sys.stdin if path == '-' else open(path)) as f:
+            requests = load_requests(f)
+
+        pull_list = plan_batch(
+                requests,
+                dead_volume_uL=float(args['--dead-volume']),
+                tube_volume_uL=float(args['--tube-volume']),
+        )
+    except ValueError as err:
+        raise SystemExit(f"Error: {err}")
+
+    if args['--output']:
+        import csv
+        with open(args['--output'], 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'reagent', 'stock_conc', 'commands',
+                'needed_uL', 'tubes', 'total_uL',
+            ])
+            for x in pull_list:
+                writer.writerow([
+                    x['reagent'], x['stock_conc'], ','.join(x['commands']),
+                    f"{x['needed_uL']:.2f}", x['tubes'], f"{x['total_uL']:.2f}",
+                ])
+
+    print(tabulate(
+        [
+            [
+                x['reagent'], x['stock_conc'], ', '.join(x['commands']),
+                x['needed_uL'], x['tubes'], x['total_uL'],
+            ]
+            for x in pull_list
+        ],
+        headers=['Reagent', 'Conc', 'Used by', 'Needed (μL)', 'Tubes', 'Pull (μL)'],
+        floatfmt='.1f',
+    ))
+
+if __name__ == '__main__':
+    main()
@@ -16,25 +16,28 @@ Options:
         Include the recipe for TBE.
 """
 
-import docopt
 import dirty_water
 from nonstdlib import plural, round_up
 
-args = docopt.docopt(__doc__)
-protocol = dirty_water.Protocol()
-M = eval(args['<num>']) if args['<num>'] else 1
-N = round_up(M * 7/10, 0.1)
-gels = f"{plural(M):gel/s}"
-
-if args['--buffer']:
-    protocol += f"""\
+def make_protocol(num_gels=1, buffer=False):
+    """
+    Return a protocol for casting and running the given number of TBE/urea 
+    gels.
+    """
+    protocol = dirty_water.Protocol()
+    M = num_gels
+    N = round_up(M * 7/10, 0.1)
+    gels = f"{plural(M):gel/s}"
+
+    if buffer:
+        protocol += f"""\
 Prepare 1L 5x TBE:
 
 - 54 g Tris base
 - 27.5 g boric acid
 - 20 mL 0.5 M EDTA (pH=8.0)"""
 
-protocol += f"""\
+    protocol += f"""\
 Cast {M} 8% TBE/urea polyacrylamide {gels}.
 
 - Setup the gel cast and check for leaks.
@@ -59,7 +62,7 @@ Cast {M} 8% TBE/urea polyacrylamide {gels}.
   wet paper towel and store at 4°C overnight to 
   use the next day."""
 
-protocol += """\
+    protocol += """\
 Load and run the {gels}.
 
 - Mix 2 μL of RNA with 2 μL of loading dye.
@@ -73,5 +76,16 @@ Load and run the {gels}.
   
 - Soak in 3x GelRed for ~15 min to stain."""
 
-if __name__ == '__main__':
+    return protocol
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    protocol = make_protocol(
+            num_gels=eval(args['<num>']) if args['<num>'] else 1,
+            buffer=args['--buffer'],
+    )
     print(protocol)
+
+if __name__ == '__main__':
+    main()
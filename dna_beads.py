@@ -14,15 +14,18 @@ Options:
         The eluant to use, e.g. EB or water.
 """
 
-import docopt
 import stepwise
 
-args = docopt.docopt(__doc__)
-elute_vol = f"{args['--volume']} µL" if args['--volume'] else 'any volume'
+def make_protocol(volume_uL=None, eluant='EB'):
+    """
+    Return a `stepwise.Protocol` for purifying DNA with magnetic beads.  If no 
+    elution volume is given, it is left unspecified.
+    """
+    elute_vol = f"{volume_uL} µL" if volume_uL else 'any volume'
 
-protocol = stepwise.Protocol()
+    protocol = stepwise.Protocol()
 
-protocol += f"""\
+    protocol += f"""\
 Purify DNA using magnetic beads [1].
 
 - Gently resuspend the bead solution [2].
@@ -34,21 +37,21 @@ Purify DNA using magnetic beads [1].
   - Incubate 30 sec at room temperature.
   - Apply to magnet and discard ethanol.
 - Air-dry for 4-5 minutes [3].
-- Add {elute_vol} of {args['--eluant']}.
+- Add {elute_vol} of {eluant}.
 - Apply magnet for >2 min.
 - Transfer ≈95% of the eluant to a clean tube.
 """
 
-protocol.footnotes[1] = """\
+    protocol.footnotes[1] = """\
 See "Magnetic Bead DNA Purification" in my Google 
 Drive for more details.
 """
 
-protocol.footnotes[2] = """\
+    protocol.footnotes[2] = """\
 Don't vortex; this damages the beads (somehow).
 """
 
-protocol.footnotes[3] = """\
+    protocol.footnotes[3] = """\
 Be careful not to over-dry the beads.  Over-dried
 beads will appear cracked and will be difficult 
 to resuspend.  If this happens, heat and agitate 
@@ -60,4 +63,16 @@ open for 10-15 minutes to allow the ethanol to
 evaporate.
 """
 
-print(protocol)
+    return protocol
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    protocol = make_protocol(
+            volume_uL=eval(args['--volume']) if args['--volume'] else None,
+            eluant=args['--eluant'],
+    )
+    print(protocol)
+
+if __name__ == '__main__':
+    main()
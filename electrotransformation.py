@@ -7,11 +7,11 @@ Usage:
     electrotransformation.py
 """
 
-import dirty_water
+def make_protocol():
+    import dirty_water
+    protocol = dirty_water.Protocol()
 
-protocol = dirty_water.Protocol()
-
-protocol += """\
+    protocol += """\
 Desalt and concentrate the DNA to transform using 
 a Zymo spin column with the Qiagen buffers:
 
@@ -25,7 +25,7 @@ a Zymo spin column with the Qiagen buffers:
 
 - Elute in 10 μL water."""
 
-protocol += """\
+    protocol += """\
 Transform the DNA into Top10 cells by 
 electroporation.  For each transformation:
 
@@ -56,8 +56,14 @@ electroporation.  For each transformation:
 - Transfer cells to 50 mL selective media and 
   grow overnight at 37°C."""
 
-if __name__ == '__main__':
+    return protocol
+
+def main(argv=None):
     import docopt
-    print(protocol)
+    docopt.docopt(__doc__, argv=argv)
+    print(make_protocol())
+
+if __name__ == '__main__':
+    main()
 
 # vim: tw=49
@@ -5,6 +5,7 @@ Perform a Gibson assembly reaction, using the NEB master mix (E2611).
 
 Usage:
     gibson_assembly.py [<fragments>] [<num_reactions>] [options]
+    gibson_assembly.py --manifest <path> [<num_reactions>] [options]
 
 Arguments:
     <fragments>
@@ -49,6 +50,14 @@ Arguments:
         The number of reactions to setup.  The default is 1.
 
 Options:
+    -f --manifest <path>
+        Read the fragments for any number of assemblies from a CSV or TSV file 
+        (or "-" for stdin), and print a protocol for each one.  The file must 
+        have a header row with "assembly" and "conc" columns, and may also have 
+        "name" and "length" columns.  All the fragments in an assembly must be 
+        on consecutive rows, beginning with the backbone.  See `golden_gate.py 
+        --help` for more details.
+
     -m, --master-mix <bb,ins>  [default: ""]
         Indicate which fragments should be included in the master mix.  Valid 
         fragments are "bb" (for the backbone), "ins" (for all the inserts), 
@@ -67,7 +76,6 @@ Options:
         trying to conserve material.
 """
 
-import docopt
 import dirty_water
 import golden_gate
 
@@ -77,20 +85,17 @@ def uL_from_pmol(pmol, conc_nM):
 def pmol_from_uL(uL, conc_nM):
     return uL * conc_nM / 1e3
 
-if __name__ == '__main__':
-    args = docopt.docopt(__doc__)
+def make_reaction(frags, num_reactions=1, master_mix=(), rxn_vol_uL=10, dna_vol_uL=None):
+    """
+    Return a `dirty_water.Reaction` describing how to setup a Gibson assembly 
+    of the given fragments, and the amount of time to incubate it for.
 
-    rxn_vol_uL = eval(args['--reaction-volume'])
+    The arguments correspond to the command-line options described in the 
+    usage text.
+    """
     mm_vol_uL = rxn_vol_uL / 2
     max_dna_vol_uL = rxn_vol_uL - mm_vol_uL
-    dna_vol_uL = int(args['--dna-volume'] or max_dna_vol_uL)
-
-    # Get the fragments to assemble.
-
-    if args['<fragments>'] and args['<fragments>'] != '-':
-        frags = golden_gate.fragments_from_str(args['<fragments>'])
-    else:
-        frags = golden_gate.fragments_from_input()
+    dna_vol_uL = int(dna_vol_uL or max_dna_vol_uL)
 
     # Decide how much DNA of each fragment is needed.
     # https://www.neb.com/protocols/2012/09/25/gibson-assembly-master-mix-assembly#
@@ -112,6 +117,7 @@ if __name__ == '__main__':
     # Build the reaction table.
     
     gibson = dirty_water.Reaction()
+    gibson.num_reactions = num_reactions
     water_uL = max_dna_vol_uL
 
     for i, frag in enumerate(frags):
@@ -129,9 +135,9 @@ if __name__ == '__main__':
         gibson[frag.name].std_volume = best_uL, 'μL'
         gibson[frag.name].std_stock_conc = frag.conc.value, frag.conc.unit
         gibson[frag.name].master_mix = (
-                ('bb' in args['--master-mix'])
+                ('bb' in master_mix)
                 if i == 0 else
-                ('ins' in args['--master-mix'] or f'{i+1}' in args['--master-mix'])
+                ('ins' in master_mix or f'{i+1}' in master_mix)
         )
 
     gibson['Gibson master mix (NEB E2611)'].std_volume = mm_vol_uL, 'μL'
@@ -141,10 +147,14 @@ if __name__ == '__main__':
         gibson['Water'].std_volume = water_uL, 'μL'
         gibson['Water'].master_mix = True
 
-    # Display the protocol.
-
-    import dirty_water
+    return gibson, incubation_time
 
+def make_protocol(frags, **kwargs):
+    """
+    Return a `dirty_water.Protocol` for a Gibson assembly of the given 
+    fragments.  Any keyword arguments are passed on to `make_reaction()`.
+    """
+    gibson, incubation_time = make_reaction(frags, **kwargs)
     protocol = dirty_water.Protocol()
 
     protocol += f"""\
@@ -159,6 +169,43 @@ Incubate at 50°C for {incubation_time}."""
 Dilute reaction 4x in water before transfroming 
 into chemically competent cells (e.g. MACH1)."""
 
-    print(protocol)
+    return protocol
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    kwargs = dict(
+            num_reactions=int(args['<num_reactions>'] or 1),
+            master_mix=args['--master-mix'],
+            rxn_vol_uL=eval(args['--reaction-volume']),
+            dna_vol_uL=args['--dna-volume'],
+    )
+
+    if args['--manifest']:
+        import sys
+
+        path = args['--manifest']
+        manifest = sys.stdin if path == '-' else open(path)
+
+        try:
+            with manifest:
+                for assembly, frags in golden_gate.fragments_from_manifest(manifest):
+                    print(assembly)
+                    print('=' * len(assembly))
+                    print(make_protocol(frags, **kwargs))
+                    print(flush=True)
+        except ValueError as err:
+            raise SystemExit(f"Error: {err}")
+
+    else:
+        if args['<fragments>'] and args['<fragments>'] != '-':
+            frags = golden_gate.fragments_from_str(args['<fragments>'])
+        else:
+            frags = golden_gate.fragments_from_input()
+
+        print(make_protocol(frags, **kwargs))
+
+if __name__ == '__main__':
+    main()
 
 # vim: tw=50
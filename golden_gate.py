@@ -5,6 +5,7 @@ Perform a Golden Gate assembly reaction.
 
 Usage:
     golden_gate.py <backbone> <inserts>... [options]
+    golden_gate.py --manifest <path> [options]
 
 Arguments:
     <backbone> <inserts>
@@ -36,6 +37,24 @@ Arguments:
         inserts, see --excess-insert.
 
 Options:
+    -f --manifest <path>
+        Read the fragments for any number of assemblies from a CSV or TSV file 
+        (or "-" for stdin), and print a protocol for each one.  The file must 
+        have a header row with the following columns:
+
+        - assembly (required): An ID that groups fragments into assemblies.  
+          All the fragments in an assembly must be on consecutive rows, 
+          beginning with the backbone.
+
+        - conc (required): The concentration of the fragment, in the same 
+          format as described above.
+
+        - name, length (optional): The name and length of the fragment, as 
+          described above.  Leave these fields empty to use the defaults.
+
+        Each protocol is printed as soon as all the rows for its assembly have 
+        been read, so very large manifests can be streamed.
+
     -n --num-reactions <N>  [default: 1]
         The number of reactions to setup.
 
@@ -67,10 +86,144 @@ Options:
         is backbone.
 """
 
-import docopt
+import re
 import dirty_water
 from dataclasses import dataclass
 
+conc_regex = re.compile(r'([0-9.]+)(?:\s*(ng/[uµ]L|[muµnpf]M))?$')
+# The same as `conc_regex`, but for stripped strings joined by newlines.
+conc_column_regex = re.compile(
+        r'^(?:([0-9.]+)(?:[^\S\n]*(ng/[uµ]L|[muµnpf]M))?|((?i:pcr)))$',
+        re.MULTILINE,
+)
+nM_multipliers = {
+        'mM': 1e9 / 1e3,
+        'µM': 1e9 / 1e6,
+        'nM': 1e9 / 1e9,
+        'pM': 1e9 / 1e12,
+        'fM': 1e9 / 1e15,
+}
+
+def make_reaction(frags, num_reactions=1, enzymes=None, master_mix=(), rxn_vol_uL=10, dna_vol_uL=None, excess_insert=2):
+    """
+    Return a `dirty_water.Reaction` describing how to setup a Golden Gate 
+    assembly of the given fragments.
+
+    The arguments correspond to the command-line options described in the 
+    usage text.  Note that the volume of each fragment is calculated and 
+    stored in the given fragment objects.
+    """
+
+    # Work out the volumes specified in the arguments.
+    enzymes = enzymes or ['Golden Gate enzyme']
+    max_dna_std_vol_uL = 10 - 1.5 - len(enzymes) * 0.5
+    std_vol = lambda x: 10 * x / rxn_vol_uL
+    real_vol = lambda x: rxn_vol_uL * x / 10
+
+    if dna_vol_uL:
+        dna_std_vol_uL = std_vol(dna_vol_uL)
+    else:
+        dna_std_vol_uL = max_dna_std_vol_uL
+
+    if dna_std_vol_uL > max_dna_std_vol_uL:
+        raise ValueError(f"Cannot fit {real_vol(dna_std_vol_uL)} µL of DNA in a {rxn_vol_uL} µL reaction.")
+
+    calc_fragment_volumes(
+            frags,
+            vol_uL=dna_std_vol_uL,
+            excess_insert=excess_insert,
+    )
+
+    # Create the reaction table.
+    golden_gate = dirty_water.Reaction()
+    golden_gate.num_reactions = num_reactions
+
+    if dna_std_vol_uL != max_dna_std_vol_uL:
+        golden_gate['Water'].std_volume = max_dna_std_vol_uL - dna_std_vol_uL, 'µL'
+        golden_gate['Water'].master_mix = True
+
+    for i, frag in enumerate(frags):
+        golden_gate[frag.name].std_volume = frag.vol_uL, 'µL'
+        golden_gate[frag.name].std_stock_conc = frag.conc.value, frag.conc.unit
+        golden_gate[frag.name].master_mix = (
+                ('bb' in master_mix)
+                if i == 0 else
+                ('ins' in master_mix or str(i) in master_mix)
+        )
+
+    golden_gate['T4 ligase buffer'].std_volume = 1.0, 'μL'
+    golden_gate['T4 ligase buffer'].std_stock_conc = '10x'
+    golden_gate['T4 ligase buffer'].master_mix = True
+
+    golden_gate['T4 DNA ligase'].std_volume = 0.5, 'μL'
+    golden_gate['T4 DNA ligase'].std_stock_conc = 400, 'U/μL'
+    golden_gate['T4 DNA ligase'].master_mix = True
+
+    for enzyme in enzymes:
+        golden_gate[enzyme].std_volume = 0.5, 'μL'
+        golden_gate[enzyme].master_mix = True
+
+    golden_gate.volume = rxn_vol_uL
+    return golden_gate
+
+def make_protocol(frags, **kwargs):
+    """
+    Return a `dirty_water.Protocol` for a Golden Gate assembly of the given 
+    fragments.  Any keyword arguments are passed on to `make_reaction()`.
+    """
+
+    golden_gate = make_reaction(frags, **kwargs)
+    protocol = dirty_water.Protocol()
+
+    protocol += """\
+Setup the Golden Gate reaction(s):
+
+{golden_gate}
+"""
+
+    if len(frags) == 2:
+        protocol += f"""\
+Run the following thermocycler protocol:
+
+- 37°C for 5 min
+
+Or, to maximize the number of transformants:
+
+- 37°C for 60 min
+- 60°C for 5 min
+"""
+    elif len(frags) <= 4:
+        protocol += f"""\
+Run the following thermocycler protocol:
+
+- 37°C for 60 min
+- 60°C for 5 min
+"""
+    elif len(frags) <= 10:
+        protocol += f"""\
+Run the following thermocycler protocol:
+
+- Repeat 30 times:
+  - 37°C for 1 min
+  - 16°C for 1 min
+- 60°C for 5 min
+"""
+    else:
+        protocol += f"""\
+Run the following thermocycler protocol:
+
+- Repeat 30 times:
+  - 37°C for 5 min
+  - 16°C for 5 min
+- 60°C for 5 min
+"""
+
+    protocol.notes += """\
+https://international.neb.com/protocols/2018/10/02/golden-gate-assembly-protocol-for-using-neb-golden-gate-assembly-mix-e1601
+"""
+
+    return protocol
+
 def fragments_from_strs(frag_strs):
     """
     Parse fragments from a comma- and colon-separated string, i.e. that could 
@@ -181,73 +334,263 @@ insert.  Press Ctrl-D to finish, or Ctrl-C to abort.
 
     return fragments
 
+def fragments_from_manifest(lines):
+    """
+    Parse fragments for any number of assemblies from a CSV or TSV manifest.
+
+    See the usage text for a description of the columns in the manifest.  
+    This is a generator that yields `(assembly, fragments)` tuples.  Each 
+    assembly is yielded as soon as its last row has been read, so only one 
+    assembly needs to be held in memory at a time.
+    """
+    import csv
+    from itertools import chain, groupby
+
+    lines = iter(lines)
+    header = next(lines, '')
+    dialect = 'excel-tab' if '\t' in header else 'excel'
+    rows = csv.DictReader(chain([header], lines), dialect=dialect)
+
+    missing = {'assembly', 'conc'} - set(rows.fieldnames or ())
+    if missing:
+        raise ValueError(f"manifest is missing required column(s): {', '.join(sorted(missing))}")
+
+    seen = set()
+
+    for assembly, group in groupby(rows, key=lambda row: row['assembly']):
+        if assembly in seen:
+            raise ValueError(f"the rows for assembly '{assembly}' are not consecutive (line {rows.line_num})")
+        seen.add(assembly)
+
+        fragments = []
+
+        for i, row in enumerate(group):
+            # `DictReader` fills in missing fields with None, and puts extra 
+            # fields in a list under the None key.
+            if None in row or None in row.values():
+                num_fields = sum(v is not None for k, v in row.items() if k is not None)
+                num_fields += len(row.get(None, []))
+                raise ValueError(f"line {rows.line_num}: expected {len(rows.fieldnames)} fields, got {num_fields}")
+
+            try:
+                frag = fragment_from_fields(
+                        row.get('name') or default_fragment_name(i),
+                        row['conc'],
+                        row.get('length'),
+                )
+            except ValueError as error:
+                raise ValueError(f"assembly '{assembly}' (line {rows.line_num}): {error}")
+
+            fragments.append(frag)
+
+        if len(fragments) < 2:
+            raise ValueError(f"assembly '{assembly}' must have at least two fragments")
+
+        yield assembly, fragments
+
+def fragment_from_fields(name, conc_str, size_str=None):
+    frag_conc = conc_from_str(conc_str)
+    frag_size = int(size_str) if size_str and size_str.strip() else None
+
+    if frag_conc.unit == 'ng/µL' and frag_size is None:
+        raise ValueError(f"'{name}' has a concentration in ng/µL, so the length of the fragment must also be specified")
+
+    frag_nM = nM_from_conc(frag_conc, frag_size)
+    frag = Fragment(name, frag_nM)
+    frag.conc = frag_conc
+    return frag
+
 def calc_fragment_volumes(frags, vol_uL=5, excess_insert=2):
+    concs_nM = [f.conc_nM for f in frags]
+    vols_uL = calc_fragment_volumes_batch(concs_nM, vol_uL, excess_insert)
+
+    for f, vol_uL in zip(frags, vols_uL[0]):
+        f.vol_uL = vol_uL
+
+def calc_fragment_volumes_batch(concs_nM, vol_uL=5, excess_insert=2):
+    """
+    Calculate how much of each fragment to add to many assemblies at once.
+
+    The arguments have the same meaning as for `calc_fragment_volumes()`, but 
+    each can describe a whole plate of assemblies:
+
+    concs_nM:
+        An array with one row per assembly and one column per fragment, 
+        beginning with the backbone.  Assemblies with fewer fragments than the 
+        others can be padded with NaN.
+
+    vol_uL, excess_insert:
+        Either a single value to use for every assembly, or an array with one 
+        value per assembly.
+
+    The return value is an array with the same shape as `concs_nM`, giving the 
+    volume of each fragment in µL (or NaN for padding).
+    """
     import numpy as np
 
-    num_fragments = n = len(frags)
-    num_equations = m = n + 1
+    concs_nM = np.array(concs_nM, dtype=float, ndmin=2)
+    num_assemblies, n = concs_nM.shape
+
+    vol_uL = np.broadcast_to(vol_uL, num_assemblies)
+    excess_insert = np.broadcast_to(excess_insert, num_assemblies)
+
+    # The system of equations solved by `_calc_fragment_volumes_dense()` is an 
+    # arrowhead matrix, so it can be solved directly in O(n).  Every fragment 
+    # is present in the same number of moles (scaled by the excess of each 
+    # insert), so each volume is inversely proportional to its concentration.
 
-    # Construct the system of linear equations to 
-    # solve for the amount of each fragment to add 
-    # to the reaction.
+    ratios = np.empty_like(concs_nM)
+    ratios[:,0] = 1
+    ratios[:,1:] = excess_insert[:,np.newaxis]
+    ratios /= concs_nM
 
-    A = np.zeros((m, m))
+    total = np.nansum(ratios, axis=1)
+    return ratios * (vol_uL / total)[:,np.newaxis]
 
-    for i, f in enumerate(frags):
-        A[i,i] = f.conc_nM
+def _calc_fragment_volumes_dense(concs_nM, vol_uL=5, excess_insert=2):
+    """
+    Solve the same problem as `calc_fragment_volumes_batch()` by building the 
+    full system of linear equations.  This is O(n³), so it's only used to 
+    validate the closed-form solution.
+    """
+    import numpy as np
+
+    concs_nM = np.array(concs_nM, dtype=float, ndmin=2)
+    num_assemblies, n = concs_nM.shape
+    num_equations = m = n + 1
+    padding = np.isnan(concs_nM)
 
-    A[:,n] =  excess_insert
-    A[0,n] =  1
-    A[n,:] =  1
-    A[n,n] =  0
+    vol_uL = np.broadcast_to(vol_uL, num_assemblies)
+    excess_insert = np.broadcast_to(excess_insert, num_assemblies)
 
-    B = np.zeros((m, 1))
-    B[n] = vol_uL
+    # Construct one system of linear equations per 
+    # assembly and solve them all in a single call.  
+    # Padding is given the trivial equation x = 0, 
+    # and is left out of the total volume.
 
-    x = np.linalg.solve(A, B)
+    i = np.arange(n)
+    A = np.zeros((num_assemblies, m, m))
+    A[:,i,i] = np.where(padding, 1, concs_nM)
+    A[:,:,n] = excess_insert[:,np.newaxis]
+    A[:,0,n] = 1
+    A[:,:n,n][padding] = 0
+    A[:,n,:n] = ~padding
+    A[:,n,n] = 0
 
-    for i, f in enumerate(frags):
-        f.vol_uL = x[i,0]
+    B = np.zeros((num_assemblies, m, 1))
+    B[:,n,0] = vol_uL
+
+    x = np.linalg.solve(A, B)[:,:n,0]
+    x[padding] = np.nan
+    return x
 
 def default_fragment_name(i):
     return "Backbone" if i == 0 else f"Insert #{i}"
 
 def conc_from_str(x):
-    import re
-
     if x.upper().strip() == 'PCR':
         return Concentration(50, 'ng/µL')
 
-    value_pattern = '[0-9.]+'
-    unit_pattern = 'ng/[uµ]L|[muµnpf]M'
-    conc_pattern = rf'({value_pattern})(\s*({unit_pattern}))?$'
-
-    match = re.match(conc_pattern, x.strip())
+    match = conc_regex.match(x.strip())
     if not match:
         raise ValueError(f"could not interpret '{x}' as a concentration.")
 
-    value, _, unit = match.groups()
+    value, unit = match.groups()
     unit = (unit or 'ng/µL').replace('u', 'µ')
     return Concentration(float(value), unit)
 
 def nM_from_conc(conc, num_bp):
-    multiplier = {
-            'mM': 1e9 / 1e3,
-            'µM': 1e9 / 1e6,
-            'nM': 1e9 / 1e9,
-            'pM': 1e9 / 1e12,
-            'fM': 1e9 / 1e15,
-    }
-
     # https://www.neb.com/tools-and-resources/usage-guidelines/nucleic-acid-data
-    if num_bp:
-        multiplier['ng/µL'] = 1e6 / (650 * num_bp)
+    if num_bp and conc.unit == 'ng/µL':
+        return conc.value * 1e6 / (650 * num_bp)
 
     try:
-        return conc.value * multiplier[conc.unit]
+        return conc.value * nM_multipliers[conc.unit]
     except KeyError:
         raise ValueError(f"cannot convert '{conc.unit}' to nM.")
 
+def nM_from_conc_strs(conc_strs, num_bp=None):
+    """
+    Convert a whole column of concentration strings to nM in one pass.
+
+    This follows the same rules as `conc_from_str()` and `nM_from_conc()`, but 
+    is meant for large tables, e.g. Nanodrop exports:
+
+    conc_strs:
+        An array, list, or `pandas.Series` of concentration strings.  Numbers 
+        (rather than strings) are interpreted as ng/µL.
+
+    num_bp:
+        The length of each fragment, either as a single value or as an array 
+        with one value per concentration.  Only needed for concentrations in 
+        ng/µL; the other entries can be NaN.
+
+    Returns a `numpy` array of concentrations in nM.
+    """
+    import numpy as np
+
+    conc_strs = np.asarray(conc_strs).ravel()
+    strs = np.char.strip(conc_strs.astype(str))
+
+    # Nanodrop exports usually contain bare numbers (i.e. ng/µL), which numpy 
+    # can parse directly.  Only take this shortcut for strings that 
+    # `conc_from_str()` would also accept, e.g. not "inf" or "1e3".
+
+    values = None
+
+    if conc_strs.dtype.kind in 'biuf':
+        values = conc_strs.astype(float)
+    elif np.all(np.char.strip(strs, '0123456789.') == ''):
+        try:
+            values = strs.astype(float)
+        except ValueError:
+            pass
+
+    if values is not None and np.all(np.isfinite(values) & (values >= 0)):
+        num_bp = np.broadcast_to(np.array(num_bp, dtype=float), values.shape)
+        if np.isnan(num_bp).any():
+            raise ValueError("cannot convert 'ng/µL' to nM without a length.")
+        return values * 1e6 / (650 * num_bp)
+
+    # Match every string at once by joining them into lines and running a 
+    # multi-line regex over the result.  If any line fails to match (or if a 
+    # string contains a newline), parse each string individually instead, 
+    # which also gives a useful error message.
+
+    strs = strs.tolist()
+    lines = '\n'.join(strs)
+    fields = conc_column_regex.findall(lines)
+
+    if len(fields) != len(strs) or lines.count('\n') != len(strs) - 1:
+        num_bp = np.broadcast_to(np.array(num_bp, dtype=float), len(strs))
+        return np.array([
+            nM_from_conc(conc_from_str(x), None if np.isnan(n) else n)
+            for x, n in zip(strs, num_bp)
+        ])
+
+    if not fields:
+        return np.zeros(0)
+
+    values, units, pcr = map(np.array, zip(*fields))
+    is_pcr = (pcr != '')
+    values = np.where(is_pcr, '50', values).astype(float)
+
+    unique_units, i = np.unique(units, return_inverse=True)
+    unique_units = [(x or 'ng/µL').replace('u', 'µ') for x in unique_units]
+    multipliers = np.array([nM_multipliers.get(x, np.nan) for x in unique_units])[i]
+    is_ng_uL = np.array([x == 'ng/µL' for x in unique_units])[i] | is_pcr
+
+    if is_ng_uL.any():
+        num_bp = np.broadcast_to(
+                np.array(num_bp, dtype=float), values.shape)[is_ng_uL]
+
+        if np.isnan(num_bp).any():
+            raise ValueError("cannot convert 'ng/µL' to nM without a length.")
+
+        multipliers[is_ng_uL] = 1e6 / (650 * num_bp)
+
+    return values * multipliers
+
 @dataclass
 class Fragment:
     name: str
@@ -300,6 +643,60 @@ def test_nM_from_conc():
     assert nM_from_conc(c(1, 'ng/µL'), 100) == approx(1e6/(650 * 100))
     assert nM_from_conc(c(1, 'ng/µL'), 1000) == approx(1e6/(650 * 1000))
 
+def test_nM_from_conc_strs():
+    import numpy as np
+    from pytest import approx, raises
+
+    concs = nM_from_conc_strs(
+            ['1 mM', '1 uM', '1nM', ' 1 pM ', '1 fM', '1', '1 ng/uL', 'PCR', 'pcr'],
+            [np.nan, np.nan, np.nan, np.nan, np.nan, 100, 1000, 100, 1000],
+    )
+    assert concs == approx([
+        1e6, 1e3, 1e0, 1e-3, 1e-6,
+        1e6 / (650 * 100),
+        1e6 / (650 * 1000),
+        50e6 / (650 * 100),
+        50e6 / (650 * 1000),
+    ])
+
+    assert nM_from_conc_strs(['1', ' 2.5 ', 3], [100, 1000, 1000]) == approx([
+        1e6 / (650 * 100),
+        2.5e6 / (650 * 1000),
+        3e6 / (650 * 1000),
+    ])
+    assert nM_from_conc_strs([30, '60 nM'], 1000) == approx([
+        30e6 / (650 * 1000), 60,
+    ])
+
+    with raises(ValueError, match='xxx'):
+        nM_from_conc_strs(['1 nM', '1 xxx'])
+    with raises(ValueError, match="''"):
+        nM_from_conc_strs(['1 nM', ''])
+    with raises(ValueError, match='length'):
+        nM_from_conc_strs(['1 nM', '1 ng/uL'], [np.nan, np.nan])
+    with raises(ValueError, match='length'):
+        nM_from_conc_strs(['1 nM', '1'])
+    with raises(ValueError, match='length'):
+        nM_from_conc_strs(['1', '2'])
+    with raises(ValueError, match='nan'):
+        nM_from_conc_strs(['1', 'nan'], 1000)
+
+    # Whitespace is handled the same way as by `conc_from_str()`.
+    assert nM_from_conc_strs(['1 nM\r', '2 nM', '\t3\tnM\x0c']) == approx([
+        1, 2, 3,
+    ])
+    assert nM_from_conc_strs(['1\r', '2 '], 1000) == approx([
+        1e6 / (650 * 1000),
+        2e6 / (650 * 1000),
+    ])
+
+    # Numbers that numpy understands, but `conc_from_str()` doesn't.
+    for x in ['inf', '1e3', '-1']:
+        with raises(ValueError, match=x):
+            conc_from_str(x)
+        with raises(ValueError, match=x):
+            nM_from_conc_strs([x, '1'], 1000)
+
 def test_fragments_from_strs():
     from pytest import approx, raises
     f = Fragment
@@ -346,118 +743,139 @@ def test_fragments_from_strs():
             f('Insert #2', 61),
     ]
 
+def test_fragments_from_manifest():
+    from pytest import approx, raises
+    f = Fragment
 
-if __name__ == '__main__':
-    args = docopt.docopt(__doc__)
-
-    # Work out the volumes specified in the arguments.
-    enzymes = (args['--enzymes'] or 'Golden Gate enzyme').split(',')
-    rxn_vol_uL = eval(args['--reaction-volume'])
-    max_dna_std_vol_uL = 10 - 1.5 - len(enzymes) * 0.5
-    std_vol = lambda x: 10 * x / rxn_vol_uL
-    real_vol = lambda x: rxn_vol_uL * x / 10
-
-    if args['--dna-volume']:
-        dna_std_vol_uL = std_vol(eval(args['--dna-volume']))
-    else:
-        dna_std_vol_uL = max_dna_std_vol_uL
-
-    if dna_std_vol_uL > max_dna_std_vol_uL:
-        raise ValueError(f"Cannot fit {real_vol(dna_std_vol_uL)} µL of DNA in a {rxn_vol_uL} µL reaction.")
-
-    frags = fragments_from_strs(
-            [args['<backbone>']] + args['<inserts>'],
-    )
-    calc_fragment_volumes(
-            frags,
-            vol_uL=dna_std_vol_uL,
-            excess_insert=float(args['--excess-insert']),
-    )
-
-    # Create the reaction table.
-    golden_gate = dirty_water.Reaction()
-    golden_gate.num_reactions = eval(args['--num-reactions'])
+    manifest = """\
+assembly,name,conc,length
+A,,30nM,
+A,Gene,60,1000
+B,pUC,20nM,
+B,,60nM,
+B,,61nM,
+""".splitlines(True)
+
+    assert list(fragments_from_manifest(manifest)) == [
+            ('A', [
+                f('Backbone', 30),
+                f('Gene', approx((60 * 1e6) / (650 * 1000))),
+            ]),
+            ('B', [
+                f('pUC', 20),
+                f('Insert #1', 60),
+                f('Insert #2', 61),
+            ]),
+    ]
 
-    if dna_std_vol_uL != max_dna_std_vol_uL:
-        golden_gate['Water'].std_volume = max_dna_std_vol_uL - dna_std_vol_uL, 'µL'
-        golden_gate['Water'].master_mix = True
+    tsv = ['assembly\tconc\n', 'A\t30nM\n', 'A\t60nM\n']
+    assert list(fragments_from_manifest(tsv)) == [
+            ('A', [f('Backbone', 30), f('Insert #1', 60)]),
+    ]
 
-    master_mix = args['--master-mix'].split(',')
+    with raises(ValueError, match='conc'):
+        list(fragments_from_manifest(['assembly,name\n', 'A,x\n']))
+    with raises(ValueError, match='length'):
+        list(fragments_from_manifest(['assembly,conc\n', 'A,30nM\n', 'A,60\n']))
+    with raises(ValueError, match='at least two'):
+        list(fragments_from_manifest(['assembly,conc\n', 'A,30nM\n']))
+    with raises(ValueError, match='line 3: expected 4 fields, got 2'):
+        list(fragments_from_manifest(manifest[:2] + ['A,Gene\n']))
+    with raises(ValueError, match='line 2: expected 2 fields, got 3'):
+        list(fragments_from_manifest(['assembly,conc\n', 'A,30nM,x\n']))
+    with raises(ValueError, match='consecutive'):
+        list(fragments_from_manifest([
+            'assembly,conc\n',
+            'A,30nM\n', 'A,60nM\n',
+            'B,30nM\n', 'B,60nM\n',
+            'A,10nM\n',
+        ]))
+
+def test_calc_fragment_volumes():
+    from pytest import approx
+    f = Fragment
 
-    for i, frag in enumerate(frags):
-        golden_gate[frag.name].std_volume = frag.vol_uL, 'µL'
-        golden_gate[frag.name].std_stock_conc = frag.conc.value, frag.conc.unit
-        golden_gate[frag.name].master_mix = (
-                ('bb' in master_mix)
-                if i == 0 else
-                ('ins' in master_mix or str(i) in master_mix)
-        )
+    frags = [f('Backbone', 30), f('Insert #1', 60)]
+    calc_fragment_volumes(frags, vol_uL=6, excess_insert=2)
 
-    golden_gate['T4 ligase buffer'].std_volume = 1.0, 'μL'
-    golden_gate['T4 ligase buffer'].std_stock_conc = '10x'
-    golden_gate['T4 ligase buffer'].master_mix = True
+    assert frags[0].vol_uL + frags[1].vol_uL == approx(6)
+    assert frags[1].vol_uL * 60 == approx(2 * frags[0].vol_uL * 30)
 
-    golden_gate['T4 DNA ligase'].std_volume = 0.5, 'μL'
-    golden_gate['T4 DNA ligase'].std_stock_conc = 400, 'U/μL'
-    golden_gate['T4 DNA ligase'].master_mix = True
+    frags = [f('Backbone', 10), f('Insert #1', 20), f('Insert #2', 40)]
+    calc_fragment_volumes(frags, vol_uL=7, excess_insert=1)
 
-    for enzyme in enzymes:
-        golden_gate[enzyme].std_volume = 0.5, 'μL'
-        golden_gate[enzyme].master_mix = True
+    assert frags[0].vol_uL == approx(4)
+    assert frags[1].vol_uL == approx(2)
+    assert frags[2].vol_uL == approx(1)
 
-    golden_gate.volume = rxn_vol_uL
+def test_calc_fragment_volumes_batch():
+    import numpy as np
+    from pytest import approx
 
-    # Create the protocol.
-    protocol = dirty_water.Protocol()
+    nan = np.nan
+    vols = calc_fragment_volumes_batch(
+            [[10, 20, 40], [10, 20, nan]],
+            vol_uL=[7, 5],
+            excess_insert=1,
+    )
 
-    protocol += """\
-Setup the Golden Gate reaction(s):
+    assert vols.shape == (2, 3)
+    assert vols[0] == approx([4, 2, 1])
+    assert vols[1,:2] == approx([10/3, 5/3])
+    assert np.isnan(vols[1,2])
 
-{golden_gate}
-"""
+def test_calc_fragment_volumes_dense():
+    import numpy as np
+    from numpy.testing import assert_allclose
+
+    rng = np.random.default_rng(0)
+    concs_nM = rng.uniform(1, 100, size=(20, 8))
+    concs_nM[5:,6:] = np.nan
+    concs_nM[10:,3:] = np.nan
+    vol_uL = rng.uniform(1, 10, size=20)
+    excess_insert = rng.uniform(1, 5, size=20)
+
+    assert_allclose(
+            calc_fragment_volumes_batch(concs_nM, vol_uL, excess_insert),
+            _calc_fragment_volumes_dense(concs_nM, vol_uL, excess_insert),
+    )
 
-    if len(frags) == 2:
-        protocol += f"""\
-Run the following thermocycler protocol:
 
-- 37°C for 5 min
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    kwargs = dict(
+            num_reactions=eval(args['--num-reactions']),
+            enzymes=args['--enzymes'] and args['--enzymes'].split(','),
+            master_mix=args['--master-mix'].split(','),
+            rxn_vol_uL=eval(args['--reaction-volume']),
+            dna_vol_uL=args['--dna-volume'] and eval(args['--dna-volume']),
+            excess_insert=float(args['--excess-insert']),
+    )
 
-Or, to maximize the number of transformants:
+    if args['--manifest']:
+        import sys
 
-- 37°C for 60 min
-- 60°C for 5 min
-"""
-    elif len(frags) <= 4:
-        protocol += f"""\
-Run the following thermocycler protocol:
+        path = args['--manifest']
+        manifest = sys.stdin if path == '-' else open(path)
 
-- 37°C for 60 min
-- 60°C for 5 min
-"""
-    elif len(frags) <= 10:
-        protocol += f"""\
-Run the following thermocycler protocol:
+        try:
+            with manifest:
+                for assembly, frags in fragments_from_manifest(manifest):
+                    print(assembly)
+                    print('=' * len(assembly))
+                    print(make_protocol(frags, **kwargs))
+                    print(flush=True)
+        except ValueError as err:
+            raise SystemExit(f"Error: {err}")
 
-- Repeat 30 times:
-  - 37°C for 1 min
-  - 16°C for 1 min
-- 60°C for 5 min
-"""
     else:
-        protocol += f"""\
-Run the following thermocycler protocol:
-
-- Repeat 30 times:
-  - 37°C for 5 min
-  - 16°C for 5 min
-- 60°C for 5 min
-"""
-
-    protocol.notes += """\
-https://international.neb.com/protocols/2018/10/02/golden-gate-assembly-protocol-for-using-neb-golden-gate-assembly-mix-e1601
-"""
+        frags = fragments_from_strs(
+                [args['<backbone>']] + args['<inserts>'],
+        )
+        print(make_protocol(frags, **kwargs))
 
-    print(protocol)
+if __name__ == '__main__':
+    main()
 
 # vim: tw=50
-
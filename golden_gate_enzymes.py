@@ -7,13 +7,16 @@ Usage:
     golden_gate_enzymes.py
 """
 
-import docopt
+def main(argv=None):
+    import docopt
+    docopt.docopt(__doc__, argv=argv)
 
-docopt.docopt(__doc__)
-
-# https://www.neb.com/applications/cloning-and-synthetic-biology/dna-assembly-and-cloning/golden-gate-assembly 
-print("""\
+    # https://www.neb.com/applications/cloning-and-synthetic-biology/dna-assembly-and-cloning/golden-gate-assembly 
+    print("""\
 BsaI-HFv2
 BbsI-HF
 Esp3I
 """.strip())
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,36 @@ Suggest 4-bp Golden Gate junction sequences that are likely to assemble
 successfully and in the correct order.
 
 Usage:
+    golden_gate_junctions.py search <num> [<required>...] [options]
+    golden_gate_junctions.py score <overhangs>... [options]
+    golden_gate_junctions.py import <xlsx>...
     golden_gate_junctions.py <num> [<set>]
 
+Subcommands:
+    search
+        Find <num> new overhangs that are as orthogonal as possible to each 
+        other and to any <required> overhangs.  The required overhangs can be 
+        given either as sequences or as the name of one of the sets described 
+        below (e.g. "moclo"), in which case the junctions from that set are 
+        required.  For sets with more than one list of junctions, the first is 
+        used (e.g. the Level 1 junctions for Weber2011).  Palindromes and the 
+        reverse complements of chosen overhangs are never considered.  The 
+        search is stochastic, so it returns the best set found within the time 
+        limit (see --time).  This requires ligation frequency data; see 
+        `import`.
+
+    score
+        Calculate the expected fidelity of the given set of overhangs, i.e. 
+        the fraction of assemblies in which every overhang is ligated to its 
+        correct partner.  This requires ligation frequency data; see `import`.
+
+    import
+        Compile the overhang ligation frequency data published by Potapov et 
+        al. (ACS Synth Biol 2018, supplementary files S1-S4, e.g. 
+        "FileS2_01h_37C.xlsx") into the compact binary file used for scoring 
+        (golden_gate_ligation.npz, next to this script).  The condition for 
+        each file is taken from its name, e.g. "01h_37C".
+
 Arguments:
     <num>
         The number of junctions you need.  The set you choose must contain at 
@@ -59,9 +87,24 @@ Arguments:
         Note that all of the sets can be referred to either by a full name 
         (author/year for the relevant publication) or by a shorter alias.  A 
         fuzzy match is used to identify sets as well, so you can often get away 
-        with typing just a few characters of whichever name you want.
+        with typing just the first few characters of whichever name you want, 
+        or with small typos.
+
+Options:
+    -d --data CONDITION  [default: 01h_37C]
+        Which ligation frequency data to use for scoring, e.g. "01h_37C" (1h 
+        at 37°C) or "18h_25C" (18h at 25°C).
+
+    -t --time SECONDS  [default: 3]
+        How long to search for, see `search`.
+
+    -s --seed SEED
+        Seed the random number generator used by `search`, to get 
+        reproducible results.
 """
 
+import os, sys, re, itertools
+
 aliases = {
         'neb': 'Potapov2018/37C',
         '37': 'Potapov2018/37C',
@@ -111,23 +154,493 @@ junctions = {
         ],
 }
 
-if __name__== '__main__':
+
+def reverse_complement(seq):
+    return seq[::-1].translate(str.maketrans('ACGT', 'TGCA'))
+
+all_overhangs = [''.join(x) for x in itertools.product('ACGT', repeat=4)]
+overhang_indices = {x: i for i, x in enumerate(all_overhangs)}
+rc_indices = [overhang_indices[reverse_complement(x)] for x in all_overhangs]
+ligation_data_path = os.path.join(os.path.dirname(__file__), 'golden_gate_ligation.npz')
+
+def indices_from_overhangs(overhangs):
+    """
+    Convert overhang sequences (e.g. 'AATG') into indices into the 256x256 
+    ligation frequency matrix.  Indices (i.e. integers) are returned as is, so 
+    pre-encoded sets can be scored without any conversion overhead.
+    """
+    import numpy as np
+
+    overhangs = np.asarray(overhangs)
+    if overhangs.dtype.kind in 'iu':
+        return overhangs
+
+    try:
+        return np.vectorize(
+                lambda x: overhang_indices[x.upper()], otypes=[np.intp],
+        )(overhangs)
+    except KeyError as error:
+        raise ValueError(f"not a 4-bp overhang: {error}") from None
+
+def load_ligation_data(condition='01h_37C', path=None):
+    """
+    Load the overhang ligation frequency data for the given condition.
+
+    The data is a 256x256 array where element [i,j] is the number of times 
+    overhang i was observed ligated to overhang j, and the correct ligation 
+    for overhang i is with its reverse complement.  Overhangs are numbered in 
+    lexicographic order (see `all_overhangs`).
+    """
+    import numpy as np
+
+    path = path or ligation_data_path
+
+    if not os.path.exists(path):
+        raise ValueError(f"ligation frequency data not found: '{path}'\nRun `golden_gate_junctions.py import` on the supplementary files from Potapov et al. (2018) to create it.")
+
+    with np.load(path) as data:
+        if condition not in data:
+            raise ValueError(f"no ligation frequency data for '{condition}', the options are: {', '.join(sorted(data.keys()))}")
+        return data[condition]
+
+def import_ligation_data(xlsx_paths, path=None):
+    """
+    Compile the overhang ligation frequency spreadsheets from Potapov et al. 
+    (2018) into a single compressed file of 256x256 integer arrays, one for 
+    each condition.
+    """
+    import numpy as np
+    import pandas as pd
+
+    path = path or ligation_data_path
+    arrays = {}
+
+    for xlsx_path in xlsx_paths:
+        match = re.search(r'\d+h_\d+C', os.path.basename(xlsx_path))
+        if not match:
+            raise ValueError(f"can't determine the condition for '{xlsx_path}', expected a name like 'FileS2_01h_37C.xlsx'")
+
+        df = pd.read_excel(xlsx_path, index_col='Overhang')
+        df = df.reindex(index=all_overhangs, columns=all_overhangs, fill_value=0)
+        arrays[match.group()] = df.fillna(0).to_numpy().astype(np.uint32)
+
+    np.savez_compressed(path, **arrays)
+    return path
+
+def score_overhang_sets(sets, data, chunk_size=None):
+    """
+    Calculate the expected fidelity of any number of overhang sets.
+
+    sets:
+        A 2D array with one row per overhang set.  The overhangs can be given 
+        either as sequences or as indices (see `indices_from_overhangs()`).  
+        All the sets must be the same size.
+
+    data:
+        The 256x256 ligation frequency matrix, see `load_ligation_data()`.
+
+    The fidelity of each overhang is the fraction of its ligation events that 
+    are with its correct partner, out of all ligation events with the 
+    overhangs present in the reaction (i.e. the set and the reverse complement 
+    of each member).  The fidelity of the set is the product of the fidelities 
+    of each of those overhangs.  Sets that contain palindromes, duplicates, or 
+    reverse-complementary pairs can't assemble in a defined order, and are 
+    given a fidelity of 0.
+
+    Returns a 1D array with one fidelity for each set.
+    """
+    import numpy as np
+
+    sets = np.array(indices_from_overhangs(sets), ndmin=2)
+    num_sets, n = sets.shape
+    data = np.asarray(data, dtype=float)
+    rc = np.array(rc_indices)
+
+    # Gather the (2n x 2n) block of the matrix for every set, in chunks so that 
+    # memory use stays bounded for millions of sets.
+
+    chunk_size = chunk_size or max(1, 2**22 // (4 * n * n))
+    fidelities = np.empty(num_sets)
+
+    for i in range(0, num_sets, chunk_size):
+        ends = sets[i:i+chunk_size]
+        ends = np.concatenate([ends, rc[ends]], axis=1)
+
+        correct = data[ends, rc[ends]]
+        total = data[ends[:,:,np.newaxis], ends[:,np.newaxis,:]].sum(axis=2)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fidelity = np.prod(correct / total, axis=1)
+
+        ends.sort(axis=1)
+        ambiguous = (ends[:,1:] == ends[:,:-1]).any(axis=1)
+        fidelity[ambiguous] = 0
+
+        fidelities[i:i+chunk_size] = np.nan_to_num(fidelity)
+
+    return fidelities
+
+def score_overhangs(overhangs, data):
+    return score_overhang_sets([overhangs], data)[0]
+
+def search_overhangs(num, required, data, time_limit=3, seed=None):
+    """
+    Find `num` overhangs that, together with the `required` overhangs, make a 
+    set with the highest possible fidelity (see `score_overhang_sets()`).
+
+    The search keeps track of which overhangs are still available using 
+    256-bit masks, so palindromes and the reverse complements of overhangs 
+    already in the set are never scored.  A randomized greedy construction is 
+    followed by a local search that swaps one overhang at a time, restarting 
+    from scratch whenever the search gets stuck, until `time_limit` seconds 
+    have passed.  Every candidate for a given step is scored in one 
+    vectorized call.
+
+    Returns the best set found (as sequences, required overhangs first) and 
+    its fidelity.
+    """
+    import numpy as np
+    from time import monotonic
+
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=float)
+    required = [int(x) for x in indices_from_overhangs(list(required))]
+    deadline = monotonic() + time_limit
+
+    ends = required + [rc_indices[i] for i in required]
+    if len(set(ends)) < len(ends):
+        raise ValueError("the required overhangs can't be assembled in a defined order (they contain palindromes, duplicates, or reverse complements)")
+
+    available = 0
+    for i, x in enumerate(all_overhangs):
+        if i != rc_indices[i]:
+            available |= 1 << i
+    for i in required:
+        available &= ~bitset_from_overhang(i)
+
+    if bin(available).count('1') // 2 < num:
+        raise ValueError(f"only {bin(available).count('1') // 2} overhangs are compatible with the required ones, but {num} were requested")
+
+    def best_additions(chosen, candidates):
+        # Score every candidate added to the current set in a single call.
+        sets = np.empty((len(candidates), len(chosen) + 1), dtype=int)
+        sets[:,:-1] = chosen
+        sets[:,-1] = candidates
+        return score_overhang_sets(sets, data)
+
+    def construct():
+        chosen = list(required)
+        mask = available
+
+        for _ in range(num):
+            candidates = indices_from_bitset(mask)
+            scores = best_additions(chosen, candidates)
+
+            # Pick randomly among the best few candidates, so that each 
+            # restart explores a different part of the search space.
+            top = np.argsort(scores)[-3:]
+            pick = candidates[rng.choice(top)]
+
+            chosen.append(pick)
+            mask &= ~bitset_from_overhang(pick)
+
+        return chosen
+
+    def improve(chosen):
+        fidelity = score_overhang_sets([chosen], data)[0]
+
+        while monotonic() < deadline:
+            improved = False
+
+            for k in rng.permutation(range(len(required), len(chosen))):
+                others = chosen[:k] + chosen[k+1:]
+                mask = available
+                for i in others:
+                    mask &= ~bitset_from_overhang(i)
+
+                candidates = indices_from_bitset(mask)
+                scores = best_additions(others, candidates)
+                best = np.argmax(scores)
+
+                if scores[best] > fidelity * (1 + 1e-9):
+                    chosen = others[:k] + [candidates[best]] + others[k:]
+                    fidelity = scores[best]
+                    improved = True
+
+                if monotonic() > deadline:
+                    break
+
+            if not improved:
+                break
+
+        return chosen, fidelity
+
+    best_set, best_fidelity = None, -1
+
+    while best_set is None or monotonic() < deadline:
+        chosen, fidelity = improve(construct())
+
+        if fidelity > best_fidelity:
+            best_set, best_fidelity = chosen, fidelity
+
+    return [all_overhangs[i] for i in best_set], best_fidelity
+
+def bitset_from_overhang(i):
+    return (1 << i) | (1 << rc_indices[i])
+
+def indices_from_bitset(mask):
+    return [i for i in range(256) if mask >> i & 1]
+
+def overhangs_from_args(args):
+    """
+    Interpret each argument as either an overhang sequence or the name of a 
+    junction set.  For sets with more than one list of junctions, the first 
+    is used (e.g. the Level 1 junctions for Weber2011).
+    """
+    overhangs = []
+
+    for arg in args:
+        if re.fullmatch('[ACGTacgt]{4}', arg):
+            overhangs.append(arg.upper())
+        else:
+            key = find_set(arg)
+            overhangs += junctions[key][0]
+
+    return list(dict.fromkeys(overhangs))
+
+def find_set(name):
+    """
+    Return the name of the junction set that best matches the given name or 
+    alias.  Exact matches and unambiguous prefixes are looked up directly in 
+    `set_index`.  Only if neither exists are the names compared by edit 
+    distance, and then only names within a few edits are considered.
+    """
+    query = normalize_set_name(name)
+    key = set_index.get(query)
+
+    if key is None:
+        max_dist = max(2, len(query) // 2)
+        dists = {
+                x: levenshtein(query, x, max_dist)
+                for x in set_names
+        }
+        best = min(dists, key=dists.get)
+
+        if dists[best] > max_dist:
+            raise ValueError(f"unknown junction set '{name}', the options are: {', '.join(junctions)}")
+
+        key = set_names[best]
+
+    if normalize_set_name(key) != query:
+        print(f"Info: Chose {key} based on similarity to '{name}'.", file=sys.stderr)
+
+    return key
+
+def normalize_set_name(name):
+    return re.sub('[^0-9a-z]', '', name.lower())
+
+def build_set_index():
+    """
+    Map every normalized set name and alias, and every unambiguous prefix of 
+    those names, to the set it refers to.
+    """
+    names = {normalize_set_name(x): x for x in junctions}
+    names.update({normalize_set_name(k): v for k, v in aliases.items()})
+
+    prefixes = {}
+    for name, key in names.items():
+        for i in range(1, len(name)):
+            prefix = name[:i]
+            prefixes[prefix] = key if prefixes.get(prefix, key) == key else None
+
+    index = {k: v for k, v in prefixes.items() if v is not None}
+    index.update(names)
+    return names, index
+
+def levenshtein(a, b, max_dist):
+    """
+    Calculate the edit distance between the given strings, giving up (and 
+    returning `max_dist + 1`) as soon as it's clear that the distance will 
+    exceed `max_dist`.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+
+    prev = list(range(len(b) + 1))
+
+    for i, x in enumerate(a, 1):
+        curr = [i]
+        for j, y in enumerate(b, 1):
+            curr.append(min(prev[j] + 1, curr[j-1] + 1, prev[j-1] + (x != y)))
+        if min(curr) > max_dist:
+            return max_dist + 1
+        prev = curr
+
+    return min(prev[-1], max_dist + 1)
+
+set_names, set_index = build_set_index()
+
+def test_reverse_complement():
+    assert reverse_complement('AATG') == 'CATT'
+    assert reverse_complement('ACGT') == 'ACGT'
+
+    for i, x in enumerate(all_overhangs):
+        assert all_overhangs[rc_indices[i]] == reverse_complement(x)
+
+def test_score_overhang_sets():
+    import numpy as np
+    from pytest import approx, raises
+
+    i = overhang_indices
+    data = np.zeros((256, 256))
+    data[np.arange(256), rc_indices] = 100
+
+    assert score_overhangs(['AAAA', 'CCCC', 'AATG'], data) == approx(1)
+
+    data[i['AAAA'], i['GGGG']] = 100
+    data[i['CCCC'], i['CATT']] = 300
+
+    assert score_overhangs(['AAAA', 'CCCC'], data) == approx(0.5)
+    assert score_overhangs(['AAAA', 'CCCC', 'AATG'], data) == approx(0.5 * 0.25)
+    assert score_overhangs(['aaaa', 'cccc'], data) == approx(0.5)
+    assert score_overhangs([i['AAAA'], i['CCCC']], data) == approx(0.5)
+
+    # Palindromes, duplicates, and reverse complements:
+    assert score_overhangs(['AAAA', 'ACGT'], data) == 0
+    assert score_overhangs(['AAAA', 'AAAA'], data) == 0
+    assert score_overhangs(['AAAA', 'TTTT'], data) == 0
+
+    sets = [['AAAA', 'CCCC'], ['AAAA', 'ACGT'], ['AATG', 'GGAG']]
+    assert score_overhang_sets(sets, data) == approx([0.5, 0, 1])
+    assert score_overhang_sets(sets, data, chunk_size=2) == approx([0.5, 0, 1])
+
+    with raises(ValueError, match='AAA'):
+        score_overhangs(['AAA', 'CCCC'], data)
+
+def test_search_overhangs():
+    import numpy as np
+    from pytest import approx, raises
+
+    # Every pair of overhangs misligates, except within a small group of 
+    # overhangs that are perfectly orthogonal to each other.
+    group = ['AATG', 'GGAG', 'TACT', 'CGCT', 'GCTT']
+    ends = [overhang_indices[x] for x in group]
+    ends += [rc_indices[i] for i in ends]
+
+    data = np.ones((256, 256))
+    data[np.ix_(ends, ends)] = 0
+    data[np.arange(256), rc_indices] = 100
+
+    overhangs, fidelity = search_overhangs(
+            3, ['AATG'], data, time_limit=0.5, seed=0)
+
+    assert overhangs[0] == 'AATG'
+    assert len(overhangs) == 4
+    assert set(overhangs) <= set(group) | {reverse_complement(x) for x in group}
+    assert fidelity == approx(1)
+    assert score_overhangs(overhangs, data) == approx(fidelity)
+
+    with raises(ValueError, match='reverse complements'):
+        search_overhangs(1, ['AATG', 'CATT'], data, time_limit=0)
+
+def test_overhangs_from_args():
+    assert overhangs_from_args(['AATG', 'gcaa']) == ['AATG', 'GCAA']
+    assert overhangs_from_args(['AATG', 'Weber2011']) == [
+            'AATG', 'GGAG', 'TACT', 'AGGT', 'GCTT', 'CGCT',
+    ]
+
+def test_find_set(capsys):
+    from pytest import raises
+
+    assert find_set('Potapov2018/37C') == 'Potapov2018/37C'
+    assert find_set('potapov2018-37c') == 'Potapov2018/37C'
+    assert find_set('neb') == 'Potapov2018/37C'
+    assert find_set('neb/16') == 'Potapov2018/16C'
+    assert find_set('moclo') == 'Weber2011'
+    assert find_set('mocl') == 'Weber2011'
+    assert find_set('weber') == 'Weber2011'
+    assert find_set('goldenbraid2') == 'SarrionPerdigones2013'
+    assert find_set('sarrion2011') == 'SarrionPerdigones2011'
+    assert find_set('iversen2016') == 'Iverson2016'
+    assert find_set('mocloo') == 'Weber2011'
+
+    # Fuzzy matches are reported on stderr, so stdout stays clean.
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert "Info: Chose Weber2011 based on similarity to 'mocloo'." in captured.err
+
+    with raises(ValueError, match='unknown'):
+        find_set('xxxxxxxxxxxx')
+
+def test_levenshtein():
+    assert levenshtein('moclo', 'moclo', 2) == 0
+    assert levenshtein('moclo', 'mocla', 2) == 1
+    assert levenshtein('moclo', 'cidar', 2) == 3
+    assert levenshtein('moclo', 'moclo2', 2) == 1
+    assert levenshtein('', 'neb', 3) == 3
+
+def test_load_ligation_data(tmp_path):
+    import numpy as np
+    from pytest import raises
+
+    path = tmp_path / 'ligation.npz'
+    data = np.arange(256**2, dtype=np.uint32).reshape(256, 256)
+    np.savez_compressed(path, **{'01h_37C': data})
+
+    assert (load_ligation_data(path=path) == data).all()
+
+    with raises(ValueError, match='01h_37C'):
+        load_ligation_data('18h_25C', path=path)
+    with raises(ValueError, match='import'):
+        load_ligation_data(path=tmp_path / 'missing.npz')
+
+
+def main(argv=None):
     import docopt, sys
-    from textdistance import levenshtein
-    from functools import partial
 
-    args = docopt.docopt(__doc__)
+    args = docopt.docopt(__doc__, argv=argv)
+
+    # Handle the subcommands:
+
+    try:
+        if args['import']:
+            path = import_ligation_data(args['<xlsx>'])
+            print(f"Info: Wrote {path}")
+            sys.exit()
+
+        if args['search']:
+            data = load_ligation_data(args['--data'])
+            required = overhangs_from_args(args['<required>'])
+            overhangs, fidelity = search_overhangs(
+                    int(args['<num>']),
+                    required,
+                    data,
+                    time_limit=float(args['--time']),
+                    seed=args['--seed'] and int(args['--seed']),
+            )
+            print('\n'.join(overhangs))
+            print(f"Info: Expected fidelity is {100 * fidelity:.1f}%.")
+            sys.exit()
+
+        if args['score']:
+            data = load_ligation_data(args['--data'])
+            fidelity = score_overhangs(args['<overhangs>'], data)
+            print(f"{100 * fidelity:.1f}%")
+            sys.exit()
+
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit()
+
     n = int(args['<num>'])
 
     # Decide which set the user asked for (using fuzzy matching):
 
-    keys = list(aliases.keys()) + list(junctions.keys())
-    by_edit_dist = partial(levenshtein, args['<set>'] or 'Potapov2018/37C')
-    key = sorted(keys, key=by_edit_dist)[0]
-
-    if key not in junctions:
-        key = aliases.get(key, key)
-        print(f"Info: Chose {key} based on similarity to '{args['<set>']}'.")
+    try:
+        key = find_set(args['<set>'] or 'Potapov2018/37C')
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit()
 
     # Find the smallest set with at least the requested number of junctions:
     
@@ -147,5 +660,5 @@ if __name__== '__main__':
 
     print('\n'.join(smallest_set[:n]))
 
-
-
+if __name__ == '__main__':
+    main()
@@ -52,174 +52,189 @@ Options:
 
 """
 
-import docopt
 import dirty_water
 import stepwise
-from inform import warn, plural
-
-args = docopt.docopt(__doc__)
-protocol = stepwise.Protocol()
-
-## Calculate reagent volumes.
-
-ivt = dirty_water.Reaction()
-ivt.num_reactions = eval(args['<reactions>'])
-ivt.extra_master_mix = float(args['--extra'])
-
-if args['--dna-vol']:
-    dna_uL = float(args['--dna-vol'])
-    dna_ng_uL = float(args['--dna-conc'])
-    err = {
-            'desired_dna': f'{dna_uL} µL',
-            'max_dna': lambda x: f'{x} µL',
-    }
-else:
-    dna_ng = float(args['--dna-ng'])
-    dna_ng_uL = float(args['--dna-conc'])
-    dna_uL = dna_ng / dna_ng_uL
-    err = {
-            'desired_dna': f'{dna_ng} ng',
-            'max_dna': lambda x: f'{x * dna_ng_uL} ng',
-    }
-
-if 'hiscribe'.startswith(args['--kit'].lower()):
-    incubation_time = args['--incubate'] or 2
-    incubation_temp = '37'
-
-    non_reagent_uL = 20 - 12.5
-    water_uL = non_reagent_uL - dna_uL
-
-    if water_uL <= 0:
-        warn = f"Cannot reach the recommended {err['desired_dna']} of DNA, using {err['max_dna'](non_reagent_uL)} instead."
-        dna_uL = non_reagent_uL
+from inform import plural
+
+def make_reaction(num_reactions, dna_ng_uL=500, dna_ng=1000, dna_uL=None,
+        kit='hiscribe', extra_percent=10, rntp_mix=True):
+    """
+    Return a `dirty_water.Reaction` for the given number of in vitro
+    transcription reactions, along with the recommended incubation time (h)
+    and temperature (°C) for the kit, and a warning if the requested amount
+    of DNA doesn't fit in the reaction (or None).
+    """
+    ivt = dirty_water.Reaction()
+    ivt.num_reactions = num_reactions
+    ivt.extra_master_mix = extra_percent
+    warning = None
+
+    if dna_uL is not None:
+        err = {
+                'desired_dna': f'{dna_uL} µL',
+                'max_dna': lambda x: f'{x} µL',
+        }
     else:
-        ivt['nuclease-free water'].std_volume = water_uL, 'μL'
-        ivt['nuclease-free water'].master_mix = True
-
-    ivt['reaction buffer'].std_volume = 2.0, 'μL'
-    ivt['reaction buffer'].std_stock_conc = '10x'
-    ivt['reaction buffer'].master_mix = True
-
-    ivt['RNase inhibitor'].std_volume = 0.5, 'μL'
-    ivt['RNase inhibitor'].master_mix = True
-    ivt['RNase inhibitor'].std_stock_conc = 40, 'U/μL'
-    ivt['RNase inhibitor'].product_number = 'NEB M0307S'
-
-    if args['--no-rntp-mix']:
-        ivt['ATP'].std_volume = 2.0, 'μL'
-        ivt['ATP'].master_mix = True
-        ivt['ATP'].std_stock_conc = 100, 'mM'
-
-        ivt['CTP'].std_volume = 2.0, 'μL'
-        ivt['CTP'].master_mix = True
-        ivt['CTP'].std_stock_conc = 100, 'mM'
-
-        ivt['GTP'].std_volume = 2.0, 'μL'
-        ivt['GTP'].master_mix = True
-        ivt['GTP'].std_stock_conc = 100, 'mM'
-
-        ivt['UTP'].std_volume = 2.0, 'μL'
-        ivt['UTP'].master_mix = True
-        ivt['UTP'].std_stock_conc = 100, 'mM'
+        dna_uL = dna_ng / dna_ng_uL
+        err = {
+                'desired_dna': f'{dna_ng} ng',
+                'max_dna': lambda x: f'{x * dna_ng_uL} ng',
+        }
+
+    if 'hiscribe'.startswith(kit.lower()):
+        incubation_h = 2
+        incubation_temp = '37'
+
+        non_reagent_uL = 20 - 12.5
+        water_uL = non_reagent_uL - dna_uL
+
+        if water_uL <= 0:
+            warning = f"Cannot reach the recommended {err['desired_dna']} of DNA, using {err['max_dna'](non_reagent_uL)} instead."
+            dna_uL = non_reagent_uL
+        else:
+            ivt['nuclease-free water'].std_volume = water_uL, 'μL'
+            ivt['nuclease-free water'].master_mix = True
+
+        ivt['reaction buffer'].std_volume = 2.0, 'μL'
+        ivt['reaction buffer'].std_stock_conc = '10x'
+        ivt['reaction buffer'].master_mix = True
+
+        ivt['RNase inhibitor'].std_volume = 0.5, 'μL'
+        ivt['RNase inhibitor'].master_mix = True
+        ivt['RNase inhibitor'].std_stock_conc = 40, 'U/μL'
+        ivt['RNase inhibitor'].product_number = 'NEB M0307S'
+
+        if not rntp_mix:
+            ivt['ATP'].std_volume = 2.0, 'μL'
+            ivt['ATP'].master_mix = True
+            ivt['ATP'].std_stock_conc = 100, 'mM'
+
+            ivt['CTP'].std_volume = 2.0, 'μL'
+            ivt['CTP'].master_mix = True
+            ivt['CTP'].std_stock_conc = 100, 'mM'
+
+            ivt['GTP'].std_volume = 2.0, 'μL'
+            ivt['GTP'].master_mix = True
+            ivt['GTP'].std_stock_conc = 100, 'mM'
+
+            ivt['UTP'].std_volume = 2.0, 'μL'
+            ivt['UTP'].master_mix = True
+            ivt['UTP'].std_stock_conc = 100, 'mM'
+        else:
+            ivt['rNTP mix'].std_volume = 8.0, 'μL'
+            ivt['rNTP mix'].std_stock_conc = 100, 'mM'
+            ivt['rNTP mix'].master_mix = True
+
+        ivt['HiScribe T7'].std_volume = 2.0, 'μL'
+        ivt['HiScribe T7'].std_stock_conc = '10x'
+        ivt['HiScribe T7'].master_mix = True
+        ivt['HiScribe T7'].product_number = 'NEB E2040S'
+
+        ivt['DNA template'].std_volume = dna_uL, 'μL'
+        ivt['DNA template'].std_stock_conc = dna_ng_uL, 'ng/μL'
+
+    elif 'ampliscribe'.startswith(kit.lower()):
+        incubation_h = 1
+        incubation_temp = '42'
+
+        non_reagent_uL = 20 - 2.0 - 7.2 - 2.0 - 0.5 - 2.0
+        water_uL = non_reagent_uL - dna_uL
+
+        if water_uL <= 0:
+            warning = f"Cannot reach the recommended {err['desired_dna']} of DNA, using {err['max_dna'](non_reagent_uL)} instead."
+            dna_uL = non_reagent_uL
+        else:
+            ivt['nuclease-free water'].std_volume = water_uL, 'μL'
+            ivt['nuclease-free water'].master_mix = True
+
+        ivt['reaction buffer'].std_volume = 2.0, 'μL'
+        ivt['reaction buffer'].std_stock_conc = '10x'
+        ivt['reaction buffer'].master_mix = True
+
+        if not rntp_mix:
+            ivt['ATP'].std_volume = 1.8, 'μL'
+            ivt['ATP'].std_stock_conc = 100, 'mM'
+            ivt['ATP'].master_mix = True
+            ivt['CTP'].std_volume = 1.8, 'μL'
+            ivt['CTP'].std_stock_conc = 100, 'mM'
+            ivt['CTP'].master_mix = True
+            ivt['GTP'].std_volume = 1.8, 'μL'
+            ivt['GTP'].std_stock_conc = 100, 'mM'
+            ivt['GTP'].master_mix = True
+            ivt['UTP'].std_volume = 1.8, 'μL'
+            ivt['UTP'].std_stock_conc = 100, 'mM'
+            ivt['UTP'].master_mix = True
+        else:
+            ivt['rNTP mix'].std_volume = 7.2, 'μL'
+            ivt['rNTP mix'].std_stock_conc = 100, 'mM'
+            ivt['rNTP mix'].master_mix = True
+
+        ivt['DTT'].std_volume = 2.0, 'μL'
+        ivt['DTT'].std_stock_conc = 100, 'mM'
+        ivt['DTT'].master_mix = True
+        ivt['RiboGuard RNase innhibitor'].std_volume = 0.5, 'μL'
+        ivt['RiboGuard RNase innhibitor'].std_stock_conc = '40x'
+        ivt['RiboGuard RNase innhibitor'].master_mix = True
+        ivt['Ampliscribe T7 (Epicentre)'].std_volume = 2.0, 'μL'
+        ivt['Ampliscribe T7 (Epicentre)'].std_stock_conc = '10x'
+        ivt['Ampliscribe T7 (Epicentre)'].master_mix = True
+        ivt['DNA template'].std_volume = dna_uL, 'μL'
+        ivt['DNA template'].std_stock_conc = dna_ng_uL, 'ng/μL'
+
     else:
-        ivt['rNTP mix'].std_volume = 8.0, 'μL'
-        ivt['rNTP mix'].std_stock_conc = 100, 'mM'
-        ivt['rNTP mix'].master_mix = True
+        raise ValueError(f"unknown in vitro transcription kit: '{kit}' (known kits are 'hiscribe' and 'ampliscribe')")
 
-    ivt['HiScribe T7'].std_volume = 2.0, 'μL'
-    ivt['HiScribe T7'].std_stock_conc = '10x'
-    ivt['HiScribe T7'].master_mix = True
-    ivt['HiScribe T7'].product_number = 'NEB E2040S'
+    return ivt, incubation_h, incubation_temp, warning
 
-    ivt['DNA template'].std_volume = dna_uL, 'μL'
-    ivt['DNA template'].std_stock_conc = dna_ng_uL, 'ng/μL'
+def make_protocol(num_reactions, dna_ng_uL=500, dna_ng=1000, dna_uL=None,
+        kit='hiscribe', incubate_h=None, extra_percent=10, rntp_mix=True,
+        cleanup='zymo', gel=False):
+    """
+    Return a `stepwise.Protocol` for the given number of in vitro
+    transcription reactions.  The arguments mirror the command-line options.
+    """
+    protocol = stepwise.Protocol()
 
-elif 'ampliscribe'.startswith(args['--kit'].lower()):
-    incubation_time = args['--incubate'] or 1
-    incubation_temp = '42'
+    ## Calculate reagent volumes.
 
-    non_reagent_uL = 20 - 2.0 - 7.2 - 2.0 - 0.5 - 2.0
-    water_uL = non_reagent_uL - dna_uL
+    ivt, incubation_time, incubation_temp, warning = make_reaction(
+            num_reactions, dna_ng_uL, dna_ng, dna_uL, kit, extra_percent,
+            rntp_mix)
+    incubation_time = incubate_h or incubation_time
 
-    if water_uL <= 0:
-        warn = f"Cannot reach the recommended {err['desired_dna']} of DNA, using {err['max_dna'](non_reagent_uL)} instead."
-        dna_uL = non_reagent_uL
-    else:
-        ivt['nuclease-free water'].std_volume = water_uL, 'μL'
-        ivt['nuclease-free water'].master_mix = True
-
-    ivt['reaction buffer'].std_volume = 2.0, 'μL'
-    ivt['reaction buffer'].std_stock_conc = '10x'
-    ivt['reaction buffer'].master_mix = True
-
-    if args['--no-rntp-mix']:
-        ivt['ATP'].std_volume = 1.8, 'μL'
-        ivt['ATP'].std_stock_conc = 100, 'mM'
-        ivt['ATP'].master_mix = True
-        ivt['CTP'].std_volume = 1.8, 'μL'
-        ivt['CTP'].std_stock_conc = 100, 'mM'
-        ivt['CTP'].master_mix = True
-        ivt['GTP'].std_volume = 1.8, 'μL'
-        ivt['GTP'].std_stock_conc = 100, 'mM'
-        ivt['GTP'].master_mix = True
-        ivt['UTP'].std_volume = 1.8, 'μL'
-        ivt['UTP'].std_stock_conc = 100, 'mM'
-        ivt['UTP'].master_mix = True
-    else:
-        ivt['rNTP mix'].std_volume = 7.2, 'μL'
-        ivt['rNTP mix'].std_stock_conc = 100, 'mM'
-        ivt['rNTP mix'].master_mix = True
-
-    ivt['DTT'].std_volume = 2.0, 'μL'
-    ivt['DTT'].std_stock_conc = 100, 'mM'
-    ivt['DTT'].master_mix = True
-    ivt['RiboGuard RNase innhibitor'].std_volume = 0.5, 'μL'
-    ivt['RiboGuard RNase innhibitor'].std_stock_conc = '40x'
-    ivt['RiboGuard RNase innhibitor'].master_mix = True
-    ivt['Ampliscribe T7 (Epicentre)'].std_volume = 2.0, 'μL'
-    ivt['Ampliscribe T7 (Epicentre)'].std_stock_conc = '10x'
-    ivt['Ampliscribe T7 (Epicentre)'].master_mix = True
-    ivt['DNA template'].std_volume = dna_uL, 'μL'
-    ivt['DNA template'].std_stock_conc = dna_ng_uL, 'ng/μL'
-
-else:
-    print("Unknown in vitro transcription kit: '{}'".format(args['--kit']))
-    print("Known kits are: 'hiscribe' or 'ampliscribe'")
-    raise SystemExit
-
-## Clean your bench
-
-protocol += """\
+    ## Clean your bench
+
+    protocol += """\
 Wipe down your bench and anything you'll touch 
 (pipets, racks, pens, etc.) with RNaseZap."""
 
-## In vitro transcription
+    ## In vitro transcription
 
-protocol += """\
+    protocol += """\
 Setup {:# in vitro transcription reaction/s} by 
 mixing the following reagents at room temperature 
 in the order given{}.
 
 {}""".format(
-        plural(ivt.num_reactions), ' [1]' if warn else '', ivt)
+            plural(ivt.num_reactions), ' [1]' if warning else '', ivt)
 
-if warn:
-    from textwrap import fill
-    protocol.footnotes[1] = fill(warn, width=49)
+    if warning:
+        from textwrap import fill
+        protocol.footnotes[1] = fill(warning, width=49)
 
-protocol += """\
+    protocol += """\
 Incubate at {}°C (thermocycler) for {:# hour/s}.""".format(
-        incubation_temp, plural(incubation_time))
+            incubation_temp, plural(incubation_time))
 
-## Purify product
+    ## Purify product
 
-if args['--cleanup'] == 'zymo':
-    protocol += """\
+    if cleanup == 'zymo':
+        protocol += """\
 Remove unincorporated ribonucleotides using Zymo 
 RNA Clean & Concentrator 25 spin columns."""
 
-elif args['--cleanup'] == 'ammonium':
-    protocol += """\
+    elif cleanup == 'ammonium':
+        protocol += """\
 Remove unincorporated ribonucleotides using
 ammonium acetate precipitation.
 
@@ -239,45 +254,71 @@ d. Wash pellet with 70% ethanol.
 
 e. Dissolve pellet in 20μL nuclease-free water."""
 
-elif args['--cleanup'] == 'none':
-    raise SystemExit
+    elif cleanup == 'none':
+        return protocol
 
-else:
-    raise ValueError("unknown RNA clean-up method: '{}'".format(args['--cleanup']))
+    else:
+        raise ValueError("unknown RNA clean-up method: '{}'".format(cleanup))
 
-## Nanodrop concentration
+    ## Nanodrop concentration
 
-protocol += """\
+    protocol += """\
 Nanodrop to determine the RNA concentration."""
 
-## Aliquot
+    ## Aliquot
 
-protocol += """\
+    protocol += """\
 Dilute (if desired) enough RNA to make several 
 10 μM aliquots and to run a gel.  Keep any left- 
 over RNA undiluted.  Flash-freeze in liquid N₂ and 
 store at -80°C."""
 
-## Gel electrophoresis
+    ## Gel electrophoresis
 
-if not args['--gel']:
-    protocol += """\
+    if not gel:
+        protocol += """\
 Run the RNA on a denaturing gel to make sure it's 
 homogeneous and of the right size."""
 
-else:
-    import tbe_urea_gel
-    protocol += tbe_urea_gel.protocol
-
-
-print(protocol)
-
-if args['--verbose']:
-    print("""\
+    else:
+        import cast_tbe_urea_gel
+        for step in cast_tbe_urea_gel.make_protocol().steps:
+            protocol += step
+
+    return protocol
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+
+    try:
+        protocol = make_protocol(
+                num_reactions=eval(args['<reactions>']),
+                dna_ng_uL=float(args['--dna-conc']),
+                dna_ng=float(args['--dna-ng']),
+                dna_uL=float(args['--dna-vol']) if args['--dna-vol'] else None,
+                kit=args['--kit'],
+                incubate_h=eval(args['--incubate']) if args['--incubate'] else None,
+                extra_percent=float(args['--extra']),
+                rntp_mix=not args['--no-rntp-mix'],
+                cleanup=args['--cleanup'],
+                gel=args['--gel'],
+        )
+    except ValueError as err:
+        print(f"Error: {err}")
+        raise SystemExit(1)
+
+    print(protocol)
+
+    if args['--verbose']:
+        print("""\
 Comments
 ========
 - I've found that T7 kits which have been in the 
   freezer for more than ≈4 weeks seem to produce 
   more degraded RNA.""")
 
+if __name__ == '__main__':
+    main()
+
 # vim: tw=50
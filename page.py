@@ -34,14 +34,8 @@ Options:
 """
 
 import stepwise
-import docopt
 
-args = docopt.docopt(__doc__)
-
-# Work out what to do based on the type of gel being run.
-params = {}
-
-def config_sds(params):
+def config_sds(params, coomassie=False):
     params['title'] = 'SDS'
     params['sample_mix'] = stepwise.MasterMix.from_text("""\
 Reagent                 Stock      Volume  MM?
@@ -56,7 +50,7 @@ protein                            2.5 µL
     params['load'] = params['sample_mix'].volume
     params['run'] = "165V for 42 min"
 
-def config_sds_max(params):
+def config_sds_max(params, coomassie=False):
     config_sds(params)
     params['sample_mix'] = stepwise.MasterMix.from_text("""\
 Reagent                 Stock       Volume  MM?
@@ -67,7 +61,7 @@ protein                        to 15.39 µL
 """)
     params['load'] = params['sample_mix'].volume
 
-def config_native(params):
+def config_native(params, coomassie=False):
     params['title'] = 'native'
     params['sample_mix'] = stepwise.MasterMix.from_text("""\
 Reagent             Stock      Volume  MM?
@@ -83,10 +77,10 @@ DNA/protein                   1.25 µL
     params['hints'] = """\
 - For a DNA ladder, use 5 µL (50 ng/µL).
 """
-    if not args['--coomassie']:
+    if not coomassie:
         del params['sample_mix']['G-250 additive']
 
-def config_urea(params):
+def config_urea(params, coomassie=False):
     params['title'] = 'TBE/urea'
     params['sample_mix'] = stepwise.MasterMix.from_text("""\
 Reagent             Stock    Volume  MM?
@@ -106,41 +100,66 @@ RNA/DNA         200 ng/µL      1 µL
 Stain in 1x PAGE GelRed for 30 min.
 """
 
-if args['sds']:
-    config_sds(params)
-if args['sdsmax']:
-    config_sds_max(params)
-if args['native']:
-    config_native(params)
-if args['urea']:
-    config_urea(params)
-
-params['sample_mix'].num_reactions = eval(args['<n>'])
-params['sample_mix'].extra_percent = 50
-
-# Print the protocol.
-protocol = stepwise.Protocol()
-
-step = f"Prepare samples for {params['title']} PAGE:\n\n"
-if 'sample_mix' in params:
-    step += f"{params['sample_mix']}\n\n"
-if 'hints' in params:
-    step += f"{params['hints'].strip()}\n"
-if 'incubate' in params:
-    step += f"- Incubate at {params['incubate']}."
-
-protocol += step
-
-protocol += f"""\
+gel_configs = {
+        'sds': config_sds,
+        'sdsmax': config_sds_max,
+        'native': config_native,
+        'urea': config_urea,
+}
+
+def make_protocol(gel, num_samples, percent=None, coomassie=False):
+    """
+    Return a `stepwise.Protocol` for loading, running, and staining the given 
+    kind of gel, which must be one of the keys in `gel_configs`.
+    """
+    try:
+        config = gel_configs[gel]
+    except KeyError:
+        raise ValueError(f"unknown gel: '{gel}' (known gels are: {', '.join(gel_configs)})") from None
+
+    # Work out what to do based on the type of gel being run.
+    params = {}
+    config(params, coomassie=coomassie)
+
+    params['sample_mix'].num_reactions = num_samples
+    params['sample_mix'].extra_percent = 50
+
+    protocol = stepwise.Protocol()
+
+    step = f"Prepare samples for {params['title']} PAGE:\n\n"
+    if 'sample_mix' in params:
+        step += f"{params['sample_mix']}\n\n"
+    if 'hints' in params:
+        step += f"{params['hints'].strip()}\n"
+    if 'incubate' in params:
+        step += f"- Incubate at {params['incubate']}."
+
+    protocol += step
+
+    protocol += f"""\
 Run the gel:
 
-- Use a {args['--percent'] or params['percent']} {params['title']} PAGE gel.
+- Use a {percent or params['percent']} {params['title']} PAGE gel.
 - Load {params['load']} of each sample.
 - Run at {params['run']}.
 """
 
-if 'stain' in params:
-    protocol += params['stain']
+    if 'stain' in params:
+        protocol += params['stain']
+
+    return protocol
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    gel = next(k for k in gel_configs if args[k])
 
-print(protocol)
+    protocol = make_protocol(
+            gel, eval(args['<n>']),
+            percent=args['--percent'],
+            coomassie=args['--coomassie'],
+    )
+    print(protocol)
 
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,10 @@ Arguments:
 
     <annealing_temp>
         The annealing temperature for the PCR reaction (in °C).  I typically 
-        use NEB's online "Tm Calculator" to determine this parameter.
+        use NEB's online "Tm Calculator" to determine this parameter.  
+        Alternatively, specify "auto" to calculate the annealing temperature 
+        locally from the primer sequences given by --fwd-seq and --rev-seq 
+        (see `primer_tm.py`).
 
     <extension_time>
         The length of the extension step in seconds.  The rule of thumb is 30 
@@ -51,6 +54,14 @@ Options:
     -P --no-primer-mix
         Don't show how to prepare the 10x primer mix.
 
+    --fwd-seq <seq>
+        The sequence of the part of the forward primer that anneals to the 
+        template.  Only used if <annealing_temp> is "auto".
+
+    --rev-seq <seq>
+        The sequence of the part of the reverse primer that anneals to the 
+        template.  Only used if <annealing_temp> is "auto".
+
     --dna-final-conc <pg_uL>
         The final concentration of the template DNA in units of pg/µL.
 
@@ -59,29 +70,93 @@ Options:
 
 """
 
-import docopt
 import dirty_water
 
-args = docopt.docopt(__doc__)
-pcr = dirty_water.Pcr(
-        template=args['<template>'],
-        fwd_primer=args['<fwd_primer>'],
-        rev_primer=args['<rev_primer>'],
-        polymerase=args['--polymerase'],
-)
-pcr.num_reactions = eval(args['<num_reactions>'])
-pcr.annealing_temp = args['<annealing_temp>']
-pcr.extension_time = args['<extension_time>']
-pcr.dmso = 'dmso' in args['--additives']
-pcr.betaine = 'betaine' in args['--additives']
-pcr.template_in_master_mix = 'dna' in args['--master-mix'] and not args['--nothing-in-master-mix']
-pcr.primers_in_master_mix = 'primers' in args['--master-mix'] and not args['--nothing-in-master-mix']
-pcr.additives_in_master_mix = 'additives' in args['--master-mix'] and not args['--nothing-in-master-mix']
-pcr.make_primer_mix = not args['--no-primer-mix']
-pcr.reaction.volume = float(args['--reaction-volume'])
-pcr.reaction[args['<template>']].stock_conc = float(args['--dna-stock-conc'])
-
-if args['--dna-final-conc']:
-    pcr.reaction[args['<template>']].conc = float(args['--dna-final-conc'])
-
-print(pcr)
+def make_protocol(template, fwd_primer, rev_primer, num_reactions,
+        annealing_temp, extension_time, reaction_vol_uL=10,
+        master_mix=('dna',), polymerase='q5', additives=(), primer_mix=True,
+        dna_stock_pg_uL=100, dna_final_pg_uL=None, fwd_seq=None, rev_seq=None):
+    """
+    Return a `dirty_water.Pcr` protocol for the given reactions.
+
+    The annealing temperature can be "auto", in which case it is calculated 
+    from the given primer sequences (see `primer_tm.py`).  The master mix and 
+    additives are given as collections of the names accepted by the 
+    command-line options.
+    """
+    pcr = dirty_water.Pcr(
+            template=template,
+            fwd_primer=fwd_primer,
+            rev_primer=rev_primer,
+            polymerase=polymerase,
+    )
+    pcr.num_reactions = num_reactions
+    if annealing_temp == 'auto':
+        import primer_tm
+        if not fwd_seq or not rev_seq:
+            raise ValueError("need both primer sequences to calculate the annealing temperature")
+        pcr.annealing_temp = primer_tm.annealing_temp(
+                fwd_seq, rev_seq, polymerase)
+    else:
+        pcr.annealing_temp = annealing_temp
+    pcr.extension_time = extension_time
+    pcr.dmso = 'dmso' in additives
+    pcr.betaine = 'betaine' in additives
+    pcr.template_in_master_mix = 'dna' in master_mix
+    pcr.primers_in_master_mix = 'primers' in master_mix
+    pcr.additives_in_master_mix = 'additives' in master_mix
+    pcr.make_primer_mix = primer_mix
+    pcr.reaction.volume = reaction_vol_uL
+    pcr.reaction[template].stock_conc = dna_stock_pg_uL
+
+    if dna_final_pg_uL is not None:
+        pcr.reaction[template].conc = dna_final_pg_uL
+
+    return pcr
+
+def make_reaction(template, fwd_primer, rev_primer, num_reactions,
+        annealing_temp=60, extension_time=30, **kwargs):
+    """
+    Return the `dirty_water.Reaction` for the given PCR reactions.  The 
+    arguments are the same as for `make_protocol()`, except that the 
+    annealing temperature and extension time are optional, since they don't 
+    affect the reaction itself.
+    """
+    return make_protocol(
+            template, fwd_primer, rev_primer, num_reactions,
+            annealing_temp, extension_time, **kwargs).reaction
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    master_mix = args['--master-mix'].split(',')
+    if args['--nothing-in-master-mix']:
+        master_mix = ()
+    if args['<annealing_temp>'] == 'auto' and not (args['--fwd-seq'] and args['--rev-seq']):
+        raise SystemExit("Error: --fwd-seq and --rev-seq are required when <annealing_temp> is 'auto'")
+
+    try:
+        pcr = make_protocol(
+                template=args['<template>'],
+                fwd_primer=args['<fwd_primer>'],
+                rev_primer=args['<rev_primer>'],
+                num_reactions=eval(args['<num_reactions>']),
+                annealing_temp=args['<annealing_temp>'],
+                extension_time=args['<extension_time>'],
+                reaction_vol_uL=float(args['--reaction-volume']),
+                master_mix=master_mix,
+                polymerase=args['--polymerase'],
+                additives=args['--additives'].split(','),
+                primer_mix=not args['--no-primer-mix'],
+                dna_stock_pg_uL=float(args['--dna-stock-conc']),
+                dna_final_pg_uL=float(args['--dna-final-conc']) if args['--dna-final-conc'] else None,
+                fwd_seq=args['--fwd-seq'],
+                rev_seq=args['--rev-seq'],
+        )
+    except ValueError as err:
+        raise SystemExit(f"Error: {err}")
+
+    print(pcr)
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,10 @@ Arguments:
 
     <annealing_temp>
         The annealing temperature for the PCR reaction (in °C).  I typically 
-        use NEB's online "Tm Calculator" to determine this parameter.
+        use NEB's online "Tm Calculator" to determine this parameter.  
+        Alternatively, specify "auto" to calculate the annealing temperature 
+        locally from the primer sequences given by --fwd-seq and --rev-seq 
+        (see `primer_tm.py`).
 
     <extension_time>
         The length of the extension step in seconds.  The rule of thumb is 30 
@@ -55,6 +58,14 @@ Options:
     -P --no-primer-mix
         Don't show how to prepare the 10x primer mix.
 
+    --fwd-seq <seq>
+        The sequence of the part of the forward primer that anneals to the 
+        template.  Only used if <annealing_temp> is "auto".
+
+    --rev-seq <seq>
+        The sequence of the part of the reverse primer that anneals to the 
+        template.  Only used if <annealing_temp> is "auto".
+
     -n --num-pcr <N>
         The number of PCR reactions to measure master mix for. By default this 
         is the same as the number of reactions, but may be different if you're 
@@ -65,37 +76,47 @@ Options:
         transform the DNA.
 """
 
-import docopt
-import dirty_water
-
-args = docopt.docopt(__doc__)
-protocol = dirty_water.Protocol()
-
-## PCR
-
-if not args['--skip-pcr']:
-    pcr = dirty_water.Pcr(
-            template=args['<template>'],
-            fwd_primer=args['<fwd_primer>'],
-            rev_primer=args['<rev_primer>'],
-            polymerase=args['--polymerase'],
-    )
-    pcr.num_reactions = eval(args['--num-pcr']) if args['--num-pcr'] else eval(args['<num_reactions>'])
-    pcr.annealing_temp = args['<annealing_temp>']
-    pcr.extension_time = int(eval(args['<extension_time>']))
-    pcr.dmso = 'dmso' in args['--additives']
-    pcr.betaine = 'betaine' in args['--additives']
-    pcr.template_in_master_mix = 'dna' in args['--master-mix'] and not args['--nothing-in-master-mix']
-    pcr.primers_in_master_mix = 'primers' in args['--master-mix'] and not args['--nothing-in-master-mix']
-    pcr.additives_in_master_mix = 'additives' in args['--master-mix'] and not args['--nothing-in-master-mix']
-    pcr.make_primer_mix = not args['--no-primer-mix']
-    pcr.reaction.volume = float(args['--reaction-volume'])
-
-    protocol += pcr
-
-## Ligation
-
-kld = dirty_water.Reaction('''\
+def main(argv=None):
+    import docopt
+    import dirty_water
+    args = docopt.docopt(__doc__, argv=argv)
+    protocol = dirty_water.Protocol()
+
+    ## PCR
+
+    if not args['--skip-pcr']:
+        pcr = dirty_water.Pcr(
+                template=args['<template>'],
+                fwd_primer=args['<fwd_primer>'],
+                rev_primer=args['<rev_primer>'],
+                polymerase=args['--polymerase'],
+        )
+        pcr.num_reactions = eval(args['--num-pcr']) if args['--num-pcr'] else eval(args['<num_reactions>'])
+        if args['<annealing_temp>'] == 'auto':
+            import primer_tm
+            if not (args['--fwd-seq'] and args['--rev-seq']):
+                raise SystemExit("Error: --fwd-seq and --rev-seq are required when <annealing_temp> is 'auto'")
+            try:
+                pcr.annealing_temp = primer_tm.annealing_temp(
+                        args['--fwd-seq'], args['--rev-seq'], args['--polymerase'])
+            except ValueError as err:
+                raise SystemExit(f"Error: {err}")
+        else:
+            pcr.annealing_temp = args['<annealing_temp>']
+        pcr.extension_time = int(eval(args['<extension_time>']))
+        pcr.dmso = 'dmso' in args['--additives']
+        pcr.betaine = 'betaine' in args['--additives']
+        pcr.template_in_master_mix = 'dna' in args['--master-mix'] and not args['--nothing-in-master-mix']
+        pcr.primers_in_master_mix = 'primers' in args['--master-mix'] and not args['--nothing-in-master-mix']
+        pcr.additives_in_master_mix = 'additives' in args['--master-mix'] and not args['--nothing-in-master-mix']
+        pcr.make_primer_mix = not args['--no-primer-mix']
+        pcr.reaction.volume = float(args['--reaction-volume'])
+
+        protocol += pcr
+
+    ## Ligation
+
+    kld = dirty_water.Reaction('''\
 Reagent                Conc  Each Rxn  Master Mix
 ================  =========  ========  ==========
 water                         6.75 μL         yes
@@ -106,21 +127,24 @@ DpnI                20 U/μL   0.25 μL         yes
 PCR product       ≈50 ng/μL   1.50 μL
 ''')
 
-kld.num_reactions = eval(args['<num_reactions>'])
-kld.extra_master_mix = 15
-s = 's' if kld.num_reactions != 1 else ''
+    kld.num_reactions = eval(args['<num_reactions>'])
+    kld.extra_master_mix = 15
+    s = 's' if kld.num_reactions != 1 else ''
 
-protocol += """\
+    protocol += """\
 Setup {kld.num_reactions} ligation reaction{s}:
 
 {kld}
 
 - Incubate at room temperature for 1h."""
 
-## Transformation
+    ## Transformation
 
-protocol += """\
+    protocol += """\
 Transform 1 μL ligated DNA into 10 μL MACH1 
 chemically-competent cells."""
 
-print(protocol)
+    print(protocol)
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,51 @@ estimate can be updated as the culture grows.
 
 Usage:
     predict_od.py [gui]
+    predict_od.py [-s <path>]
+    predict_od.py plate <export> [-t <od>]
+    predict_od.py watch <directory> [-t <od>] [-i <seconds>]
+    predict_od.py report <export> <out_dir> [-t <od>] [-f <format>] [-j <n>]
+
+Arguments:
+    <export>
+        A kinetic plate reader export, i.e. a CSV or TSV file with one row per 
+        read and one column per well.  The time to reach the target OD and the 
+        doubling time will be printed for each well, in the order the wells 
+        should be harvested.
+
+    <directory>
+        A directory where the plate reader saves kinetic exports.  Whenever 
+        new reads appear (either appended to an existing export, or in a new 
+        one), they're added to the fit and the updated predictions are 
+        printed.
+
+    <out_dir>
+        The directory to save the report to.  The growth curve for each well 
+        is saved to its own image (e.g. "A1.png"), and all of the wells are 
+        tiled together in "plate.png".
+
+Options:
+    -s --session <path>
+        Record every measurement and setting to the given file, so that the 
+        session can be resumed (by passing the same file again) if the program 
+        is closed before the culture is ready.
+
+    -t --target-od <od>     [default: 0.6]
+        The OD that each culture should be harvested at.
+
+    -i --interval <seconds>  [default: 5]
+        How often to check the directory for new reads.
+
+    -f --format <format>    [default: png]
+        The image format for the report, e.g. "png" or "svg".
+
+    -j --workers <n>
+        The number of processes to render the report with.  By default, one 
+        process is used for each CPU.
 """
 
 ## Imports
-import os, numpy as np
+import os, re, numpy as np
 from cmd import Cmd
 from matplotlib import pyplot
 from pprint import pprint
@@ -22,7 +63,7 @@ from pprint import pprint
 from unittest.mock import Mock
 try:
     import gi; gi.require_version('Gtk', '3.0')
-    from gi.repository import Gtk, GObject
+    from gi.repository import Gtk, GObject, GLib
     from matplotlib.figure import Figure
     from matplotlib.backends.backend_gtk3agg \
             import FigureCanvasGTK3Agg as FigureCanvas
@@ -30,22 +71,40 @@ try:
     # Ignore a warning about ffi.cast() that I can't do anything about.
     import warnings; warnings.simplefilter("ignore", UserWarning)
 except ImportError:
-    Gtk, GObject, Figure, FigureCanvas = Mock(), Mock(), Mock(), Mock()
+    Gtk, GObject, GLib, Figure, FigureCanvas = Mock(), Mock(), Mock(), Mock(), Mock()
 
 
+time_regex = re.compile(r'(\d+)h(\d+)?|(\d+)m')
+
 class OdPredictor:
 
     def __init__(self):
         self.target_od = 0.6
         self._overnight_od = 4.0
         self._subculture_dilution = None
-        self._time_points = []
         self._growth_fit = (
                 4/250,          # 250x subculture dilution.
                 np.log(2)/30,   # 30 minute doubling time.
         )
         self._stale = True
 
+        # Running sums for fitting a line to log(OD) vs. time, so that adding a 
+        # time point only takes constant time.  See `growth_fit`.
+        self._sums = np.zeros(5)  # n, Σt, Σt², Σlog(OD), Σt·log(OD)
+        self._has_initial_od = False
+        self._initial_od_stale = True
+
+        # The time points, as given (so `update()` can tell what changed) and 
+        # as parsed.  The parsed time points are stored in arrays that grow 
+        # geometrically.  The first element of each is reserved for the initial 
+        # OD estimated from the subculture dilution, so that `time_points` can 
+        # return views of these arrays either with or without it.
+        self._time_points = []
+        self._times = np.zeros(9)
+        self._ods = np.zeros(9)
+
+        self._refine_fit = False
+
     @property
     def overnight_od(self):
         return self._overnight_od
@@ -53,6 +112,7 @@ class OdPredictor:
     @overnight_od.setter
     def overnight_od(self, value):
         self._overnight_od = value
+        self._initial_od_stale = True
         self._stale = True
 
     @property
@@ -62,52 +122,160 @@ class OdPredictor:
     @subculture_dilution.setter
     def subculture_dilution(self, value):
         self._subculture_dilution = value
+        self._initial_od_stale = True
+        self._stale = True
+
+    @property
+    def refine_fit(self):
+        """
+        Whether or not to refine the log-linear fit using 
+        `scipy.optimize.curve_fit()`.  This fits the ODs themselves rather than 
+        their logarithms, so it weighs the later (larger) ODs more heavily, but 
+        it's much slower.
+        """
+        return self._refine_fit
+
+    @refine_fit.setter
+    def refine_fit(self, value):
+        self._refine_fit = value
         self._stale = True
 
     @property
     def time_points(self):
-        times = [str_to_minutes(x[0]) for x in self._time_points]
-        ods = [float(eval(x[1])) for x in self._time_points]
-
-        # Estimate the initial OD if the user says how much overnight culture 
-        # was subcultured and didn't actually measure the OD at t=0.  The user 
-        # can also provide the OD of the overnight culture, but by default this 
-        # is assumed to be 4.
-
-        if 0 not in times:
-            if self.subculture_dilution:
-                overnight_vol = float(self.subculture_dilution.split(':')[0])
-                subculture_vol = float(self.subculture_dilution.split(':')[1])
-                initial_od = self.overnight_od * overnight_vol / subculture_vol
-                times = [0] + times
-                ods = [initial_od] + ods
+        """
+        The times (in minutes) and ODs of every time point, as arrays.  These 
+        are views of the internal arrays, so don't modify them.
 
-        return times, ods
+        Estimate the initial OD if the user says how much overnight culture 
+        was subcultured and didn't actually measure the OD at t=0.  The user 
+        can also provide the OD of the overnight culture, but by default this 
+        is assumed to be 4.
+        """
+        start = 0 if self.initial_od else 1
+        end = len(self._time_points) + 1
+        return self._times[start:end], self._ods[start:end]
+
+    def update(self, target_od, overnight_od, subculture_dilution, time_points):
+        """
+        Set every parameter at once, e.g. from the fields of a form.  Nothing 
+        is refit unless something actually changed, and if the only change is 
+        that new time points were added to the end, only those are parsed.
+        """
+        self.target_od = target_od
+
+        if overnight_od != self._overnight_od:
+            self.overnight_od = overnight_od
+        if subculture_dilution != self._subculture_dilution:
+            self.subculture_dilution = subculture_dilution
+
+        time_points = list(time_points)
+        n = len(self._time_points)
+
+        if time_points[:n] != self._time_points:
+            self.clear_time_points()
+            n = 0
+
+        for time, od in time_points[n:]:
+            self.add_time_point(time, od)
+
+    def clear_time_points(self):
+        self._time_points = []
+        self._sums[:] = 0
+        self._has_initial_od = False
+        self._initial_od_stale = True
+        self._stale = True
 
     def add_time_point(self, time, od):
+        t = str_to_minutes(time)
+        value = float(eval(od))
+
+        # Check the OD before changing anything, so a bad OD can't leave NaNs 
+        # in the running sums.
+        if not (np.isfinite(value) and value > 0):
+            raise ValueError(f"OD must be positive, not '{od}'")
+
+        y = np.log(value)
+
+        i = len(self._time_points) + 1
+        if i == len(self._times):
+            self._times = np.resize(self._times, 2 * i)
+            self._ods = np.resize(self._ods, 2 * i)
+
+        self._times[i] = t
+        self._ods[i] = value
         self._time_points.append((time, od))
+        self._sums += 1, t, t**2, y, t * y
+
+        if t == 0 and not self._has_initial_od:
+            self._has_initial_od = True
+            self._initial_od_stale = True
+
         self._stale = True
 
+    @property
+    def initial_od(self):
+        """
+        The OD at t=0 implied by the subculture dilution, or None if there's no 
+        subculture dilution or if the OD at t=0 was actually measured.  This is 
+        cached until the overnight OD or the subculture dilution changes.
+        """
+        if self._initial_od_stale:
+            self._initial_od_stale = False
+
+            if self._has_initial_od or not self.subculture_dilution:
+                self._ods[0] = 0
+            else:
+                overnight_vol, subculture_vol = map(
+                        float, self.subculture_dilution.split(':'))
+                self._ods[0] = self.overnight_od * overnight_vol / subculture_vol
+
+        return self._ods[0] or None
+
     @property
     def growth_fit(self):
+        """
+        The initial OD and the growth rate (in 1/min) that best fit the time 
+        points.
+
+        Exponential growth is a straight line in log space, so the best fit is 
+        calculated in closed form from the running sums maintained by 
+        `add_time_point()`.  Set `refine_fit` to polish this estimate using 
+        nonlinear least squares.
+        """
         if self._stale:
-            from scipy.optimize import curve_fit
-            times, ods = self.time_points
+            n, st, stt, sy, sty = self._sums
+
+            # Include the initial OD estimated from the subculture dilution, 
+            # if there is one.  It's at t=0, so it only affects n and Σy.
+            initial_od = self.initial_od
+            if initial_od:
+                n += 1
+                sy += np.log(initial_od)
+
+            self._stale = False
 
-            if len(times) == 0:
-                self._stale = False
+            if n == 0:
                 return self._growth_fit
 
-            # If we only have one time point, create another assuming the  
-            # doubling time really is 30 minutes.  This is conceptually the 
-            # same as fitting only the initial OD, but the code is simpler.
-            elif len(times) == 1:
-                times = times + [times[0] + 30]
-                ods = ods + [ods[0] * 2]
+            # If all the time points are at the same time (e.g. there's only 
+            # one), assume that the doubling time really is 30 minutes and only 
+            # fit the initial OD.
+            denom = n * stt - st**2
+            same_time = denom <= 1e-9 * max(n * stt, 1)
 
-            self._stale = False
-            self._growth_fit = curve_fit(
-                    growth_curve, times, ods, p0=self._growth_fit)[0]
+            if same_time:
+                rate = np.log(2) / 30
+            else:
+                rate = (n * sty - st * sy) / denom
+
+            log_initial_od = (sy - rate * st) / n
+            self._growth_fit = np.exp(log_initial_od), rate
+
+            if self.refine_fit and not same_time:
+                from scipy.optimize import curve_fit
+                times, ods = self.time_points
+                self._growth_fit = tuple(curve_fit(
+                        growth_curve, times, ods, p0=self._growth_fit)[0])
 
         return self._growth_fit
 
@@ -127,14 +295,22 @@ class OdPredictor:
                 minutes_to_str(self.doubling_time),
         )
 
-    def plot_time_estimate(self, axes=None):
-        if axes is None:
-            axes = pyplot.gca()
-
+    def plot_data(self):
+        """
+        Return the measured times and ODs, the times and ODs along the fit 
+        growth curve, and a reasonable upper limit for the time axis.
+        """
         known_times, known_ods = self.time_points
         max_time = 1.1 * self.time_estimate
         fit_times = np.linspace(0, max_time)
         fit_ods = growth_curve(fit_times, *self.growth_fit)
+        return known_times, known_ods, fit_times, fit_ods, max_time
+
+    def plot_time_estimate(self, axes=None):
+        if axes is None:
+            axes = pyplot.gca()
+
+        known_times, known_ods, fit_times, fit_ods, max_time = self.plot_data()
 
         axes.clear()
         axes.plot(known_times, known_ods, 'ko', fillstyle='none')
@@ -145,11 +321,681 @@ class OdPredictor:
         axes.set_ylabel('OD')
 
 
+class PlatePredictor:
+    """
+    Predict when each culture in a plate (e.g. a 96-well deep-well block read 
+    on a plate reader) will reach the target OD.
+
+    The ODs are stored in a (wells × time points) array, and every well is fit 
+    at once, using the same log-linear fit as `OdPredictor`.
+    """
+
+    def __init__(self, wells, target_od=0.6):
+        self.wells = list(wells)
+        self.target_od = target_od
+
+        n = len(self.wells)
+        self._times = np.full((n, 8), np.nan)
+        self._ods = np.full((n, 8), np.nan)
+        self._num_reads = 0
+
+        # Running sums for each well: n, Σt, Σt², Σlog(OD), Σt·log(OD)
+        self._sums = np.zeros((5, n))
+        self._growth_fit = None
+
+    @property
+    def times(self):
+        """
+        The time (in minutes) of each measurement, as a (wells × time points) 
+        array.
+        """
+        return self._times[:, :self._num_reads]
+
+    @property
+    def ods(self):
+        """
+        Every OD measurement, as a (wells × time points) array.  Wells that 
+        weren't measured at some time point are NaN.
+        """
+        return self._ods[:, :self._num_reads]
+
+    def add_read(self, time, ods):
+        """
+        Record an OD for every well.
+
+        The time can be given in minutes or as a string (e.g. "3h15"), and can 
+        either be a single value or one value per well (for plate readers that 
+        record when each well was read).  Wells with a missing (NaN) or 
+        non-positive OD are left out of the fit for this time point.
+        """
+        if isinstance(time, str):
+            time = str_to_minutes(time)
+
+        od = np.asarray(ods, dtype=float)
+        if od.shape != (len(self.wells),):
+            raise ValueError(f"expected {len(self.wells)} ODs, got {od.size}")
+
+        self.add_reads(np.asarray(time, dtype=float)[..., np.newaxis], od[:, np.newaxis])
+
+    def add_reads(self, times, ods):
+        """
+        Record several reads at once.
+
+        The ODs must be a (wells × reads) array.  The times (in minutes) can be 
+        either a (reads,) array, if every well was read at the same time, or a 
+        (wells × reads) array.
+        """
+        ods = np.asarray(ods, dtype=float)
+        n, k = len(self.wells), ods.shape[-1]
+
+        if ods.shape != (n, k):
+            raise ValueError(f"expected ODs for {n} wells, got {ods.shape[0]}")
+
+        times = np.broadcast_to(np.asarray(times, dtype=float), (n, k))
+
+        # Grow the arrays geometrically, so that adding a read is amortized 
+        # O(wells).
+        i = self._num_reads
+        capacity = self._ods.shape[1]
+
+        if i + k > capacity:
+            capacity = max(2 * capacity, i + k)
+            self._times = self._resize(self._times, capacity)
+            self._ods = self._resize(self._ods, capacity)
+
+        self._times[:, i:i+k] = times
+        self._ods[:, i:i+k] = ods
+        self._num_reads += k
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            y = np.log(ods)
+        ok = np.isfinite(y) & np.isfinite(times)
+        t, y = np.where(ok, times, 0), np.where(ok, y, 0)
+        self._sums += [x.sum(axis=1) for x in (ok, t, t**2, y, t * y)]
+        self._growth_fit = None
+
+    @staticmethod
+    def _resize(array, capacity):
+        resized = np.full((array.shape[0], capacity), np.nan)
+        resized[:, :array.shape[1]] = array
+        return resized
+
+    @property
+    def growth_fit(self):
+        """
+        The initial OD and growth rate (in 1/min) of each well, as two arrays.  
+        Wells that were measured fewer than twice (or always at the same time) 
+        are assumed to have a 30 minute doubling time.  Wells that were never 
+        measured are NaN.
+        """
+        if self._growth_fit is None:
+            n, st, stt, sy, sty = self._sums
+            denom = n * stt - st**2
+            same_time = denom <= 1e-9 * np.maximum(n * stt, 1)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rate = np.where(
+                        same_time,
+                        np.log(2) / 30,
+                        (n * sty - st * sy) / np.where(same_time, 1, denom),
+                )
+                initial_od = np.exp((sy - rate * st) / n)
+
+            rate[n == 0] = np.nan
+            self._growth_fit = initial_od, rate
+
+        return self._growth_fit
+
+    @property
+    def doubling_times(self):
+        """
+        The doubling time (in minutes) of each well.  Wells that aren't growing 
+        are infinite.
+        """
+        initial_od, rate = self.growth_fit
+        with np.errstate(divide='ignore'):
+            return np.where(rate > 0, np.log(2) / rate, np.inf)
+
+    @property
+    def time_estimates(self):
+        """
+        The time (in minutes) at which each well is predicted to reach the 
+        target OD.  Wells that aren't growing are infinite.
+        """
+        initial_od, rate = self.growth_fit
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.log(self.target_od / initial_od) / rate
+        return np.where(rate > 0, t, np.where(np.isnan(rate), np.nan, np.inf))
+
+    def harvest_order(self):
+        """
+        Return the wells sorted by when they're predicted to reach the target 
+        OD.  Wells that aren't growing, or that were never measured, come 
+        last.
+        """
+        order = np.argsort(self.time_estimates, kind='stable')
+        return [self.wells[i] for i in order]
+
+    def report(self):
+        """
+        Return a table of each well's predicted time to the target OD and 
+        doubling time, in harvest order.
+        """
+        from tabulate import tabulate
+
+        fmt = lambda x: minutes_to_str(x) if np.isfinite(x) else '-'
+        index = {well: i for i, well in enumerate(self.wells)}
+        estimates = self.time_estimates
+        doubling_times = self.doubling_times
+
+        rows = [
+                [well, fmt(estimates[i]), fmt(doubling_times[i])]
+                for well in self.harvest_order()
+                for i in [index[well]]
+        ]
+        return tabulate(
+                rows,
+                headers=['Well', f'OD={self.target_od}', 't½'],
+                tablefmt='plain',
+        )
+
+
+class PlateReaderExport:
+    """
+    Read the ODs from a kinetic plate reader export, i.e. a CSV or TSV file 
+    with one row for each read and one column for each well.
+
+    The header row is the first row that starts with a "Time" column and has 
+    at least one well column (e.g. "A1").  Any rows before it (e.g. a 
+    description of the run) are skipped, as are any columns that aren't wells 
+    (e.g. the temperature), and the data ends at the first blank row.  Times 
+    can be given as "h:mm:ss" or as numbers, which are assumed to be in 
+    minutes unless the header says they're in seconds (e.g. "Time [s]").  
+    Values that aren't numbers (e.g. "OVRFLW") are loaded as NaN.
+
+    The file can be read incrementally while the plate reader is still 
+    writing it: `read_new()` remembers how far into the file it got, and the 
+    next call only parses the rows added since then.
+    """
+    well_pattern = re.compile(r'[A-Pa-p]\d{1,2}$')
+
+    def __init__(self, path):
+        self.path = path
+        self.wells = None
+        self.offset = 0
+        self.finished = False
+
+        self._delimiter = None
+        self._blank_row = None
+        self._well_cols = None
+        self._seconds = False
+
+    def read_new(self, chunk_size=1024):
+        """
+        Return the times (in minutes) and a (wells × reads) array of ODs for 
+        every complete row added to the file since the last call.
+
+        Only complete lines are read, from a memory-mapped view of the file.  
+        The rows are found by scanning the bytes with numpy, and are parsed 
+        in row-aligned chunks straight into arrays preallocated to fit them, 
+        so the new rows are never split into python strings.  Only the rows 
+        before the header (e.g. a description of the run) are decoded one at 
+        a time.
+        """
+        import mmap
+
+        no_reads = np.empty(0), np.empty((len(self.wells or ()), 0))
+
+        size = os.path.getsize(self.path)
+        if self.finished or size <= self.offset:
+            return no_reads
+
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                end = view.rfind(b'\n', self.offset) + 1
+                if end <= self.offset:
+                    return no_reads
+
+                start = self.offset
+                if self.wells is None:
+                    start = self._find_header(view, start, end)
+                    if start is None:
+                        return no_reads
+
+                # The data ends at the first blank row.
+                stop = end
+                blank_row = self._blank_row.search(view, start, end)
+                if blank_row:
+                    stop = blank_row.start()
+                    self.finished = True
+
+                self.offset = end
+                times, ods = self._parse_rows(view, start, stop, chunk_size)
+
+        return times, ods.T
+
+    def _find_header(self, view, start, end):
+        i = start
+
+        while i < end:
+            j = view.find(b'\n', i, end) + 1
+            line = view[i:j].decode('utf-8-sig').rstrip('\r\n')
+            i = j
+
+            delimiter = '\t' if '\t' in line else ','
+            header = [x.strip().strip('"') for x in line.split(delimiter)]
+
+            if header[0].lower().startswith('time') and \
+                    any(self.well_pattern.match(x) for x in header):
+                break
+        else:
+            return None
+
+        self._delimiter = delimiter
+        self._blank_row = re.compile(
+                rb'^[ \r' + re.escape(delimiter.encode()) + rb']*\n', re.MULTILINE)
+        self._well_cols = [
+                j for j, x in enumerate(header)
+                if self.well_pattern.match(x)
+        ]
+        self._seconds = bool(re.search(
+                r'\[\s*s(ec)?\s*\]|\(\s*s(ec)?\s*\)', header[0], re.I))
+        self.wells = [header[j].upper() for j in self._well_cols]
+
+        return i
+
+    def _parse_rows(self, view, start, stop, chunk_size):
+        from io import BytesIO
+
+        # Find the end of every row with a single vectorized scan.
+        newlines = np.frombuffer(view, np.uint8, stop - start, start) == ord('\n')
+        row_ends = start + np.flatnonzero(newlines) + 1
+        row_starts = np.concatenate([[start], row_ends[:-1]])
+
+        n = len(row_ends)
+        times = np.empty(n)
+        ods = np.empty((n, len(self.wells)))
+        loadtxt = lambda chunk, **kwargs: np.loadtxt(
+                BytesIO(chunk), delimiter=self._delimiter, dtype=float,
+                quotechar='"', encoding='utf-8', **kwargs)
+
+        for i in range(0, n, chunk_size):
+            j = min(i + chunk_size, n)
+            chunk = view[row_starts[i]:row_ends[j-1]]
+
+            times[i:j] = loadtxt(
+                    chunk, usecols=[0], ndmin=1,
+                    converters={0: self._parse_time},
+            )
+
+            # Try the fast path first, and only fall back on a python-level 
+            # converter if some wells have non-numeric values.
+            try:
+                ods[i:j] = loadtxt(chunk, usecols=self._well_cols, ndmin=2)
+            except ValueError:
+                ods[i:j] = loadtxt(
+                        chunk, usecols=self._well_cols, ndmin=2,
+                        converters=self._parse_od,
+                )
+
+        return times, ods
+
+    def _parse_time(self, x):
+        x = x.strip().strip('"')
+        if ':' in x:
+            minutes = 0
+            for field in x.split(':'):
+                minutes = 60 * minutes + float(field)
+            return minutes / 60
+        return float(x) / 60 if self._seconds else float(x)
+
+    @staticmethod
+    def _parse_od(x):
+        try:
+            return float(x.strip().strip('"'))
+        except ValueError:
+            return np.nan
+
+
+def load_plate_reader_export(path, chunk_size=1024):
+    """
+    Load a kinetic plate reader export (see `PlateReaderExport`).
+
+    Returns the well names, the time of each read (in minutes), and a (wells × 
+    reads) array of ODs.
+    """
+    export = PlateReaderExport(path)
+    times, ods = export.read_new(chunk_size)
+
+    if export.wells is None:
+        raise ValueError(f"{path}: couldn't find a header row with 'Time' and well columns (e.g. 'A1')")
+
+    return export.wells, times, ods
+
+async def watch_plate_reader(directory, target_od=0.6, interval_s=5):
+    """
+    Watch the given directory for kinetic plate reader exports, and print the 
+    predicted time to reach the target OD for each well whenever new reads 
+    arrive.
+
+    Each file is only ever read from where the last poll left off, so the 
+    plate reader can either append reads to one file or drop a new file for 
+    each read.  Reads that aren't newer than the latest read already seen 
+    (e.g. from a new file that repeats the whole run so far) are ignored.
+    """
+    import asyncio
+    from datetime import datetime
+    from inform import plural
+
+    loop = asyncio.get_running_loop()
+    watcher = PlateReaderWatcher(directory, target_od)
+
+    while True:
+        num_reads = await loop.run_in_executor(None, watcher.poll)
+
+        if num_reads:
+            now = datetime.now().strftime('%H:%M:%S')
+            print(f"[{now}] {plural(num_reads):# new read/s}")
+            print(watcher.plate.report())
+            print(flush=True)
+
+        await asyncio.sleep(interval_s)
+
+class PlateReaderWatcher:
+    """
+    Keep track of which parts of which exports in a directory have already 
+    been added to a `PlatePredictor`.  See `watch_plate_reader()`.
+    """
+    extensions = '.csv', '.tsv', '.txt'
+
+    def __init__(self, directory, target_od=0.6):
+        self.directory = directory
+        self.target_od = target_od
+        self.plate = None
+        self.exports = {}
+        self.latest_time = -np.inf
+
+    def poll(self):
+        """
+        Add any new reads to the plate, and return how many there were.
+        """
+        num_reads = 0
+
+        for entry in sorted(os.scandir(self.directory), key=lambda x: x.stat().st_mtime):
+            if not entry.is_file() or not entry.name.endswith(self.extensions):
+                continue
+
+            export = self.exports.get(entry.path)
+            if export is None:
+                export = self.exports[entry.path] = PlateReaderExport(entry.path)
+            if export.finished or entry.stat().st_size <= export.offset:
+                continue
+
+            try:
+                times, ods = export.read_new()
+            except ValueError as err:
+                print(f"Error: {entry.name}: {err}")
+                export.finished = True
+                continue
+
+            if export.wells is None or not len(times):
+                continue
+
+            if self.plate is None:
+                self.plate = PlatePredictor(export.wells, self.target_od)
+            if export.wells != self.plate.wells:
+                print(f"Error: {entry.name}: expected the same wells as the first export")
+                export.finished = True
+                continue
+
+            new = times > self.latest_time
+            if new.any():
+                self.plate.add_reads(times[new], ods[:, new])
+                self.latest_time = times[new].max()
+                num_reads += new.sum()
+
+        return int(num_reads)
+
+
+def render_plate_report(plate, out_dir, format='png', overview=True, panels=True, workers=None, dpi=100):
+    """
+    Render the growth curve of each well in the given `PlatePredictor` to its 
+    own image (e.g. "A1.png") in the given directory, and/or a tiled overview 
+    of the whole plate ("plate.png").
+
+    The plots are drawn headlessly with the Agg backend, in a pool of worker 
+    processes.  Each worker draws every one of its panels on a single figure, 
+    by updating the data of the same artists, rather than creating a new 
+    figure for each well.
+
+    Returns the paths of the images that were written.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    initial_od, rate = plate.growth_fit
+    estimates = plate.time_estimates
+    curves = [
+            dict(
+                well=well,
+                times=plate.times[i],
+                ods=plate.ods[i],
+                fit=(initial_od[i], rate[i]),
+                target_od=plate.target_od,
+                time_estimate=estimates[i],
+            )
+            for i, well in enumerate(plate.wells)
+    ]
+    paths = []
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(
+            workers, initializer=_init_report_worker, initargs=(dpi,)) as pool:
+
+        if overview:
+            path = os.path.join(out_dir, f'plate.{format}')
+            overview_job = pool.submit(_render_plate_overview, curves, path)
+
+        if panels:
+            jobs = [
+                    (curve, os.path.join(out_dir, f"{curve['well']}.{format}"))
+                    for curve in curves
+            ]
+            chunksize = max(1, len(jobs) // (4 * workers))
+            paths += pool.map(_render_panel, *zip(*jobs), chunksize=chunksize)
+
+        if overview:
+            paths.append(overview_job.result())
+
+    return paths
+
+_report_dpi = 100
+_report_panel = None
+
+def _init_report_worker(dpi):
+    global _report_dpi
+    _report_dpi = dpi
+
+def _draw_growth_curve(artists, curve):
+    """
+    Update the given artists (the measured points, the fit curve, and the 
+    target OD line) to show the given well.
+    """
+    points, fit_curve, target_line = artists
+    axes = points.axes
+
+    times, ods = curve['times'], curve['ods']
+    ok = np.isfinite(times) & np.isfinite(ods)
+    times, ods = times[ok], ods[ok]
+
+    max_time = curve['time_estimate']
+    if not np.isfinite(max_time) or max_time <= 0:
+        max_time = max(times, default=60)
+    max_time = 1.1 * max(max_time, max(times, default=0))
+
+    fit_times = np.linspace(0, max_time)
+    fit_ods = growth_curve(fit_times, *curve['fit'])
+    target_od = curve['target_od']
+
+    points.set_data(times, ods)
+    fit_curve.set_data(fit_times, fit_ods)
+    target_line.set_data([0, max_time], [target_od, target_od])
+
+    axes.set_xlim(0, max_time)
+    axes.set_ylim(0, 1.1 * np.nanmax([target_od, *ods]))
+
+def _make_growth_curve_artists(axes):
+    return (
+            axes.plot([], [], 'ko', fillstyle='none', markersize=4)[0],
+            axes.plot([], [], linestyle='-', color='#3465a4')[0],
+            axes.plot([], [], '--', color='grey')[0],
+    )
+
+def _render_panel(curve, path):
+    global _report_panel
+
+    if _report_panel is None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=(4, 3), dpi=_report_dpi)
+        FigureCanvasAgg(fig)
+        axes = fig.add_subplot(1, 1, 1)
+        axes.set_xlabel('Time (min)')
+        axes.set_ylabel('OD')
+        title = axes.set_title('')
+        fig.tight_layout(pad=1.0)
+
+        # Keep the margins found by `tight_layout()`, but don't let `savefig()` 
+        # lay out (i.e. draw) the figure an extra time for every panel.
+        fig.set_layout_engine('none')
+
+        _report_panel = fig, title, _make_growth_curve_artists(axes)
+
+    fig, title, artists = _report_panel
+    _draw_growth_curve(artists, curve)
+
+    estimate = curve['time_estimate']
+    title.set_text('{}: OD={} at {}'.format(
+            curve['well'],
+            curve['target_od'],
+            minutes_to_str(estimate) if np.isfinite(estimate) else '-',
+    ))
+
+    fig.savefig(path)
+    return path
+
+def _render_plate_overview(curves, path):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    def locate(well):
+        row, col = re.match(r'([A-Za-z]+)(\d+)$', well).groups()
+        return ord(row.upper()) - ord('A'), int(col) - 1
+
+    positions = [locate(x['well']) for x in curves]
+    num_rows = max(row for row, col in positions) + 1
+    num_cols = max(col for row, col in positions) + 1
+
+    fig = Figure(figsize=(1.2 * num_cols, num_rows), dpi=_report_dpi)
+    FigureCanvasAgg(fig)
+    grid = fig.add_gridspec(
+            num_rows, num_cols,
+            left=0.02, right=0.98, bottom=0.02, top=0.98,
+            wspace=0.1, hspace=0.1,
+    )
+
+    for curve, (row, col) in zip(curves, positions):
+        axes = fig.add_subplot(grid[row, col])
+        axes.set_xticks([])
+        axes.set_yticks([])
+        axes.text(0.05, 0.95, curve['well'],
+                transform=axes.transAxes, va='top', fontsize=6)
+        _draw_growth_curve(_make_growth_curve_artists(axes), curve)
+
+    fig.savefig(path)
+    return path
+
+
 class OdPredictorCli(Cmd):
 
-    def __init__(self):
+    # The commands that change the state of the predictor, and so are written 
+    # to the session file.
+    session_commands = 'target_od', 'overnight_od', 'subculture_dilution', 'update', 'refine'
+
+    def __init__(self, session_path=None):
         super().__init__()
         self.predictor = OdPredictor()
+        self.session_fd = None
+
+        if session_path:
+            self.open_session(session_path)
+
+    def open_session(self, path):
+        """
+        Restore the commands recorded in the given session file (if it 
+        exists), then record every subsequent command that changes the state 
+        of the predictor to the same file.
+
+        Each command is appended to the file with a single `write()` as soon as 
+        it succeeds, so nothing is lost if the terminal dies.  Commands that 
+        fail aren't recorded.  The whole file is read at once when the session 
+        is restored.  If the last line was only partially written, it's 
+        discarded, and any line that fails (e.g. from an older version of this 
+        program) is reported and skipped.
+        """
+        try:
+            with open(path, 'rb') as f:
+                log = f.read()
+        except FileNotFoundError:
+            log = b''
+
+        complete, _, partial = log.rpartition(b'\n')
+        lines = complete.decode().splitlines() if complete else []
+
+        num_restored = 0
+
+        for i, line in enumerate(lines, 1):
+            try:
+                super().onecmd(line)
+            except Exception as err:
+                print(f"Error: {path}:{i}: {err}")
+            else:
+                num_restored += 1
+
+        self.session_fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if partial:
+            os.truncate(path, len(log) - len(partial))
+
+        if num_restored:
+            print(f"Info: Restored {num_restored} commands from {path}")
+
+    def close_session(self):
+        if self.session_fd is not None:
+            os.close(self.session_fd)
+            self.session_fd = None
+
+    def onecmd(self, line):
+        """
+        Run the given command, and record it to the session file if it 
+        succeeds.  Errors are printed rather than raised, so that a typo 
+        doesn't end the session.
+        """
+        try:
+            stop = super().onecmd(line)
+        except Exception as err:
+            print(f"Error: {err}")
+            return False
+
+        command, arg, line = self.parseline(line)
+        if self.session_fd is not None and command in self.session_commands and arg:
+            os.write(self.session_fd, f'{command} {arg}\n'.encode())
+
+        return stop
+
+    def postloop(self):
+        self.close_session()
 
     def do_target_od(self, arg):
         """
@@ -200,7 +1046,7 @@ class OdPredictorCli(Cmd):
             culture used, then a colon, then the volume of fresh media used.
         """
         if arg:
-            self.predictor.subculture_dilution = eval(arg)
+            self.predictor.subculture_dilution = arg.strip()
         else:
             print("subculture dilution: {}".format(self.predictor.subculture_dilution))
 
@@ -217,6 +1063,24 @@ class OdPredictorCli(Cmd):
         time, od = arg.split()
         self.predictor.add_time_point(time, od)
 
+    def do_refine(self, arg):
+        """
+        Choose how the growth curve is fit to the recorded measurements.  By 
+        default, a line is fit to the logarithm of the ODs, which is fast and 
+        usually good enough.  Refining the fit uses nonlinear least squares on 
+        the ODs themselves, which weighs the later measurements more heavily.
+
+        refine
+            Display whether or not the fit is being refined.
+
+        refine on|off
+            Turn refinement on or off.
+        """
+        if arg:
+            self.predictor.refine_fit = arg.strip().lower() in ('on', 'yes', 'true', '1')
+        else:
+            print("refine fit: {}".format('on' if self.predictor.refine_fit else 'off'))
+
     def do_plot(self, arg):
         """
         Plot the predicted growth curve.
@@ -238,8 +1102,37 @@ class OdPredictorCli(Cmd):
         pass
 
 
+class LazyWorker:
+    """
+    A single worker thread, which isn't started until the first task is 
+    submitted.
+
+    Threads don't survive `os.fork()`, and `gui_main()` forks after building 
+    the window.  An executor created before the fork would think it still has 
+    its worker thread in the child, and would queue tasks forever.  So the 
+    executor is only created once there's something to run, and is recreated 
+    if the process has forked since.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.pid = None
+
+    def submit(self, fn, *args, **kwargs):
+        from concurrent.futures import ThreadPoolExecutor
+
+        if self.executor is None or self.pid != os.getpid():
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            self.pid = os.getpid()
+
+        return self.executor.submit(fn, *args, **kwargs)
+
+
 class OdPredictorGui(Gtk.HBox):
 
+    # How long to wait for the user to stop typing before refitting.
+    debounce_ms = 200
+
     def __init__(self):
         super().__init__()
         self.controls = ControlPanel()
@@ -250,16 +1143,83 @@ class OdPredictorGui(Gtk.HBox):
         self.canvas = FigureCanvas(self.fig)
         self.canvas.set_size_request(300, 300)
 
+        # Create the artists once, then just update their data after each 
+        # refit.  This is much faster than clearing and redrawing the axes.
+        self.known_points, = self.axes.plot([], [], 'ko', fillstyle='none')
+        self.fit_curve, = self.axes.plot([], [], linestyle='-', color='#3465a4')
+        self.target_line, = self.axes.plot([], [], '--', color='grey')
+        self.axes.set_xlabel('Time (min)')
+        self.axes.set_ylabel('OD')
+        self.fig.tight_layout(pad=1.0)
+
         self.pack_start(self.controls, False, False, 0)
         self.pack_start(self.canvas, True, True, 0)
 
-        self.on_new_params()
+        # All the parsing and fitting happens on a single worker thread, which 
+        # is the only thread that ever touches the predictor.
+        self.predictor = OdPredictor()
+        self.worker = LazyWorker()
+        self.pending_update = None
+        self.generation = 0
+
+        # Don't refit until the main loop is running, i.e. after the fork in 
+        # `gui_main()`.
+        self.pending_update = GLib.idle_add(self.refit)
 
     def on_new_params(self, *args):
-        predictor = self.controls.get_params()
-        predictor.plot_time_estimate(self.axes)
-        self.fig.tight_layout(pad=1.0)
-        self.canvas.draw()
+        # Restart the timer every time the parameters change, so that there's 
+        # only one refit once the user pauses.
+        if self.pending_update is not None:
+            GLib.source_remove(self.pending_update)
+        self.pending_update = GLib.timeout_add(self.debounce_ms, self.refit)
+
+    def refit(self):
+        self.pending_update = None
+        self.generation += 1
+        self.worker.submit(
+                self.refit_in_worker,
+                self.generation,
+                self.controls.get_params(),
+        )
+        return False    # Don't repeat the timeout.
+
+    def refit_in_worker(self, generation, params):
+        try:
+            self.predictor.update(**params)
+            times = self.predictor.time_points[0]
+            result = dict(
+                    plot_data=self.predictor.plot_data(),
+                    target_od=self.predictor.target_od,
+                    fraction=max(times) / self.predictor.time_estimate if len(times) else 0,
+                    text=self.predictor.time_estimate_str,
+            )
+        except Exception as err:
+            result = dict(text=f"Error: {err}")
+
+        # GTK widgets can only be touched from the main thread.
+        GLib.idle_add(self.on_refit, generation, result)
+
+    def on_refit(self, generation, result):
+        # Ignore results that were superseded while they were being calculated.
+        if generation != self.generation:
+            return False
+
+        self.controls.time_estimate.set_estimate(
+                result.get('fraction'), result['text'])
+
+        if 'plot_data' in result:
+            known_times, known_ods, fit_times, fit_ods, max_time = result['plot_data']
+            target_od = result['target_od']
+
+            self.known_points.set_data(known_times, known_ods)
+            self.fit_curve.set_data(fit_times, fit_ods)
+            self.target_line.set_data([0, max_time], [target_od, target_od])
+            self.axes.set_xlim(0, max_time)
+            self.axes.relim()
+            self.axes.autoscale_view(scalex=False)
+            self.canvas.draw_idle()
+
+        return False
 
 
 class ControlPanel(Gtk.Grid):
@@ -275,7 +1235,7 @@ class ControlPanel(Gtk.Grid):
         self.overnight_od = LabeledEntry("Overnight OD", "4.0")
         self.subculture_dilution = LabeledEntry("Subculture Dilution")
         self.time_vs_od = TimeVsOd()
-        self.time_estimate = TimeEstimate(self)
+        self.time_estimate = TimeEstimate()
 
         self.set_row_spacing(5)
         self.set_column_spacing(2)
@@ -296,13 +1256,17 @@ class ControlPanel(Gtk.Grid):
         self.time_vs_od.connect('new-params', self.on_new_params)
 
     def get_params(self):
-        predictor = OdPredictor()
-        predictor.target_od = float_or_none(self.target_od.get_value())
-        predictor.overnight_od = float_or_none(self.overnight_od.get_value())
-        predictor.subculture_dilution = self.subculture_dilution.get_value()
-        for time, od in self.time_vs_od.get_time_points():
-            predictor.add_time_point(time, od)
-        return predictor
+        """
+        Return the current value of every field, in the form expected by 
+        `OdPredictor.update()`.  This only reads the text of each entry, so 
+        it's cheap enough to call on every keystroke.
+        """
+        return dict(
+                target_od=float_or_none(self.target_od.get_value()),
+                overnight_od=float_or_none(self.overnight_od.get_value()),
+                subculture_dilution=self.subculture_dilution.get_value(),
+                time_points=self.time_vs_od.get_time_points(),
+        )
 
     def on_new_params(self, *args):
         self.emit('new-params')
@@ -433,7 +1397,7 @@ class TimeVsOd(Gtk.Grid):
 
 class TimeEstimate(Gtk.VBox):
 
-    def __init__(self, params_editor):
+    def __init__(self):
         super().__init__()
         self.label = Gtk.Label(label="Time Estimate")
         self.label.set_justify(Gtk.Justification.LEFT)
@@ -447,17 +1411,10 @@ class TimeEstimate(Gtk.VBox):
         self.pack_start(self.label, False, False, 0)
         self.pack_start(self.progress_bar, False, False, 0)
 
-        self.on_new_params(params_editor)
-        params_editor.connect('new-params', self.on_new_params)
-
-    def on_new_params(self, widget):
-        predictor = widget.get_params()
-        times = predictor.time_points[0]
-
-        self.progress_bar.set_fraction(
-                max(times) / predictor.time_estimate
-                if predictor.time_points[0] else 0)
-        self.progress_bar.set_text(predictor.time_estimate_str)
+    def set_estimate(self, fraction, text):
+        if fraction is not None:
+            self.progress_bar.set_fraction(min(max(fraction, 0), 1))
+        self.progress_bar.set_text(text)
 
 
 
@@ -471,9 +1428,7 @@ def minutes_to_str(minutes):
     return '{}h{:02d}'.format(int(minutes//60), int(minutes % 60))
 
 def str_to_minutes(str):
-    import re
-
-    parsed_time = re.match('(\d+)h(\d+)?|(\d+)m', str)
+    parsed_time = time_regex.match(str)
     if not parsed_time:
         raise ValueError("can't interpret '{}' as a time.".format(str))
 
@@ -486,8 +1441,258 @@ def float_or_none(x):
     return float(eval(x)) if x is not None else None
 
 
-def cli_main():
-    OdPredictorCli().cmdloop()
+def test_growth_fit():
+    from pytest import approx, raises
+
+    # With no time points, assume a 30 min doubling time.
+    predictor = OdPredictor()
+    assert predictor.doubling_time == approx(30)
+
+    # With one time point, still assume a 30 min doubling time.
+    predictor.add_time_point('1h00', '0.1')
+    assert predictor.doubling_time == approx(30)
+    assert predictor.growth_fit[0] == approx(0.1 / 4)
+
+    # With more time points, fit exponential growth exactly.
+    predictor = OdPredictor()
+    for time, od in [('0h00', '0.05'), ('0h40', '0.1'), ('1h20', '0.2')]:
+        predictor.add_time_point(time, od)
+
+    assert predictor.growth_fit[0] == approx(0.05)
+    assert predictor.doubling_time == approx(40)
+    assert predictor.time_estimate == approx(40 * np.log2(0.6 / 0.05))
+
+    predictor.refine_fit = True
+    assert predictor.doubling_time == approx(40)
+
+    # Use the subculture dilution if the OD wasn't measured at t=0.
+    predictor = OdPredictor()
+    predictor.subculture_dilution = '1:100'
+    predictor.add_time_point('0h30', '0.08')
+    assert predictor.time_points[0].tolist() == [0, 30]
+    assert predictor.time_points[1] == approx([0.04, 0.08])
+    assert predictor.doubling_time == approx(30)
+
+    predictor.add_time_point('0h00', '0.04')
+    assert predictor.initial_od is None
+    assert predictor.time_points[0].tolist() == [30, 0]
+
+    predictor = OdPredictor()
+    predictor.subculture_dilution = '1:100'
+    assert predictor.initial_od == approx(0.04)
+    predictor.overnight_od = 2
+    assert predictor.initial_od == approx(0.02)
+
+    # Non-positive ODs are rejected without affecting the fit.
+    predictor = OdPredictor()
+    predictor.add_time_point('0h00', '0.05')
+    predictor.add_time_point('0h40', '0.1')
+
+    for od in ['0', '-0.1', 'float("nan")']:
+        with raises(ValueError, match='positive'):
+            predictor.add_time_point('1h20', od)
+
+    assert len(predictor.time_points[0]) == 2
+    assert predictor.doubling_time == approx(40)
+
+def test_update():
+    from pytest import approx
+
+    predictor = OdPredictor()
+    predictor.update(0.6, 4.0, None, [('0h00', '0.05'), ('0h40', '0.1')])
+    assert predictor.doubling_time == approx(40)
+
+    # Appending a time point only parses the new one.
+    sums = predictor._sums.copy()
+    predictor.update(0.6, 4.0, None, [('0h00', '0.05'), ('0h40', '0.1'), ('1h20', '0.2')])
+    assert predictor._sums[0] == sums[0] + 1
+    assert predictor.doubling_time == approx(40)
+
+    # Changing an old time point starts over.
+    predictor.update(0.8, 4.0, None, [('0h00', '0.05'), ('0h20', '0.1')])
+    assert predictor._sums[0] == 2
+    assert predictor.doubling_time == approx(20)
+    assert predictor.target_od == 0.8
+
+
+def test_plate_predictor():
+    from pytest import approx
+
+    wells = ['A1', 'A2', 'A3', 'A4']
+    plate = PlatePredictor(wells)
+
+    # A1 doubles every 40 min, A2 every 20 min, A3 isn't growing, A4 is blank.
+    for t in range(0, 200, 20):
+        plate.add_read(t, [
+            0.05 * 2**(t/40),
+            0.01 * 2**(t/20),
+            0.1,
+            np.nan,
+        ])
+
+    assert plate.ods.shape == (4, 10)
+    assert plate.times[0].tolist() == list(range(0, 200, 20))
+
+    initial_od, rate = plate.growth_fit
+    assert initial_od[:3] == approx([0.05, 0.01, 0.1])
+    assert plate.doubling_times[:2] == approx([40, 20])
+    assert plate.doubling_times[2:].tolist() == [np.inf, np.inf]
+
+    estimates = plate.time_estimates
+    assert estimates[0] == approx(40 * np.log2(0.6 / 0.05))
+    assert estimates[1] == approx(20 * np.log2(0.6 / 0.01))
+    assert estimates[2] == np.inf
+    assert np.isnan(estimates[3])
+
+    assert plate.harvest_order() == ['A2', 'A1', 'A3', 'A4']
+    assert plate.report().split('\n')[1].split()[:2] == ['A2', '1h58']
+
+    # Per-well times, and time strings.
+    plate = PlatePredictor(['B1', 'B2'])
+    plate.add_read('0h00', [0.1, 0.1])
+    plate.add_read([30, 60], [0.2, 0.2])
+    assert plate.doubling_times == approx([30, 60])
+
+
+def test_load_plate_reader_export(tmp_path):
+    from pytest import approx, raises
+
+    path = tmp_path / 'kinetic.txt'
+    path.write_text("""\
+Kinetic read, 600 nm
+
+Time [s]\tT° 600\tA1\tA2\tB1
+0\t37.0\t0.050\t0.010\tOVRFLW
+1800\t37.0\t0.100\t0.020\t0.1
+3600\t37.0\t0.200\t0.040\t0.1
+
+Results
+""")
+
+    wells, times, ods = load_plate_reader_export(path, chunk_size=2)
+    assert wells == ['A1', 'A2', 'B1']
+    assert times == approx([0, 30, 60])
+    assert ods.shape == (3, 3)
+    assert ods[0] == approx([0.05, 0.1, 0.2])
+    assert np.isnan(ods[2, 0])
+
+    plate = PlatePredictor(wells)
+    plate.add_reads(times, ods)
+    assert plate.doubling_times[:2] == approx([30, 30])
+    assert plate.harvest_order() == ['A1', 'A2', 'B1']
+
+    path.write_text("Time,A1\n0:00:00,0.05\n0:30:00,0.1\n")
+    wells, times, ods = load_plate_reader_export(path)
+    assert times == approx([0, 30])
+
+    path.write_text("")
+    with raises(ValueError, match='header'):
+        load_plate_reader_export(path)
+
+
+def test_plate_reader_watcher(tmp_path):
+    from pytest import approx
+
+    watcher = PlateReaderWatcher(tmp_path)
+    assert watcher.poll() == 0
+
+    # Reads appended to one file, including a partially-written row.
+    path = tmp_path / 'run1.csv'
+    path.write_text("Time,A1,A2\n0:00:00,0.05,0.01\n0:30:00,0.1,0.0")
+    assert watcher.poll() == 1
+
+    with open(path, 'a') as f:
+        f.write("2\n1:00:00,0.2,0.04\n")
+    assert watcher.poll() == 2
+    assert watcher.poll() == 0
+    assert watcher.plate.doubling_times == approx([30, 30])
+
+    # A new file that repeats the old reads.
+    (tmp_path / 'run2.csv').write_text(
+            "Time,A1,A2\n0:00:00,0.05,0.01\n1:00:00,0.2,0.04\n1:30:00,0.4,0.08\n")
+    assert watcher.poll() == 1
+    assert watcher.plate.ods.shape == (2, 4)
+
+
+def test_render_plate_report(tmp_path):
+    plate = PlatePredictor(['A1', 'A2', 'B1'])
+    for t in range(0, 120, 30):
+        plate.add_read(t, [0.05 * 2**(t/30), 0.1, np.nan])
+
+    paths = render_plate_report(plate, tmp_path, workers=1)
+
+    assert sorted(os.path.basename(x) for x in paths) == \
+            ['A1.png', 'A2.png', 'B1.png', 'plate.png']
+    assert all(os.path.getsize(x) > 0 for x in paths)
+
+
+def test_lazy_worker():
+    worker = LazyWorker()
+    assert worker.executor is None
+    assert worker.submit(os.getpid).result() == os.getpid()
+
+    # Tasks submitted after a fork still run, in the child.
+    pid = os.fork()
+    if not pid:
+        try:
+            ok = worker.submit(os.getpid).result(timeout=10) == os.getpid()
+        except Exception:
+            ok = False
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+def test_session(tmp_path, capsys):
+    path = tmp_path / 'session.log'
+
+    cli = OdPredictorCli(path)
+    for line in [
+            'target_od 0.4',
+            'subculture_dilution 1:100',
+            'update 0h30 0.05',
+            'update 1h00 0',        # Fails, so isn't recorded.
+            'update 1h00',          # Same.
+            'update 1h00 0.1',
+            'refine on',
+            'target_od',
+    ]:
+        cli.onecmd(line)
+    cli.close_session()
+
+    assert path.read_text() == '''\
+target_od 0.4
+subculture_dilution 1:100
+update 0h30 0.05
+update 1h00 0.1
+refine on
+'''
+
+    # Bad lines are skipped when the session is restored.
+    with open(path, 'a') as f:
+        f.write('update xxx\n')
+
+    # Simulate a crash in the middle of writing a command.
+    with open(path, 'a') as f:
+        f.write('update 1h3')
+
+    restored = OdPredictorCli(path)
+    captured = capsys.readouterr().out
+    assert f"Error: {path}:6:" in captured
+    assert "Restored 5 commands" in captured
+    assert restored.predictor.target_od == 0.4
+    assert restored.predictor.refine_fit
+    assert restored.predictor.subculture_dilution == '1:100'
+    assert restored.predictor.time_points[0].tolist() == [0, 30, 60]
+    assert restored.predictor.time_estimate == cli.predictor.time_estimate
+
+    restored.onecmd('update 1h30 0.2')
+    restored.close_session()
+    assert path.read_text().endswith('update xxx\nupdate 1h30 0.2\n')
+
+
+def cli_main(session_path=None):
+    OdPredictorCli(session_path).cmdloop()
 
 def gui_main():
     if isinstance(Gtk, Mock):
@@ -505,11 +1710,40 @@ introspection) or the GTK+ backend to matplotlib are not installed.""")
         Gtk.main()
 
 
-if __name__ == '__main__':
+def main(argv=None):
     import docopt
-    args = docopt.docopt(__doc__)
-
-    if args['gui']:
+    args = docopt.docopt(__doc__, argv=argv)
+
+    if args['plate']:
+        wells, times, ods = load_plate_reader_export(args['<export>'])
+        plate = PlatePredictor(wells, float(args['--target-od']))
+        plate.add_reads(times, ods)
+        print(plate.report())
+    elif args['report']:
+        wells, times, ods = load_plate_reader_export(args['<export>'])
+        plate = PlatePredictor(wells, float(args['--target-od']))
+        plate.add_reads(times, ods)
+
+        paths = render_plate_report(
+                plate, args['<out_dir>'],
+                format=args['--format'],
+                workers=args['--workers'] and int(args['--workers']),
+        )
+        print(f"Info: Wrote {len(paths)} images to {args['<out_dir>']}")
+    elif args['watch']:
+        import asyncio
+        try:
+            asyncio.run(watch_plate_reader(
+                    args['<directory>'],
+                    target_od=float(args['--target-od']),
+                    interval_s=float(args['--interval']),
+            ))
+        except KeyboardInterrupt:
+            pass
+    elif args['gui']:
         gui_main()
     else:
-        cli_main()
+        cli_main(args['--session'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+"""\
+Calculate primer melting temperatures and PCR annealing temperatures, without
+needing to use NEB's online "Tm Calculator".
+
+Usage:
+    primer_tm.py <fwd_seq> <rev_seq> [options]
+    primer_tm.py --pairs <path> [options]
+
+Arguments:
+    <fwd_seq> <rev_seq>
+        The sequences (5'→3') of the forward and reverse primers.  Only include
+        the part of each primer that anneals to the template, i.e. leave out
+        any overhangs.
+
+Options:
+    -p --polymerase <name>  [default: q5]
+        The polymerase being used, which determines the salt and primer
+        concentrations used to calculate the melting temperatures, and the
+        rule used to pick the annealing temperature.  The supported
+        polymerases are the same as for `pcr.py`:
+
+        q5: Q5 High-Fidelity DNA Polymerase (NEB)
+        ssoadv: SsoAdvanced™ Universal SYBR® Green Supermix (Biorad)
+
+    -f --pairs <path>
+        Calculate annealing temperatures for every primer pair in the given TSV
+        or CSV file (or "-" for stdin).  The file must have a header row with
+        "fwd" and "rev" columns, and may have any other columns (e.g. names).
+        The input is printed back out with "tm_fwd", "tm_rev", and "ta"
+        columns added.  The format of a file is determined by its extension,
+        and the format of stdin by whether the header row contains any tabs.
+
+Melting temperatures are calculated using the nearest-neighbor parameters from
+SantaLucia (1998), with the salt correction from Owczarzy et al. (2008), which
+accounts for both monovalent and Mg²⁺ ions (less the Mg²⁺ chelated by dNTPs).
+"""
+
+# SantaLucia (1998), unified parameters.  ΔH in kcal/mol, ΔS in cal/K/mol.
+# Each stack is indexed by the two bases on the top strand (5'→3'), so each
+# of the 10 unique stacks appears twice (e.g. AA/TT as both 'AA' and 'TT').
+nn_params = {
+        'AA': (-7.9, -22.2), 'TT': (-7.9, -22.2),
+        'AT': (-7.2, -20.4),
+        'TA': (-7.2, -21.3),
+        'CA': (-8.5, -22.7), 'TG': (-8.5, -22.7),
+        'GT': (-8.4, -22.4), 'AC': (-8.4, -22.4),
+        'CT': (-7.8, -21.0), 'AG': (-7.8, -21.0),
+        'GA': (-8.2, -22.2), 'TC': (-8.2, -22.2),
+        'CG': (-10.6, -27.2),
+        'GC': (-9.8, -24.4),
+        'GG': (-8.0, -19.9), 'CC': (-8.0, -19.9),
+}
+nn_init_gc = (0.1, -2.8)
+nn_init_at = (2.3, 4.1)
+
+# The buffer conditions for each polymerase.  Concentrations are in mM, except
+# for the primers (nM).  The annealing temperature is the lower of the two
+# primer melting temperatures, plus the given offset, capped at the given
+# maximum.  These follow the manufacturers' recommendations: NEB suggests
+# Tm+3°C (and no more than 72°C) for Q5, while Biorad suggests annealing at the
+# Tm for SsoAdvanced.
+polymerase_conditions = {
+        'q5': {
+            'primer_nM': 500,
+            'monovalent_mM': 50,
+            'mg_mM': 2.0,
+            'dntp_mM': 0.8,
+            'ta_offset': 3,
+            'ta_max': 72,
+        },
+        'ssoadv': {
+            'primer_nM': 250,
+            'monovalent_mM': 50,
+            'mg_mM': 2.5,
+            'dntp_mM': 0.8,
+            'ta_offset': 0,
+            'ta_max': 72,
+        },
+}
+
+def melting_temps(seqs, polymerase='q5'):
+    """
+    Calculate the melting temperature (in °C) of every primer in the given
+    array of sequences, under the conditions used by the given polymerase.
+
+    All the sequences are encoded into a single padded array, so every primer
+    is handled by the same handful of numpy operations.
+    """
+    import numpy as np
+
+    try:
+        conditions = polymerase_conditions[polymerase]
+    except KeyError:
+        raise ValueError(f"unknown polymerase '{polymerase}', the options are: {', '.join(polymerase_conditions)}") from None
+
+    # Encode the sequences as a (num_seqs, max_len) array of base indices
+    # (A=0, C=1, G=2, T=3), with 4 for padding.
+
+    seqs = np.asarray(seqs, dtype=str).ravel()
+    seqs = np.char.upper(np.char.strip(seqs))
+    ascii = seqs.astype('S').view(np.uint8).reshape(len(seqs), -1)
+
+    codes = np.full(256, 5, dtype=np.intp)
+    codes[0] = 4
+    for i, base in enumerate(b'ACGT'):
+        codes[base] = i
+
+    bases = codes[ascii]
+    lengths = (bases < 4).sum(axis=1)
+
+    invalid = (bases == 5).any(axis=1) | (lengths < 2)
+    if invalid.any():
+        raise ValueError(f"not a valid primer sequence: '{seqs[invalid][0]}'")
+
+    # Look up the nearest-neighbor parameters for each stack.  Index 16 (the
+    # last) is for stacks that include padding, and contributes nothing.
+
+    dH = np.zeros(17)
+    dS = np.zeros(17)
+    for stack, (h, s) in nn_params.items():
+        i = 4 * 'ACGT'.index(stack[0]) + 'ACGT'.index(stack[1])
+        dH[i], dS[i] = h, s
+
+    stacks = 4 * bases[:,:-1] + bases[:,1:]
+    stacks[(bases[:,:-1] == 4) | (bases[:,1:] == 4)] = 16
+
+    rows = np.arange(len(seqs))
+    first = bases[:,0]
+    last = bases[rows, lengths - 1]
+    is_gc = lambda x: (x == 1) | (x == 2)
+
+    init_h = np.where(is_gc(first), nn_init_gc[0], nn_init_at[0]) \
+           + np.where(is_gc(last), nn_init_gc[0], nn_init_at[0])
+    init_s = np.where(is_gc(first), nn_init_gc[1], nn_init_at[1]) \
+           + np.where(is_gc(last), nn_init_gc[1], nn_init_at[1])
+
+    total_h = 1e3 * (dH[stacks].sum(axis=1) + init_h)
+    total_s = dS[stacks].sum(axis=1) + init_s
+
+    # Melting temperature in 1M Na⁺, assuming the primer is in vast excess of
+    # the template.
+
+    R = 1.987
+    primer_M = conditions['primer_nM'] * 1e-9
+    tm_1M = total_h / (total_s + R * np.log(primer_M / 4))
+
+    # Salt correction: Owczarzy et al. (2008), Biochemistry 47:5336.
+
+    f_gc = is_gc(bases).sum(axis=1) / lengths
+    n = lengths
+    mon = conditions['monovalent_mM'] * 1e-3
+    mg = max(conditions['mg_mM'] - conditions['dntp_mM'], 0) * 1e-3
+
+    if mg == 0 or np.sqrt(mg) / mon < 0.22:
+        inv_tm = 1 / tm_1M \
+                + (4.29 * f_gc - 3.95) * 1e-5 * np.log(mon) \
+                + 9.40e-6 * np.log(mon)**2
+
+    else:
+        a, b, c, d = 3.92e-5, 9.11e-6, 6.26e-5, 1.42e-5
+        e, f, g = -4.82e-4, 5.25e-4, 8.31e-5
+
+        if np.sqrt(mg) / mon < 6:
+            a *= 0.843 - 0.352 * np.sqrt(mon) * np.log(mon)
+            d *= 1.279 - 4.03e-3 * np.log(mon) - 8.03e-3 * np.log(mon)**2
+            g *= 0.486 - 0.258 * np.log(mon) + 5.25e-3 * np.log(mon)**3
+
+        ln_mg = np.log(mg)
+        inv_tm = 1 / tm_1M \
+                + a - b * ln_mg \
+                + f_gc * (c + d * ln_mg) \
+                + (e + f * ln_mg + g * ln_mg**2) / (2 * (n - 1))
+
+    return 1 / inv_tm - 273.15
+
+def annealing_temps(fwd_seqs, rev_seqs, polymerase='q5'):
+    """
+    Calculate the annealing temperature (in °C) for every pair of forward and
+    reverse primers.  The result can be assigned directly to
+    `dirty_water.Pcr.annealing_temp` (after rounding, if desired).
+
+    Returns three arrays: the annealing temperatures, and the melting
+    temperatures of the forward and reverse primers.
+    """
+    import numpy as np
+
+    fwd_seqs = np.asarray(fwd_seqs, dtype=str).ravel()
+    rev_seqs = np.asarray(rev_seqs, dtype=str).ravel()
+
+    if len(fwd_seqs) != len(rev_seqs):
+        raise ValueError(f"got {len(fwd_seqs)} forward primers but {len(rev_seqs)} reverse primers")
+
+    tm = melting_temps(np.concatenate([fwd_seqs, rev_seqs]), polymerase)
+
+    tm_fwd, tm_rev = np.split(tm, 2)
+    conditions = polymerase_conditions[polymerase]
+    ta = np.minimum(tm_fwd, tm_rev) + conditions['ta_offset']
+    ta = np.minimum(ta, conditions['ta_max'])
+
+    return ta, tm_fwd, tm_rev
+
+def annealing_temp(fwd_seq, rev_seq, polymerase='q5'):
+    ta, tm_fwd, tm_rev = annealing_temps([fwd_seq], [rev_seq], polymerase)
+    return round(float(ta[0]))
+
+def test_melting_temps():
+    from pytest import approx, raises
+
+    # Longer and more GC-rich primers melt at higher temperatures.
+    tm = melting_temps([
+        'ATATATATATATATATATAT',
+        'GCGCATATATATATATGCGC',
+        'GCGCGCGCGCGCGCGCGCGC',
+        'GCGCGCGCGCGCGCGCGCGCGCGCGCGCGC',
+    ])
+    assert all(tm[:-1] < tm[1:])
+
+    # A typical 20-mer with 50% GC should melt in the high 50s or low 60s.
+    tm = melting_temps(['ACGTACGTTGCAAGCTAGCT'])
+    assert 55 < tm[0] < 65
+
+    # Case, whitespace, and the order of the sequences don't matter.
+    assert melting_temps([' acgtacgttgcaagctagct ']) == approx(tm)
+    assert melting_temps(['GCGCGC', 'ACGTACGTTGCAAGCTAGCT'])[1] == approx(tm[0])
+
+    with raises(ValueError, match='ACGN'):
+        melting_temps(['ACGN'])
+    with raises(ValueError, match='xxx'):
+        melting_temps(['ACGT'], polymerase='xxx')
+
+def test_annealing_temps():
+    import numpy as np
+    from pytest import approx
+
+    fwd = ['ACGTACGTTGCAAGCTAGCT', 'GCGCGCGCGCGCGCGCGCGCGCGCGCGCGC']
+    rev = ['GCGCGCGCGCGCGCGCGCGC', 'GCGCGCGCGCGCGCGCGCGCGCGCGCGCGC']
+    ta, tm_fwd, tm_rev = annealing_temps(fwd, rev)
+
+    assert ta[0] == approx(tm_fwd[0] + 3)
+    assert ta[1] == 72
+
+    ta, tm_fwd, tm_rev = annealing_temps(fwd, rev, 'ssoadv')
+    assert ta[0] == approx(tm_fwd[0])
+
+    assert annealing_temp(fwd[0], rev[0]) == round(tm_fwd[0] + 3)
+
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+    polymerase = args['--polymerase']
+
+    if args['--pairs']:
+        import sys
+        import pandas as pd
+
+        path = args['--pairs']
+        if path == '-':
+            from io import StringIO
+            text = sys.stdin.read()
+            sep = '\t' if '\t' in text.partition('\n')[0] else ','
+            df = pd.read_csv(StringIO(text), sep=sep)
+        else:
+            sep = '\t' if path.endswith('.tsv') else ','
+            df = pd.read_csv(path, sep=sep)
+
+        df['ta'], df['tm_fwd'], df['tm_rev'] = annealing_temps(
+                df['fwd'], df['rev'], polymerase)
+        df.to_csv(sys.stdout, sep=sep, index=False, float_format='%.1f')
+
+    else:
+        ta, tm_fwd, tm_rev = annealing_temps(
+                [args['<fwd_seq>']], [args['<rev_seq>']], polymerase)
+
+        print(f"Tm (fwd): {tm_fwd[0]:.1f}°C")
+        print(f"Tm (rev): {tm_rev[0]:.1f}°C")
+        print(f"Ta: {ta[0]:.0f}°C")
+
+if __name__ == '__main__':
+    main()
@@ -15,37 +15,37 @@ Options:
         Add a DNase pre-treatment step to the beginning of the protocol.
 """
 
-import docopt
-import dirty_water
-import pandas as pd
+def main(argv=None):
+    import docopt
+    import dirty_water
+    import pandas as pd
+    args = docopt.docopt(__doc__, argv=argv)
 
-args = docopt.docopt(__doc__)
+    protocol = dirty_water.Protocol()
+    concs = ''
 
-protocol = dirty_water.Protocol()
-concs = ''
-
-if args['<rna_conc.tsv>']:
-    df = pd.read_csv(args['<rna_conc.tsv>'], sep='\t')
-    df['conc'] = df[' Corrected (ng/uL)'].fillna(df['Nucleic Acid(ng/uL)'])
+    if args['<rna_conc.tsv>']:
+        df = pd.read_csv(args['<rna_conc.tsv>'], sep='\t')
+        df['conc'] = df[' Corrected (ng/uL)'].fillna(df['Nucleic Acid(ng/uL)'])
 
-    concs = """\
+        concs = """\
 ───────────────────────────────────────────────────────
                            RNA Conc  RNA Vol  Water Vol
 Construct                   (ng/uL)     (µL)       (µL)
 ───────────────────────────────────────────────────────
 """
-    for i, row in df.iterrows():
-        name = row['Sample Name']
-        conc =  row['conc']
-        vol = 1000 / conc
-        ref = 8 if not args['--dnase'] else 4
-        concs += f"{name:25s}   {conc:7.2f}   {vol:6.2f}    {ref-vol:6.2f}\n"
-    concs += """\
+        for i, row in df.iterrows():
+            name = row['Sample Name']
+            conc =  row['conc']
+            vol = 1000 / conc
+            ref = 8 if not args['--dnase'] else 4
+            concs += f"{name:25s}   {conc:7.2f}   {vol:6.2f}    {ref-vol:6.2f}\n"
+        concs += """\
 ───────────────────────────────────────────────────────
 """
 
-if args['--dnase']:
-    protocol += f"""\
+    if args['--dnase']:
+        protocol += f"""\
 Setup DNase reactions for each sample:
 
 - 0.5 µL 10 ezDNase buffer
@@ -56,12 +56,12 @@ Setup DNase reactions for each sample:
 Consider preparing a 2x ezDNase master mix.
 """
 
-    protocol += """\
+        protocol += """\
 Incubate at 37°C for 2 min.  Then briefly 
 centrifuge and place on ice.
 """
 
-    protocol += """\
+        protocol += """\
 Add 2 µL SuperScript IV VILO master mix 
 (Invitrogen 11766050) and 3 µL water to each 
 sample.
@@ -70,8 +70,8 @@ The master mix contains random hexamers, which
 will prime the reverse transcription of all RNAs 
 in the sample.
 """
-else:
-    protocol += f"""\
+    else:
+        protocol += f"""\
 Setup reverse transcription reactions for each 
 sample:
 
@@ -85,7 +85,7 @@ will prime the reverse transcription of all RNAs
 in the sample.
 """
 
-protocol += """\
+    protocol += """\
 Incubate at the following temperatures:
 
 - 25°C for 10 min
@@ -94,9 +94,10 @@ Incubate at the following temperatures:
 - hold at 4°C
 """
 
-if __name__ == '__main__':
     print(protocol)
     if args['<rna_conc.tsv>']:
         print()
         print(concs)
 
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,17 @@ Perform a serial dilution.
 
 Usage:
     serial_dilution.py <volume> <high> <low> <steps> [options]
+    serial_dilution.py plate <volume> <high> <low> <steps> [options]
+
+Arguments:
+    <volume>
+        The volume (in μL) to leave in each tube or well.
+
+    <high> <low> <steps>
+        The highest and lowest concentrations, and the number of 
+        concentrations in the series (including the highest and lowest).  
+        For plates, each of these can be a comma-separated list with one 
+        value for each series.
 
 Options:
     -d --diluent NAME   [default: water]
@@ -12,32 +23,55 @@ Options:
 
     -m --material NAME  [default: material]
         The substance being diluted.
+
+Plate options:
+    -n --num-series N
+        The number of series to put on the plate(s).  By default, this is the 
+        number of values given for <high>, <low>, or <steps>.
+
+    -p --plate WELLS    [default: 96]
+        The kind of plate to use: 96 or 384.  Each series is put in its own 
+        row, and more plates are used if there are more series than rows.
+
+    -c --by-column
+        Put each series in its own column, rather than its own row.
+
+    -o --output PATH
+        Save the concentration in every well to the given path, either as a 
+        CSV file (with one row per plate row) or as a numpy array (if the path 
+        ends with ".npy").
 """
 
-import docopt
 import stepwise
 from inform import plural
 from tabulate import tabulate
 
-args = docopt.docopt(__doc__)
-volume = eval(args['<volume>'])
-high = eval(args['<high>'])
-low = eval(args['<low>'])
-steps = eval(args['<steps>'])
+# The number of rows and columns in each kind of plate.  See 96_well_plate.pdf 
+# and 384_well_plate.pdf.
+plate_shapes = {
+        96: (8, 12),
+        384: (16, 24),
+}
 
-dilution = (low / high)**(1 / (steps - 1))
-transfer = volume * dilution / (1 - dilution)
-initial_volume = volume + transfer
+def make_protocol(volume, high, low, steps, material='material', diluent='water'):
+    """
+    Return a `stepwise.Protocol` for diluting the given material from the high 
+    to the low concentration in the given number of steps, leaving the given 
+    volume (in μL) in each tube.
+    """
+    dilution = (low / high)**(1 / (steps - 1))
+    transfer = volume * dilution / (1 - dilution)
+    initial_volume = volume + transfer
 
-protocol = stepwise.Protocol()
-protocol += f"""\
+    protocol = stepwise.Protocol()
+    protocol += f"""\
 Perform a serial dilution [1]:
 
-- Put {initial_volume:.2f} μL {args['--material']} in the first tube.
-- Add {volume:.2f} μL {args['--diluent']} in the {plural(steps):# remaining tube/s}.
+- Put {initial_volume:.2f} μL {material} in the first tube.
+- Add {volume:.2f} μL {diluent} in the {plural(steps):# remaining tube/s}.
 - Transfer {transfer:.2f} μL between each tube.
 """
-protocol.footnotes[1] = f"""\
+    protocol.footnotes[1] = f"""\
 The final concentrations will be:
 {tabulate(
     [[i+1, high * dilution**i] for i in range(steps)],
@@ -45,6 +79,207 @@ The final concentrations will be:
     floatfmt='.2e',
 )}
 """
-print(protocol)
+    return protocol
+
+def plan_plate(volume, high, low, steps, num_series=None, plate=96, by_column=False):
+    """
+    Plan any number of serial dilutions at once, laid out across one or more 
+    plates.
+
+    `high`, `low`, and `steps` can either be scalars or arrays with one value 
+    for each series.  Each series starts in the first well of its own row (or 
+    column), and the series fill the rows (or columns) of the first plate 
+    before moving on to the next.
+
+    Returns three arrays: the final concentration in every well, with shape 
+    (plates, rows, columns) and NaN for unused wells; and the volume of 
+    material to put in the first well and to transfer between wells, for each 
+    series.
+    """
+    import numpy as np
+
+    try:
+        num_rows, num_cols = plate_shapes[int(plate)]
+    except KeyError:
+        raise ValueError(f"unknown plate: {plate!r} (known plates: {', '.join(map(str, plate_shapes))})") from None
+
+    high, low, steps = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(high, dtype=float)),
+            np.atleast_1d(np.asarray(low, dtype=float)),
+            np.atleast_1d(np.asarray(steps, dtype=float)),
+    )
+    if num_series is not None:
+        high, low, steps = np.broadcast_to([high, low, steps], (3, num_series))
+
+    num_lines, line_len = (num_cols, num_rows) if by_column else (num_rows, num_cols)
+
+    fractional_steps = steps[steps != np.round(steps)]
+    if fractional_steps.size:
+        raise ValueError(f"the number of steps must be a whole number, not {fractional_steps[0]:g}")
+    if (steps < 2).any() or (steps > line_len).any():
+        raise ValueError(f"each series must have between 2 and {line_len} steps")
+    if not ((low > 0) & (low < high)).all():
+        raise ValueError("the low concentration must be positive and less than the high concentration")
+
+    steps = steps.astype(int)
+
+    dilution = (low / high)**(1 / (steps - 1))
+    transfer = volume * dilution / (1 - dilution)
+    initial_volume = volume + transfer
+
+    # Work out the concentration in each well for all the series at once, then 
+    # pad the series out to fill whole plates.
+
+    i = np.arange(line_len)
+    conc = high[:,None] * dilution[:,None]**i
+    conc[i >= steps[:,None]] = np.nan
+
+    num_plates = -(-len(conc) // num_lines)
+    padded = np.full((num_plates * num_lines, line_len), np.nan)
+    padded[:len(conc)] = conc
+    padded = padded.reshape(num_plates, num_lines, line_len)
+
+    if by_column:
+        padded = padded.transpose(0, 2, 1)
+
+    return padded, initial_volume, transfer
+
+def first_wells(num_series, plate=96, by_column=False):
+    """
+    Return the first well of each series laid out by `plan_plate()`, e.g. "A1", 
+    with the plate number prepended if there is more than one plate.
+    """
+    num_rows, num_cols = plate_shapes[int(plate)]
+    num_lines = num_cols if by_column else num_rows
+    wells = []
+
+    for i in range(num_series):
+        k, line = divmod(i, num_lines)
+        well = f'A{line + 1}' if by_column else f'{chr(ord("A") + line)}1'
+        wells.append(f'{k + 1}:{well}' if num_series > num_lines else well)
+
+    return wells
+
+def save_plate(path, conc):
+    """
+    Save the concentrations calculated by `plan_plate()` to the given path, 
+    either as a numpy array (if the path ends with ".npy") or as a CSV file.
+    """
+    import numpy as np
+
+    if path.endswith('.npy'):
+        np.save(path, conc)
+        return
+
+    import csv
+
+    num_plates, num_rows, num_cols = conc.shape
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['plate', 'row', *range(1, num_cols + 1)])
+
+        for k in range(num_plates):
+            for i in range(num_rows):
+                writer.writerow([
+                    k + 1, chr(ord('A') + i),
+                    *('' if np.isnan(x) else f'{x:.6g}' for x in conc[k,i]),
+                ])
+
+def test_plan_plate():
+    import numpy as np
+    from pytest import approx, raises
+
+    conc, initial_volume, transfer = plan_plate(
+            20, [100, 10, 1], [1, 1, 0.1], [5, 2, 12])
+
+    assert conc.shape == (1, 8, 12)
+    assert conc[0, 0, :5] == approx([100, 10**1.5, 10, 10**0.5, 1])
+    assert conc[0, 1, :2] == approx([10, 1])
+    assert conc[0, 2, [0, 11]] == approx([1, 0.1])
+    assert np.isnan(conc[0, 0, 5:]).all()
+    assert np.isnan(conc[0, 3:]).all()
+
+    # The same calculation as for a single series.
+    protocol = str(make_protocol(20, 100, 1, 5))
+    assert f'{initial_volume[0]:.2f} μL material' in protocol
+    assert f'Transfer {transfer[0]:.2f} μL' in protocol
+
+    conc, initial_volume, transfer = plan_plate(
+            20, 100, 1, 8, num_series=40, plate=384, by_column=True)
+
+    assert conc.shape == (2, 16, 24)
+    assert conc[0, :8, 0] == approx(conc[1, :8, 15])
+    assert np.isnan(conc[1, :, 16:]).all()
+    assert first_wells(40, 384, True)[-1] == '2:A16'
+
+    with raises(ValueError):
+        plan_plate(20, 100, 1, 13)
+    with raises(ValueError, match='less than'):
+        plan_plate(20, 100, 100, 5)
+    with raises(ValueError, match='less than'):
+        plan_plate(20, [100, 10], [1, 20], 5)
+    with raises(ValueError, match='positive'):
+        plan_plate(20, 100, 0, 5)
+    with raises(ValueError, match='whole number, not 5.5'):
+        plan_plate(20, 100, 1, [5, 5.5])
+
+
+def main(argv=None):
+    import docopt
+    args = docopt.docopt(__doc__, argv=argv)
+
+    if args['plate']:
+        import numpy as np
+
+        def parse_list(arg):
+            return np.array(eval(f'[{arg}]'), dtype=float)
+
+        num_series = args['--num-series'] and int(args['--num-series'])
+        by_column = args['--by-column']
+
+        try:
+            conc, initial_volume, transfer = plan_plate(
+                    volume=eval(args['<volume>']),
+                    high=parse_list(args['<high>']),
+                    low=parse_list(args['<low>']),
+                    steps=parse_list(args['<steps>']),
+                    num_series=num_series,
+                    plate=args['--plate'],
+                    by_column=by_column,
+            )
+        except ValueError as err:
+            raise SystemExit(f"Error: {err}")
+
+        wells = first_wells(len(initial_volume), args['--plate'], by_column)
+
+        print(tabulate(
+            zip(wells, initial_volume, transfer),
+            headers=[
+                'First well',
+                f'{args["--material"]} (μL)',
+                'Transfer (μL)',
+            ],
+            floatfmt='.2f',
+        ))
+
+        if args['--output']:
+            save_plate(args['--output'], conc)
+            print(f"Info: Saved concentrations to {args['--output']}")
+
+        return
+
+    protocol = make_protocol(
+            volume=eval(args['<volume>']),
+            high=eval(args['<high>']),
+            low=eval(args['<low>']),
+            steps=eval(args['<steps>']),
+            material=args['--material'],
+            diluent=args['--diluent'],
+    )
+    print(protocol)
+
+if __name__ == '__main__':
+    main()
 
 # vim: tw=53
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
-import docopt
-import dirty_water
+"""\
+Extract total cellular RNA using TRIzol.
 
-protocol = dirty_water.Protocol()
+Usage:
+    trizol.py
+"""
+
+def make_protocol():
+    import dirty_water
+    protocol = dirty_water.Protocol()
 
-protocol += """\
+    protocol += """\
 Extract total cellular RNA:
 
 - Pellet cells at 4100 rpm for 10 min.
@@ -26,7 +32,7 @@ Extract total cellular RNA:
   avoid transferring any of the organic phase.
 """
 
-protocol += """\
+    protocol += """\
 Concentrate and purify the RNA by ethanol precipitation:
 
 - Add 1 µL GlycoBlue (Invitrogen AM9516) to each 
@@ -53,11 +59,16 @@ Concentrate and purify the RNA by ethanol precipitation:
 - Resuspend RNA in 10 µL water.
 """
 
-protocol += """\
+    protocol += """\
 Measure the RNA concentration of each sample using the Nanodrop.
 """
 
-if __name__ == '__main__':
-    print(protocol)
+    return protocol
 
+def main(argv=None):
+    import docopt
+    docopt.docopt(__doc__, argv=argv)
+    print(make_protocol())
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+"""\
+Run any of the protocols in this directory from a single command.
+
+Usage:
+    wetlab.py <command> [<args>...]
+    wetlab.py [-h | --help]
+
+Each command is a script in this directory, and takes the same arguments as
+that script.  The script (and the libraries it needs) is only imported when
+the command actually runs, and `--help` is answered from a cache of each
+script's usage text without importing anything.  Run `wetlab.py <command>
+--help` for the arguments that each command accepts.
+"""
+
+import os, sys
+
+# Map each command to the module that implements it.  Every module must have a
+# `main(argv=None)` function that parses its own usage text.
+subcommands = {
+        'batch_reagents': 'batch_reagents',
+        'dna_beads': 'dna_beads',
+        'electrotransformation': 'electrotransformation',
+        'gibson': 'gibson_assembly',
+        'golden_gate': 'golden_gate',
+        'golden_gate_enzymes': 'golden_gate_enzymes',
+        'golden_gate_junctions': 'golden_gate_junctions',
+        'ivt': 'ivt',
+        'page': 'page',
+        'pcr': 'pcr',
+        'pcr_cloning': 'pcr_cloning',
+        'phusion_master_mix': 'phusion_master_mix',
+        'predict_od': 'predict_od',
+        'primer_tm': 'primer_tm',
+        'reverse_transcribe': 'reverse_transcribe',
+        'serial_dilution': 'serial_dilution',
+        'serve': 'wetlab_server',
+        'tbe_urea_gel': 'cast_tbe_urea_gel',
+        'trizol': 'trizol',
+        'which_gel_tray': 'which_gel_tray',
+        'worklist': 'worklist',
+}
+script_dir = os.path.dirname(os.path.abspath(__file__))
+usage_cache_path = os.path.join(script_dir, '__pycache__', 'wetlab_usage.marshal')
+
+def load_usage(commands=None, cache_path=None):
+    """
+    Return a dictionary mapping each of the given commands (default: all of
+    them) to the usage text of the module that implements it.
+
+    The usage text is read straight from each module's source code, so the
+    module itself is never imported.  The results are cached, and a cache
+    entry is only refreshed when its module has been modified.  The cache uses
+    `marshal` rather than `json`, because `marshal` is built into the
+    interpreter and costs nothing to import.
+    """
+    import marshal
+
+    if commands is None:
+        commands = list(subcommands)
+    if cache_path is None:
+        cache_path = usage_cache_path
+
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        cache = {}
+
+    usage = {}
+    stale = False
+
+    for command in commands:
+        module = subcommands[command]
+        path = os.path.join(script_dir, f'{module}.py')
+        mtime = os.stat(path).st_mtime_ns
+
+        if cache.get(module, [None])[0] != mtime:
+            import ast
+            with open(path) as f:
+                doc = ast.get_docstring(ast.parse(f.read()), clean=False)
+            cache[module] = [mtime, (doc or '').strip('\n')]
+            stale = True
+
+        usage[command] = cache[module][1]
+
+    if stale:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                marshal.dump(cache, f)
+        except OSError:
+            pass
+
+    return usage
+
+def summarize_usage(usage):
+    """
+    Return the first sentence of the given usage text, unless the usage text
+    doesn't begin with a summary.
+    """
+    paragraph = ' '.join(usage.split('\n\n', 1)[0].split())
+    if paragraph.startswith('Usage:'):
+        return ''
+    return paragraph.split('.  ', 1)[0].rstrip('.')
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if not argv or argv[0] in ('-h', '--help'):
+        usage = load_usage()
+        width = max(len(x) for x in usage)
+
+        print(__doc__.strip())
+        print()
+        print("Commands:")
+        for command, text in usage.items():
+            print(f"    {command:{width}}  {summarize_usage(text)}".rstrip())
+        return
+
+    command, *args = argv
+
+    if command not in subcommands:
+        raise SystemExit(f"Error: unknown command '{command}', run `wetlab.py --help` to see the available commands.")
+
+    if '-h' in args or '--help' in args:
+        print(load_usage([command])[command])
+        return
+
+    from importlib import import_module
+    import_module(subcommands[command]).main(args)
+
+def test_subcommands():
+    for command, module in subcommands.items():
+        with open(os.path.join(script_dir, f'{module}.py')) as f:
+            assert 'def main(argv=None):' in f.read(), command
+
+def test_load_usage(tmp_path):
+    cache_path = tmp_path / 'usage.marshal'
+
+    usage = load_usage(['ivt', 'pcr'], cache_path)
+    assert usage['ivt'].startswith('Display a protocol')
+    assert usage['pcr'].startswith('Usage:')
+    assert cache_path.exists()
+
+    assert load_usage(['ivt', 'pcr'], cache_path) == usage
+    assert load_usage(['tbe_urea_gel'], cache_path)['tbe_urea_gel'].startswith('Cast')
+
+    assert summarize_usage(usage['ivt']).startswith('Display a protocol')
+    assert summarize_usage(usage['pcr']) == ''
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+"""\
+Generate protocols for other programs from a long-lived process, so that the
+cost of starting the interpreter and importing numpy, dirty_water, etc. is
+paid once rather than for every protocol.
+
+Usage:
+    wetlab_server.py [options]
+
+Options:
+    -s --socket <path>
+        Listen for connections on the given Unix socket.  Any number of
+        clients can be connected at once.  By default, requests are instead
+        read from stdin and responses are written to stdout.
+
+    -j --workers <n>
+        The number of worker processes to generate protocols with.  By
+        default, one worker is started for each CPU.
+
+    -p --preload <commands>
+        A comma-separated list of the commands (see `wetlab.py --help`) to
+        import in each worker as soon as it starts.  By default, every command
+        is preloaded.
+
+    -t --timeout <seconds>  [default: 60]
+        Give up on any request that takes longer than this, and answer it with
+        an error.  Use 0 to wait forever.
+
+Requests and responses are JSON objects, one per line.  Every request must
+have a "command" field, naming one of the commands understood by `wetlab.py`,
+and one of the following:
+
+    "args": [...]
+        Run the command with the given command-line arguments.  The response
+        has an "output" field with everything the command printed, and a
+        "status" field with its exit status.  Commands can't read from stdin,
+        so interactive commands (e.g. `gibson` without any fragments or
+        `predict_od` without a subcommand) fail with an error.
+
+    "params": {...}
+        Call the command's `make_protocol()` function with the given keyword
+        arguments.  The response has an "output" field with the rendered
+        protocol.  If the request also has `"format": "table"`, the command's
+        `make_reaction()` function is called instead, and the response has a
+        "table" field listing each reagent in the reaction.  A "frags"
+        parameter (e.g. for golden_gate or gibson) may be given as a list of
+        strings in the same format used on the command line.
+
+If a request has an "id" field, it is copied into the response.  Responses
+are written as soon as they are ready, which may not be the order in which
+the requests were received.  Requests that fail get a response with an
+"error" field.
+"""
+
+import io, os, sys
+
+def init_worker(commands):
+    """
+    Import the modules for the given commands, so that the first request for
+    each command doesn't have to wait for them.
+    """
+    from importlib import import_module
+    from wetlab import subcommands
+
+    for command in commands:
+        import_module(subcommands[command])
+
+def handle_request(request, timeout=None):
+    """
+    Generate the protocol described by the given request, and return the
+    response.  This runs in a worker process.
+
+    If a timeout (in seconds) is given, the request is interrupted by SIGALRM
+    once it has taken that long.  This must be called from the main thread of
+    the process.
+    """
+    import signal
+
+    def on_timeout(signum, frame):
+        raise TimeoutError(f"request took longer than {timeout}s")
+
+    if timeout:
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        return _handle_request(request)
+    except Exception as err:
+        return {'error': f'{err.__class__.__name__}: {err}'}
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _handle_request(request):
+    from importlib import import_module
+    from wetlab import subcommands
+
+    command = request.get('command')
+    if command not in subcommands:
+        raise ValueError(f"unknown command: {command!r}")
+
+    module = import_module(subcommands[command])
+
+    if 'args' in request:
+        if '-' in request['args']:
+            raise ValueError(f"'{command}' can't read from stdin")
+        return run_main(module, request['args'])
+
+    params = dict(request.get('params', {}))
+    if isinstance(params.get('frags'), list):
+        import golden_gate
+        params['frags'] = golden_gate.fragments_from_strs(params['frags'])
+
+    if request.get('format') == 'table':
+        if not hasattr(module, 'make_reaction'):
+            raise ValueError(f"'{command}' can't make reaction tables")
+        reaction = module.make_reaction(**params)
+        if isinstance(reaction, tuple):
+            reaction = reaction[0]
+        return {'table': reaction_table(reaction)}
+
+    if not hasattr(module, 'make_protocol'):
+        raise ValueError(f"'{command}' only accepts command-line arguments")
+
+    return {'output': str(module.make_protocol(**params))}
+
+def run_main(module, argv):
+    """
+    Run the given module's `main()` function, and return everything it prints
+    along with its exit status.
+
+    Each worker process only runs one request at a time, so it's safe to
+    redirect stdout for the whole process.  Stdin is replaced by a stream that
+    can't be read, so commands that would prompt for input fail immediately
+    instead of waiting forever.
+    """
+    from io import StringIO
+    from contextlib import redirect_stdout
+
+    stdout = StringIO()
+    response = {'status': 0}
+    stdin, sys.stdin = sys.stdin, NoStdin()
+
+    try:
+        with redirect_stdout(stdout):
+            module.main(list(argv))
+
+    except SystemExit as exit:
+        if isinstance(exit.code, str):
+            response['status'] = 1
+            response['error'] = exit.code
+        else:
+            response['status'] = exit.code or 0
+
+    finally:
+        sys.stdin = stdin
+
+    response['output'] = stdout.getvalue()
+    return response
+
+class NoStdin(io.TextIOBase):
+    """
+    A replacement for stdin that raises OSError on any attempt to read it.
+
+    An error is used rather than EOF, because the interactive commands keep
+    prompting (e.g. for more fragments) after EOF.
+    """
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        raise OSError("can't read from stdin")
+
+    def readline(self, size=-1):
+        raise OSError("can't read from stdin")
+
+def reaction_table(reaction):
+    """
+    Describe each reagent in the given `dirty_water.Reaction`.  Volumes are
+    given in the units of each reagent.
+    """
+    table = []
+
+    for reagent in reaction.reagents.values():
+        volume = reagent.volume
+        table.append({
+            'reagent': reagent.name,
+            'stock_conc': reagent.stock_conc_str,
+            'volume': volume,
+            'volume_unit': reagent.volume_unit,
+            'master_mix': volume * reaction.scale if reagent.master_mix else None,
+        })
+
+    return table
+
+def serve_stream(pool, requests, responses, timeout=None):
+    """
+    Answer the requests read from one stream (e.g. stdin or a socket) by
+    writing responses to another.
+    """
+    import json, threading
+
+    lock = threading.Lock()
+    finished = threading.Condition()
+    num_pending = 0
+
+    def respond(response, request=None):
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        with lock:
+            responses.write(json.dumps(response) + '\n')
+            responses.flush()
+
+    def on_done(request, future):
+        nonlocal num_pending
+        try:
+            response = future.result()
+        except Exception as err:
+            response = {'error': f'{err.__class__.__name__}: {err}'}
+
+        # Keep going if the client disconnects, so that the count of pending 
+        # requests stays accurate.
+        try:
+            respond(response, request)
+        except (OSError, ValueError):
+            pass
+
+        with finished:
+            num_pending -= 1
+            finished.notify_all()
+
+    for line in requests:
+        if not line.strip():
+            continue
+
+        try:
+            request = json.loads(line)
+        except ValueError as err:
+            respond({'error': f"invalid request: {err}"})
+            continue
+
+        if not isinstance(request, dict):
+            respond({'error': "invalid request: expected a JSON object"})
+            continue
+
+        with finished:
+            num_pending += 1
+
+        future = pool.submit(handle_request, request, timeout)
+        future.add_done_callback(lambda f, r=request: on_done(r, f))
+
+    # Don't return (and let the caller close the streams) until every response 
+    # has been written.
+    with finished:
+        finished.wait_for(lambda: num_pending == 0)
+
+def serve_socket(pool, path, timeout=None):
+    """
+    Listen for clients on the given Unix socket, and answer each client's
+    requests on its own thread.
+    """
+    import io, socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            requests = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            responses = io.TextIOWrapper(
+                    self.wfile, encoding='utf-8', write_through=True)
+            try:
+                serve_stream(pool, requests, responses, timeout)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+
+    try:
+        print(f"Info: Listening on {path}", file=sys.stderr)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+def test_handle_request():
+    from pytest import approx
+
+    response = handle_request({'command': 'golden_gate_enzymes', 'args': []})
+    assert response == {'status': 0, 'output': 'BsaI-HFv2\nBbsI-HF\nEsp3I\n'}
+
+    response = handle_request({'command': 'serial_dilution', 'params': {
+        'volume': 20, 'high': 100, 'low': 1, 'steps': 5,
+    }})
+    assert 'serial dilution' in response['output']
+
+    response = handle_request({
+        'command': 'golden_gate',
+        'params': {'frags': ['bb:50:3000', 'ins:20:500'], 'num_reactions': 3},
+        'format': 'table',
+    })
+    table = {x['reagent']: x for x in response['table']}
+    assert table['bb']['master_mix'] is None
+    assert table['T4 ligase buffer']['volume'] == 1
+    assert table['T4 ligase buffer']['master_mix'] == approx(3.3)
+
+    response = handle_request({'command': 'which_gel_tray', 'args': ['x']})
+    assert response['status'] == 1
+    assert 'Usage:' in response['error']
+
+    # Interactive commands fail instead of waiting for input.
+    for request in [
+            {'command': 'gibson', 'args': ['-']},
+            {'command': 'gibson', 'args': []},
+            {'command': 'predict_od', 'args': []},
+    ]:
+        assert 'error' in handle_request(request, timeout=10)
+
+    assert 'error' in handle_request({'command': 'xxx'})
+    assert 'error' in handle_request({'command': 'which_gel_tray', 'params': {}})
+
+def test_serve_stream():
+    import io, json
+    from concurrent.futures import ThreadPoolExecutor
+
+    requests = io.StringIO('''\
+{"id": 1, "command": "golden_gate_enzymes", "args": []}
+
+{"id": 2, "command": "xxx"}
+not json
+''')
+    responses = io.StringIO()
+
+    with ThreadPoolExecutor(1) as pool:
+        serve_stream(pool, requests, responses)
+
+    responses = [json.loads(x) for x in responses.getvalue().splitlines()]
+    responses = sorted(responses, key=lambda x: x.get('id', 0))
+
+    assert len(responses) == 3
+    assert 'invalid request' in responses[0]['error']
+    assert responses[1]['id'] == 1
+    assert responses[1]['output'].startswith('BsaI-HFv2')
+    assert responses[2]['id'] == 2
+    assert 'error' in responses[2]
+
+
+def main(argv=None):
+    import docopt
+    from concurrent.futures import ProcessPoolExecutor
+    from wetlab import subcommands
+
+    args = docopt.docopt(__doc__, argv=argv)
+    workers = int(args['--workers']) if args['--workers'] else None
+    timeout = float(args['--timeout']) or None
+    preload = args['--preload'].split(',') if args['--preload'] else [
+            x for x in subcommands if x != 'serve']
+
+    for command in preload:
+        if command not in subcommands:
+            raise SystemExit(f"Error: unknown command '{command}'")
+
+    with ProcessPoolExecutor(
+            workers, initializer=init_worker, initargs=(preload,)) as pool:
+
+        if args['--socket']:
+            import signal
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+            try:
+                serve_socket(pool, args['--socket'], timeout)
+            except KeyboardInterrupt:
+                pass
+        else:
+            serve_stream(pool, sys.stdin, sys.stdout, timeout)
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,34 @@ Figure out which gel tray to use given the number and volume of your samples,
 then print out a protocol for casting that gel.
 
 Usage:
-    which_gel_tray.py <num_samples> <sample_μL> [<percent_agarose>] [options]
     which_gel_tray.py list
+    which_gel_tray.py batch <path> [options]
+    which_gel_tray.py pack <path> [options]
+    which_gel_tray.py <num_samples> <sample_μL> [<percent_agarose>] [options]
 
 Subcommands:
     list
         Print out all the known trays and combs.
 
+    batch
+        Pick a tray for every gel in the given TSV or CSV file (or "-" for 
+        stdin).  The file must have a header row with "num_samples" and 
+        "sample_uL" columns, and may have any other columns (e.g. names).  The 
+        input is printed back out with "tray", "comb", and "tae_mL" columns 
+        added.  The --extra, --round, --tray, and --comb options apply to 
+        every gel.
+
+    pack
+        Split the samples in the given TSV or CSV file (or "-" for stdin) 
+        across as many gels as necessary, using as little agarose and TAE as 
+        possible.  The file must have a header row with a "sample_uL" column, 
+        and one row for each sample.  The input is printed back out with 
+        "gel", "tray", "comb", and "tae_mL" columns added.  The options 
+        (e.g. --extra, --tray, --ladders) apply to every gel.
+
+If there are too many samples to fit on any one gel, they are split across 
+several gels, just like the `pack` command.
+
 Options:
     -x --extra PERCENT          [default: 50]
         How much extra volume each well should accommodate beyond the volume 
@@ -28,13 +49,26 @@ Options:
     -c --comb COMB
         Specify a particular comb to use.  The program will just calculate the 
         recipe to fill the tray sufficiently for your samples.
+
+    -l --ladders NUM            [default: 1]
+        How many lanes to reserve for ladders on each gel, when the samples 
+        need to be split across several gels.
+
+    -C --catalog PATH
+        Choose from the trays and combs described in the given TOML file, 
+        rather than the default catalog (gel_trays.toml, in the same directory 
+        as this script).
 """
 
-import re
+import os, re
 import nonstdlib
 
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_catalog_path = os.path.join(script_dir, 'gel_trays.toml')
+
 class Tray:
-    
+    __slots__ = 'name', 'width_mm', 'length_mm', 'max_depth_mm', 'num_slots', 'combs'
+
     def __init__(self, name, width_mm, length_mm, max_depth_mm, num_slots, combs):
         self.name = name
         self.width_mm = width_mm
@@ -42,7 +76,7 @@ class Tray:
         self.max_depth_mm = max_depth_mm
         self.num_slots = num_slots
         self.combs = combs
-        
+
     @property
     def max_volume_mL(self):
         return self.width_mm * self.length_mm * self.max_depth_mm / 1e3
@@ -53,6 +87,7 @@ class Tray:
 
 
 class Comb:
+    __slots__ = 'name', 'num_teeth', 'tooth_width_mm', 'tooth_length_mm', 'below_tooth_mm'
 
     def __init__(self, name, num_teeth, tooth_width_mm, tooth_length_mm, below_tooth_mm):
         self.name = name
@@ -67,6 +102,7 @@ class Comb:
 
 
 class Config:
+    __slots__ = 'tray', 'comb'
 
     def __init__(self, tray, comb):
         self.tray = tray
@@ -95,161 +131,448 @@ class Config:
         return gel_volume_mL
 
 
-
-trays = [
-    Tray('Owl Easycast B1A', 
-        width_mm=71.0,
-        length_mm=83.0,
-        max_depth_mm=13.0,
-        num_slots=2,
-        combs=[
-            Comb('B1A-10 (1.0 mm)',
-                num_teeth=10,
-                tooth_width_mm=4.5,
-                tooth_length_mm=1.0,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B1A-10 (1.5 mm)',
-                num_teeth=10,
-                tooth_width_mm=4.5,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B1A-6 (1.0 mm)',
-                num_teeth=6,
-                tooth_width_mm=9.0,
-                tooth_length_mm=1.0,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B1A-6 (1.5 mm)',
-                num_teeth=6,
-                tooth_width_mm=9.0,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
-        ],
-    ),
-    Tray('Owl Easycast B2',
-        width_mm=120.0,
-        length_mm=138.5,
-        max_depth_mm=13.0,
-        num_slots=4,
-        combs=[
-            Comb('B2-25',
-                num_teeth=25,
-                tooth_width_mm=2.0,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B2-20 (1.0 mm)',
-                num_teeth=20,
-                tooth_width_mm=4.0,
-                tooth_length_mm=1.0,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B2-20 (1.5 mm)',
-                num_teeth=20,
-                tooth_width_mm=4.0,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B2-12 (1.0 mm)',
-                num_teeth=12,
-                tooth_width_mm=7.0,
-                tooth_length_mm=1.0,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B2-12 (1.5 mm)',
-                num_teeth=12,
-                tooth_width_mm=7.0,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
-            Comb('B2-8',
-                num_teeth=8,
-                tooth_width_mm=12.0,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
-        ],
-    ),
-    Tray('Owl D4',
-        width_mm=156.0,
-        length_mm=173.0,
-        max_depth_mm=13.0,
-        num_slots=3,
-        combs=[
-            Comb('D4-17',
-                num_teeth=17,
-                tooth_width_mm=7.0,
-                tooth_length_mm=1.5,
-                below_tooth_mm=2.0,
-            ),
+def gel_volumes_mL(tooth_area_mm2, below_tooth_mm, tray_area_mm2, sample_uL, unit_mL):
+    """
+    A vectorized version of `Config.gel_volume_mL()`.  The arguments can be 
+    any arrays that broadcast against each other.
+    """
+    import numpy as np
+
+    gel_depth_mm = sample_uL / tooth_area_mm2 + below_tooth_mm
+    gel_volume_mL = tray_area_mm2 * gel_depth_mm / 1e3
+
+    if unit_mL > 0:
+        gel_volume_mL = unit_mL * (gel_volume_mL // unit_mL + 1)
+
+    return gel_volume_mL
+
+def make_config_table(trays):
+    """
+    Return every combination of tray and comb, in order of preference (i.e. 
+    smallest tray, then smallest comb), along with a dictionary of arrays 
+    describing each one.
+    """
+    import numpy as np
+
+    configs = sorted(
+            (Config(tray, comb) for tray in trays for comb in tray.combs),
+            key=lambda x: (x.tray.area_mm2, x.comb.area_mm2),
+    )
+    table = {
+            'num_wells': [x.num_wells for x in configs],
+            'max_well_volume_uL': [x.max_well_volume_uL for x in configs],
+            'max_volume_mL': [x.tray.max_volume_mL for x in configs],
+            'tray_area_mm2': [x.tray.area_mm2 for x in configs],
+            'tooth_area_mm2': [x.comb.area_mm2 for x in configs],
+            'below_tooth_mm': [x.comb.below_tooth_mm for x in configs],
+    }
+    return configs, {k: np.array(v) for k, v in table.items()}
+
+def load_catalog(path=None, cache_path=None):
+    """
+    Load the trays and combs described by the given TOML file (by default, 
+    `gel_trays.toml` in the same directory as this script).
+
+    Returns the list of trays, and the `configs` and `config_table` that 
+    `make_config_table()` would build from them.  All of these are cached, and 
+    the cache is only rebuilt when the catalog has been modified.  The cache 
+    holds plain tuples rather than `Tray` and `Comb` objects, so that it can be 
+    read no matter how this module was imported (e.g. as `__main__`).
+    """
+    import pickle
+
+    if path is None:
+        path = default_catalog_path
+    if cache_path is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        cache_path = os.path.join(script_dir, '__pycache__', f'{name}.pickle')
+
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache['path'] != path or cache['mtime'] != mtime:
+            raise ValueError
+    except Exception:
+        cache = compile_catalog(path)
+        cache['path'], cache['mtime'] = path, mtime
+
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(f'{cache_path}.{os.getpid()}', 'wb') as f:
+                pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{cache_path}.{os.getpid()}', cache_path)
+        except OSError:
+            pass
+
+    trays = [
+            Tray(*tray, combs=[Comb(*comb) for comb in combs])
+            for *tray, combs in cache['trays']
+    ]
+    configs = [
+            Config(trays[i], trays[i].combs[j])
+            for i, j in cache['configs']
+    ]
+    return trays, configs, cache['config_table']
+
+def compile_catalog(path):
+    """
+    Parse the given TOML catalog into the form cached by `load_catalog()`.
+    """
+    try:
+        import tomllib
+    except ImportError:
+        import tomli as tomllib
+
+    with open(path, 'rb') as f:
+        catalog = tomllib.load(f)
+
+    try:
+        trays = [
+                Tray(**{
+                    **tray,
+                    'combs': [Comb(**comb) for comb in tray['combs']],
+                })
+                for tray in catalog['trays']
         ]
-    ),
-    Tray('Shelton MP-1015',
-        width_mm=104.0,
-        length_mm=150.0,
-        max_depth_mm=18.0,
-        num_slots=3,    # The tray has 4 slots, but the lab only has 3 combs.
-        combs=[
-            Comb('16',
-                num_teeth=16,
-                tooth_width_mm=3.5,
-                tooth_length_mm=2.0,
-                below_tooth_mm=1.0,
-            ),
-        ],
-    ),
-    Tray('BioRad Mini-Sub Cell GT (7 cm)',
-        width_mm=62.0,
-        length_mm=72.0,
-        max_depth_mm=10.0,
-        num_slots=1,
-        combs=[
-            Comb('15',
-                num_teeth=15,
-                tooth_width_mm=2.5,
-                tooth_length_mm=1.5,
-                below_tooth_mm=1.5,
-            ),
-        ],
-    ),
-    Tray('BioRad Mini-Sub Cell GT (10 cm)',
-        width_mm=62.0,
-        length_mm=102.0,
-        max_depth_mm=10.0,
-        num_slots=2,
-        combs=[
-            Comb('15',
-                num_teeth=15,
-                tooth_width_mm=2.5,
-                tooth_length_mm=1.5,
-                below_tooth_mm=1.5,
-            ),
-        ],
-    ),
-    Tray('BioRad Sub Cell GT (10 cm)',
-        width_mm=151.0,
-        length_mm=102.0,
-        max_depth_mm=10.0,
-        num_slots=2,
-        combs=[
-            Comb('26',
-                num_teeth=26,
-                tooth_width_mm=3.0,
-                tooth_length_mm=1.0,
-                below_tooth_mm=1.5,
-            ),
-        ],
-    ),
-]
-            
+    except (KeyError, TypeError) as err:
+        raise ValueError(f"{path}: invalid tray or comb: {err}") from None
+
+    configs, config_table = make_config_table(trays)
+    index = {id(comb): (i, j)
+            for i, tray in enumerate(trays)
+            for j, comb in enumerate(tray.combs)
+    }
+
+    return {
+            'trays': [
+                (x.name, x.width_mm, x.length_mm, x.max_depth_mm, x.num_slots, [
+                    (y.name, y.num_teeth, y.tooth_width_mm, y.tooth_length_mm, y.below_tooth_mm)
+                    for y in x.combs
+                ])
+                for x in trays
+            ],
+            'configs': [index[id(x.comb)] for x in configs],
+            'config_table': config_table,
+    }
+
+def find_configs(num_samples, sample_uL, unit_mL=10, tray=None, comb=None):
+    """
+    Pick the smallest tray (and comb) that can fit each of the given gels.
+
+    `num_samples` and `sample_uL` can be scalars or arrays, and are broadcast 
+    against each other.  `sample_uL` should already include any extra volume.  
+    `tray` and `comb` are optional regular expressions that restrict which 
+    trays and combs can be picked.
+
+    Returns an array of indices into `configs`, with -1 for any gel that 
+    doesn't fit in any tray.
+    """
+    import numpy as np
+
+    num_samples, sample_uL = np.broadcast_arrays(
+            np.asarray(num_samples)[..., None],
+            np.asarray(sample_uL, dtype=float)[..., None],
+    )
+    allowed = allowed_configs(tray, comb)
+
+    gel_volume_mL = gel_volumes_mL(
+            config_table['tooth_area_mm2'],
+            config_table['below_tooth_mm'],
+            config_table['tray_area_mm2'],
+            sample_uL,
+            unit_mL,
+    )
+    fits = allowed \
+            & (config_table['num_wells'] >= num_samples) \
+            & (gel_volume_mL <= config_table['max_volume_mL'])
+
+    # The configs are sorted by preference, so the first one that fits is the 
+    # best.
+    return np.where(fits.any(axis=-1), fits.argmax(axis=-1), -1)
+
+def allowed_configs(tray=None, comb=None):
+    """
+    Return a boolean array indicating which of the `configs` have tray and comb 
+    names matching the given regular expressions.
+    """
+    import numpy as np
+
+    if not tray and not comb:
+        return np.ones(len(configs), dtype=bool)
+
+    tray_re = re.compile(tray or '', re.I)
+    comb_re = re.compile(comb or '', re.I)
+
+    return np.array([
+        bool(tray_re.search(x.tray.name) and comb_re.search(x.comb.name))
+        for x in configs
+    ])
+
+def pack_samples(sample_uL, unit_mL=10, tray=None, comb=None, num_ladders=1):
+    """
+    Split the given samples across as many gels as necessary, using as little 
+    TAE (and therefore agarose) as possible in total.
+
+    `sample_uL` is the volume of each sample, including any extra volume.  
+    `num_ladders` lanes are left empty on every gel.  Returns a list of `(config, 
+    samples, gel_volume_mL)` tuples, one for each gel, where `samples` is an 
+    array of indices into `sample_uL`.  Raises ValueError if some sample is too 
+    big to fit in any tray.
+
+    The amount of TAE needed for a gel depends only on the config and the 
+    largest sample loaded on it.  So if the samples are sorted from largest to 
+    smallest, there is always an optimal packing where each gel takes a 
+    contiguous run of samples, and where each gel is filled as full as 
+    possible.  That makes it possible to find the best packing by dynamic 
+    programming, with only one option to consider for each config at each 
+    sample.
+    """
+    import numpy as np
+
+    sample_uL = np.asarray(sample_uL, dtype=float)
+    order = np.argsort(-sample_uL, kind='stable')
+    n = len(order)
+
+    capacity = config_table['num_wells'] - num_ladders
+    allowed = allowed_configs(tray, comb) & (capacity > 0)
+
+    # The volume of each gel, if it were started with each sample.
+    gel_volume_mL = gel_volumes_mL(
+            config_table['tooth_area_mm2'],
+            config_table['below_tooth_mm'],
+            config_table['tray_area_mm2'],
+            sample_uL[order, None],
+            unit_mL,
+    )
+    gel_volume_mL[:, ~allowed] = np.inf
+    gel_volume_mL[gel_volume_mL > config_table['max_volume_mL']] = np.inf
+
+    # best_mL[i]: The least TAE needed for the i-th largest sample and every 
+    # sample smaller than it.  best_config[i]: The config to use for the gel 
+    # with the i-th largest sample, in that optimal solution.
+
+    best_mL = np.zeros(n + 1)
+    best_config = np.zeros(n, dtype=int)
+
+    for i in range(n - 1, -1, -1):
+        next_i = np.minimum(i + capacity, n)
+        total_mL = gel_volume_mL[i] + best_mL[next_i]
+        best_config[i] = total_mL.argmin()
+        best_mL[i] = total_mL[best_config[i]]
+
+    if not np.isfinite(best_mL[0]):
+        raise ValueError(f"no tray can fit a {sample_uL.max():g} μL sample")
+
+    gels = []
+    i = 0
+
+    while i < n:
+        j = best_config[i]
+        next_i = min(i + capacity[j], n)
+        gels.append((configs[j], order[i:next_i], float(gel_volume_mL[i, j])))
+        i = next_i
+
+    return gels
+
+def find_config(num_samples, sample_uL, unit_mL=10, tray=None, comb=None):
+    """
+    Return the best `Config` for a single gel, or None if no tray fits.
+    """
+    i = find_configs(num_samples, sample_uL, unit_mL, tray, comb)
+    return configs[i] if i >= 0 else None
+
+
+trays, configs, config_table = load_catalog()
+
+
+def test_load_catalog(tmp_path):
+    from pytest import raises
+    catalog_path = tmp_path / 'trays.toml'
+    cache_path = tmp_path / 'trays.pickle'
+
+    catalog_path.write_text('''\
+[[trays]]
+name = "big"
+width_mm = 100.0
+length_mm = 100.0
+max_depth_mm = 10.0
+num_slots = 1
+
+[[trays.combs]]
+name = "wide"
+num_teeth = 5
+tooth_width_mm = 10.0
+tooth_length_mm = 1.0
+below_tooth_mm = 1.0
+
+[[trays]]
+name = "small"
+width_mm = 50.0
+length_mm = 50.0
+max_depth_mm = 10.0
+num_slots = 2
+
+[[trays.combs]]
+name = "narrow"
+num_teeth = 10
+tooth_width_mm = 2.0
+tooth_length_mm = 1.0
+below_tooth_mm = 1.0
+''')
+
+    trays, configs, table = load_catalog(catalog_path, cache_path)
+    assert cache_path.exists()
+    assert [x.name for x in trays] == ['big', 'small']
+    assert [x.tray.name for x in configs] == ['small', 'big']
+    assert table['num_wells'].tolist() == [20, 5]
+
+    # Reading the cache gives the same results, with the trays and combs 
+    # shared between the configs.
+    trays, configs, table = load_catalog(catalog_path, cache_path)
+    assert [x.tray.name for x in configs] == ['small', 'big']
+    assert configs[0].tray is trays[1]
+    assert configs[0].comb is trays[1].combs[0]
+
+    # The cache is rebuilt when the catalog changes.
+    text = catalog_path.read_text().replace('num_teeth = 5', 'num_teeth = 6')
+    catalog_path.write_text(text)
+    os.utime(catalog_path, ns=(0, 0))
+
+    trays, configs, table = load_catalog(catalog_path, cache_path)
+    assert table['num_wells'].tolist() == [20, 6]
+
+    catalog_path.write_text(text.replace('num_slots', 'num_slot'))
+    with raises(ValueError, match='num_slot'):
+        load_catalog(catalog_path, cache_path)
+
+    with raises(AttributeError):
+        trays[0].colour = 'blue'
+
+def test_find_configs():
+    import numpy as np
+
+    # Check the table against the original search: a plain loop over every 
+    # tray and comb, in catalog order, keeping the smallest tray (and then the 
+    # smallest comb in that tray) that fits.
+    def reference_config(num_samples, sample_uL, tray_re=None, comb_re=None):
+        best_config = None
 
+        for tray in trays:
+            for comb in tray.combs:
+                config = Config(tray, comb)
+
+                if tray_re and not re.search(tray_re, tray.name, re.I):
+                    continue
+                if comb_re and not re.search(comb_re, comb.name, re.I):
+                    continue
+                if config.num_wells < num_samples:
+                    continue
+                if config.gel_volume_mL(sample_uL, 10) > tray.max_volume_mL:
+                    continue
+
+                if best_config is None or tray.area_mm2 < best_config.tray.area_mm2:
+                    best_config = config
+                if best_config.tray is tray and comb.area_mm2 < best_config.comb.area_mm2:
+                    best_config = config
+
+        return best_config
+
+    def describe(config):
+        return config and (config.tray.name, config.comb.name)
+
+    num_samples = np.arange(1, 121)
+    sample_uL = np.array([1, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200])
+
+    for tray_re, comb_re in [(None, None), ('B2', None), (None, '1.5')]:
+        best = find_configs(
+                num_samples[:,None], sample_uL[None,:], tray=tray_re, comb=comb_re)
+        assert best.shape == (len(num_samples), len(sample_uL))
+
+        for i, n in enumerate(num_samples):
+            for j, v in enumerate(sample_uL):
+                expected = reference_config(n, v, tray_re, comb_re)
+                actual = configs[best[i,j]] if best[i,j] >= 0 else None
+                assert describe(actual) == describe(expected), (n, v, tray_re, comb_re)
+
+    config = find_config(10, 15)
+    assert config.tray.name == 'BioRad Mini-Sub Cell GT (7 cm)'
+
+    config = find_config(10, 15, tray='B2', comb='1.0')
+    assert config.tray.name == 'Owl Easycast B2'
+    assert config.comb.name == 'B2-20 (1.0 mm)'
+
+    assert find_config(1000, 10) is None
+
+
+def test_pack_samples():
+    import numpy as np
+    from pytest import raises
+
+    # Samples that fit on one gel are put on the gel that needs the least TAE, 
+    # with room for a ladder.
+    gels = pack_samples([15] * 8)
+    assert len(gels) == 1
+    assert sorted(gels[0][1]) == list(range(8))
+    assert gels[0][2] == min(
+            x.gel_volume_mL(15, 10) for x in configs
+            if x.num_wells >= 9
+            and x.gel_volume_mL(15, 10) <= x.tray.max_volume_mL
+    )
+
+    # Every sample ends up on exactly one gel, no gel is overfilled, and no gel 
+    # is too big for its tray.
+    rng = np.random.default_rng(0)
+    sample_uL = rng.choice([5, 10, 20, 40], size=500)
+    gels = pack_samples(sample_uL)
+
+    samples = np.concatenate([x[1] for x in gels])
+    assert sorted(samples) == list(range(500))
+
+    for config, samples, gel_volume_mL in gels:
+        assert len(samples) < config.num_wells
+        assert gel_volume_mL == config.gel_volume_mL(sample_uL[samples].max(), 10)
+        assert gel_volume_mL <= config.tray.max_volume_mL
+
+    # Check the packing against an exhaustive search of a small problem, 
+    # including gels that aren't filled all the way.
+    from functools import lru_cache
+
+    sample_uL = [60, 45, 45, 30, 30, 30, 20, 20, 10, 10, 10, 5, 5]
+    gels = pack_samples(sample_uL, tray='B1A', num_ladders=8)
+    assert len(gels) > 1
+
+    candidates = [x for x in configs if 'B1A' in x.tray.name]
+
+    @lru_cache
+    def search(i):
+        if i == len(sample_uL):
+            return 0
+        best_mL = np.inf
+        for config in candidates:
+            mL = config.gel_volume_mL(sample_uL[i], 10)
+            if mL > config.tray.max_volume_mL:
+                continue
+            for n in range(1, config.num_wells - 8 + 1):
+                best_mL = min(best_mL, mL + search(min(i + n, len(sample_uL))))
+        return best_mL
+
+    assert sum(x[2] for x in gels) == search(0)
+
+    with raises(ValueError):
+        pack_samples([1e4])
+
+
+def main(argv=None):
+    global trays, configs, config_table
 
-if __name__ == '__main__':
     import docopt
-    args = docopt.docopt(__doc__)
+    args = docopt.docopt(__doc__, argv=argv)
+
+    if args['--catalog']:
+        trays, configs, config_table = load_catalog(args['--catalog'])
 
     if args['list']:
         for tray in trays:
@@ -258,37 +581,82 @@ if __name__ == '__main__':
                 print(' ', comb.name)
         raise SystemExit
 
-    num_samples = int(args['<num_samples>'])
-    sample_uL = float(args['<sample_μL>']) * (1 + float(args['--extra']) / 100)
-    percent_agarose = float(args['<percent_agarose>'] or 1)
+    extra = 1 + float(args['--extra']) / 100
     unit_mL = int(args['--round'])
-    user_tray = re.compile(args['--tray'], re.I) if args['--tray'] else None
-    user_comb = re.compile(args['--comb'], re.I) if args['--comb'] else None
 
-    # Find the smallest tray that can fit all the samples.
+    if args['batch']:
+        import sys
+        import pandas as pd
+
+        path = args['<path>']
+        sep = '\t' if path == '-' or path.endswith('.tsv') else ','
+        df = pd.read_csv(sys.stdin if path == '-' else path, sep=sep)
+
+        sample_uL = df['sample_uL'].to_numpy(dtype=float) * extra
+        best = find_configs(
+                df['num_samples'].to_numpy(), sample_uL, unit_mL,
+                args['--tray'], args['--comb'])
+
+        found = best >= 0
+        df['tray'] = [configs[i].tray.name if i >= 0 else None for i in best]
+        df['comb'] = [configs[i].comb.name if i >= 0 else None for i in best]
+        df['tae_mL'] = gel_volumes_mL(
+                config_table['tooth_area_mm2'][best],
+                config_table['below_tooth_mm'][best],
+                config_table['tray_area_mm2'][best],
+                sample_uL,
+                unit_mL,
+        )
+        df.loc[~found, 'tae_mL'] = None
+        df.to_csv(sys.stdout, sep=sep, index=False)
+        raise SystemExit
 
-    best_config = None
+    if args['pack']:
+        import sys
+        import numpy as np
+        import pandas as pd
+
+        path = args['<path>']
+        sep = '\t' if path == '-' or path.endswith('.tsv') else ','
+        df = pd.read_csv(sys.stdin if path == '-' else path, sep=sep)
+
+        try:
+            gels = pack_samples(
+                    df['sample_uL'].to_numpy(dtype=float) * extra, unit_mL,
+                    args['--tray'], args['--comb'], int(args['--ladders']))
+        except ValueError as err:
+            raise SystemExit(f"Error: {err}")
+
+        gel = np.zeros(len(df), dtype=int)
+        for i, (config, samples, gel_volume_mL) in enumerate(gels):
+            gel[samples] = i
+
+        df['gel'] = gel + 1
+        df['tray'] = [gels[i][0].tray.name for i in gel]
+        df['comb'] = [gels[i][0].comb.name for i in gel]
+        df['tae_mL'] = [gels[i][2] for i in gel]
+        df.to_csv(sys.stdout, sep=sep, index=False)
+        raise SystemExit
 
-    for tray in trays:
-        for comb in tray.combs:
-            config = Config(tray, comb)
+    num_samples = int(args['<num_samples>'])
+    sample_uL = float(args['<sample_μL>']) * extra
+    percent_agarose = float(args['<percent_agarose>'] or 1)
 
-            if user_tray and not user_tray.search(tray.name):
-                continue
-            if user_comb and not user_comb.search(comb.name):
-                continue
-            if config.num_wells < num_samples:
-                continue
-            if config.gel_volume_mL(sample_uL, unit_mL) > tray.max_volume_mL:
-                continue
+    # Find the smallest tray that can fit all the samples.
+
+    best_config = find_config(
+            num_samples, sample_uL, unit_mL, args['--tray'], args['--comb'])
 
-            if best_config is None or tray.area_mm2 < best_config.tray.area_mm2:
-                best_config = config
-            if best_config.tray is tray and comb.area_mm2 < best_config.comb.area_mm2:
-                best_config = config
-            
     if best_config is None:
-        print("No tray found.")
+        try:
+            gels = pack_samples(
+                    [sample_uL] * num_samples, unit_mL,
+                    args['--tray'], args['--comb'], int(args['--ladders']))
+        except ValueError:
+            print("No tray found.")
+            raise SystemExit
+
+        print_multi_gel_protocol(gels, percent_agarose)
         raise SystemExit
 
     # Print a protocol for casting the gel.
@@ -308,3 +676,28 @@ if __name__ == '__main__':
     print('   Agarose: {} g'.format(agarose_needed_g))
     print('   GelRed: {} μL'.format(gelred_needed_uL))
     print()
+
+def print_multi_gel_protocol(gels, percent_agarose):
+    from inform import plural
+
+    tae_needed_mL = sum(x[2] for x in gels)
+    agarose_needed_g = percent_agarose * tae_needed_mL / 100
+    gelred_needed_uL = tae_needed_mL / 10
+
+    print('1. Assemble {}:'.format(plural(len(gels)).format('# gel tray/s')))
+    print()
+    for i, (config, samples, gel_volume_mL) in enumerate(gels, 1):
+        print('   Gel {}: {}, comb {} ({}, {} mL)'.format(
+            i, config.tray.name, config.comb.name,
+            plural(len(samples)).format('# sample/s'), gel_volume_mL,
+        ))
+    print()
+    print('2. Use the following recipe to pour all the gels:')
+    print()
+    print('   TAE: {} mL'.format(tae_needed_mL))
+    print('   Agarose: {} g'.format(agarose_needed_g))
+    print('   GelRed: {} μL'.format(gelred_needed_uL))
+    print()
+
+if __name__ == '__main__':
+    main()
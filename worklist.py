@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+
+"""\
+Export a reaction setup or a plate of serial dilutions as a CSV worklist for a
+liquid handler.
+
+Usage:
+    worklist.py reaction <request> [options]
+    worklist.py dilution <volume> <high> <low> <steps> [options]
+
+Arguments:
+    <request>
+        A JSON file (or "-" for stdin) describing the reaction to setup, in the
+        same format as a request to `wetlab_server.py`, e.g.:
+
+            {"command": "golden_gate", "params": {"frags": ["bb:50:3000",
+            "ins:20:500"], "num_reactions": 96}}
+
+        The command must be able to make a reaction table (i.e. it must have a
+        `make_reaction()` function).  Reagents in the master mix are combined
+        in a single tube first, then the master mix is dispensed into each
+        reaction.
+
+    <volume> <high> <low> <steps>
+        The same arguments as for `serial_dilution.py plate`.
+
+Options:
+    -w --wells NUM
+        The number of reactions to setup.  By default, this is the number of
+        reactions in the request.
+
+    -p --plate WELLS    [default: 96]
+        The kind of plate to setup the reactions or dilutions in: 96 or 384.
+
+    -n --num-series NUM
+        The number of serial dilutions to put on the plate(s).  See
+        `serial_dilution.py plate`.
+
+    -c --by-column
+        Put each serial dilution in its own column, rather than its own row.
+
+    -t --tip-volume UL  [default: 200]
+        The most liquid that a tip can hold.  Runs of dispenses from the same
+        source are split so that each run fits in one tip, and any transfer
+        that doesn't fit in one tip is made in several trips.
+
+    -o --output PATH
+        Save the worklist to the given path.  By default, the worklist is
+        printed to stdout.
+
+    --naive
+        Make one aspirate and one dispense (with a fresh tip) for each
+        transfer, in the order the transfers are calculated.  This is mostly
+        useful for comparison.
+
+    -s --simulate
+        Print how many tips, head moves, etc. the worklist needs (and how many
+        the naive worklist would need) to stderr.
+
+Each row of the worklist is one action for the liquid handler:
+
+    tip
+        Discard the current tip (if any) and pick up a fresh one.
+
+    aspirate, dispense
+        Aspirate or dispense the given volume at the given labware and well.
+
+    mix
+        Mix the given well by pipetting the given volume up and down.
+
+Transfers are grouped by source, and every dispense from the same source
+shares one tip.  Dispenses that fit in one tip are made from a single
+aspirate, in a serpentine order across the destination plate.  Transfers
+that need to be mixed (e.g. between the wells of a serial dilution) always
+get their own tip, and are kept in order.
+"""
+
+import re
+from dataclasses import dataclass
+
+well_regex = re.compile(r'([A-Z])(\d+)$')
+labware_regex = re.compile(r'(.*?)(?: (\d+))?$')
+
+# Rough timings for a generic liquid handler, used to estimate how long a
+# worklist will take.  Labware is assumed to sit in a row of deck slots, with
+# the tips (and the trash) to the left of the first slot.
+robot_timings = {
+        'tip_s': 6.0,
+        'aspirate_s': 2.0,
+        'dispense_s': 1.5,
+        'mix_s': 4.0,
+        'speed_mm_s': 250.0,
+        'slot_mm': 130.0,
+        'plate_mm': 108.0,
+}
+
+@dataclass
+class Transfer:
+    source: str
+    source_well: str
+    dest: str
+    dest_well: str
+    volume_uL: float
+    mix: bool = False
+
+def well_names(n, plate=96, labware='plate'):
+    """
+    Return the labware and well (e.g. "A1") for each of the first `n` wells,
+    going across each row of the plate in turn.  If there are more than
+    `plate` wells, the extra wells go on additional plates (e.g. "plate 2").
+    """
+    num_rows, num_cols = plate_shape(plate)
+    wells = []
+
+    for i in range(n):
+        k, i = divmod(i, num_rows * num_cols)
+        row, col = divmod(i, num_cols)
+        wells.append((
+            labware if k == 0 else f'{labware} {k + 1}',
+            f'{chr(ord("A") + row)}{col + 1}',
+        ))
+
+    return wells
+
+def plate_shape(plate):
+    """
+    Return the number of rows and columns in the given kind of plate.
+    """
+    from serial_dilution import plate_shapes
+    try:
+        return plate_shapes[int(plate)]
+    except KeyError:
+        expected = ' or '.join(map(str, plate_shapes))
+        raise ValueError(f"unknown plate: {plate} (expected {expected})") from None
+
+def parse_well(well):
+    """
+    Return the row and column (both counting from 0) of the given well.
+    """
+    row, col = well_regex.match(well).groups()
+    return ord(row) - ord('A'), int(col) - 1
+
+def uL_from_volume(volume, unit):
+    multipliers = {'nL': 1e-3, 'µL': 1, 'μL': 1, 'uL': 1, 'mL': 1e3}
+    try:
+        return volume * multipliers[unit]
+    except KeyError:
+        raise ValueError(f"unknown volume unit: '{unit}'") from None
+
+def reaction_transfers(table, num_reactions, plate=96):
+    """
+    Return the transfers needed to setup the given number of reactions.
+
+    The reaction is described by a table in the format returned by
+    `wetlab_server.reaction_table()`.  The master mix reagents are combined
+    in a single tube before anything is added to the reactions, and the
+    volume of each is taken from the table, so the table should be made for
+    (at least) the given number of reactions.  Each other reagent is taken
+    from its own tube.
+    """
+    sources = list(table)
+    master_mix = [x for x in table if x['master_mix'] is not None]
+    if master_mix:
+        sources.append({'reagent': 'master mix'})
+
+    source_wells = dict(zip(
+            (x['reagent'] for x in sources),
+            well_names(len(sources), labware='reagents'),
+    ))
+    dest_wells = well_names(num_reactions, plate)
+    transfers = []
+
+    def add(reagent, dest, volume_uL):
+        transfers.append(Transfer(*source_wells[reagent], *dest, volume_uL))
+
+    for reagent in master_mix:
+        unit = reagent['volume_unit']
+        add(reagent['reagent'],
+                source_wells['master mix'],
+                uL_from_volume(reagent['master_mix'], unit))
+
+    mm_uL = sum(
+            uL_from_volume(x['volume'], x['volume_unit'])
+            for x in master_mix
+    )
+
+    for dest in dest_wells:
+        if master_mix:
+            add('master mix', dest, mm_uL)
+
+        for reagent in table:
+            if reagent['master_mix'] is None:
+                add(reagent['reagent'], dest, uL_from_volume(
+                    reagent['volume'], reagent['volume_unit']))
+
+    return transfers
+
+def dilution_transfers(volume, initial_volume, transfer, conc, by_column=False, material='material', diluent='water'):
+    """
+    Return the transfers needed to make the serial dilutions planned by
+    `serial_dilution.plan_plate()`.
+
+    Each series gets its own tube of material (e.g. "material 1"), and all of
+    the series are diluted with the same diluent.
+    """
+    import numpy as np
+
+    num_plates, num_rows, num_cols = conc.shape
+    num_series = len(initial_volume)
+
+    # Work out the plate and well of every step of each series.
+    lines = conc.transpose(0, 2, 1) if by_column else conc
+    lines = lines.reshape(-1, lines.shape[-1])[:num_series]
+    steps = np.isfinite(lines).sum(axis=1)
+
+    def well(i, j):
+        k, line = divmod(i, num_cols if by_column else num_rows)
+        row, col = (j, line) if by_column else (line, j)
+        return (
+                'plate' if k == 0 else f'plate {k + 1}',
+                f'{chr(ord("A") + row)}{col + 1}',
+        )
+
+    sources = [diluent] + [f'{material} {i + 1}' for i in range(num_series)]
+    source_wells = dict(zip(
+        sources, well_names(len(sources), labware='reagents')))
+    transfers = []
+
+    for i in range(num_series):
+        for j in range(1, steps[i]):
+            transfers.append(Transfer(
+                *source_wells[diluent], *well(i, j), volume))
+
+        transfers.append(Transfer(
+            *source_wells[f'{material} {i + 1}'], *well(i, 0),
+            float(initial_volume[i])))
+
+        for j in range(1, steps[i]):
+            transfers.append(Transfer(
+                *well(i, j - 1), *well(i, j), float(transfer[i]), mix=True))
+
+    return transfers
+
+def naive_worklist(transfers):
+    """
+    Return a worklist that uses a fresh tip for every transfer, and makes the
+    transfers in the given order.
+    """
+    worklist = []
+
+    for t in transfers:
+        worklist += [
+                ('tip', None, None, None),
+                ('aspirate', t.source, t.source_well, t.volume_uL),
+                ('dispense', t.dest, t.dest_well, t.volume_uL),
+        ]
+        if t.mix:
+            worklist.append(('mix', t.dest, t.dest_well, t.volume_uL))
+
+    return worklist
+
+def plan_worklist(transfers, tip_volume_uL=200):
+    """
+    Return a worklist that makes the given transfers with as few tips and
+    head moves as possible.
+
+    Transfers from the same source are grouped together (in the order each
+    source is first used) and share a tip.  The destinations in each group are
+    visited in a serpentine order, and consecutive dispenses are made from a
+    single aspirate, as long as they fit in one tip.  Transfers that need to be
+    mixed get their own tip and stay in the given order, relative to the
+    groups.  Any transfer that doesn't fit in one tip is split into several
+    aspirates and dispenses.  This assumes that nothing is taken out of a well before
+    everything has been added to it.
+    """
+    groups = {}
+    sequence = []
+
+    for t in transfers:
+        if t.mix:
+            sequence.append(t)
+            continue
+
+        key = t.source, t.source_well
+        if key not in groups:
+            groups[key] = []
+            sequence.append(key)
+        groups[key].append(t)
+
+    worklist = []
+
+    for item in sequence:
+        if isinstance(item, Transfer):
+            t = item
+            worklist.append(('tip', None, None, None))
+            for volume_uL in split_volume(t.volume_uL, tip_volume_uL):
+                worklist += [
+                        ('aspirate', t.source, t.source_well, volume_uL),
+                        ('dispense', t.dest, t.dest_well, volume_uL),
+                ]
+            worklist.append((
+                'mix', t.dest, t.dest_well, min(t.volume_uL, tip_volume_uL)))
+            continue
+
+        source, source_well = item
+        dispenses = []
+        for t in sorted(groups[item], key=serpentine_order):
+            for volume_uL in split_volume(t.volume_uL, tip_volume_uL):
+                dispenses.append((t.dest, t.dest_well, volume_uL))
+
+        worklist.append(('tip', None, None, None))
+
+        run = []
+        for dispense in dispenses + [None]:
+            run_uL = sum(x[2] for x in run)
+            if dispense is None or run_uL + dispense[2] > tip_volume_uL:
+                worklist.append(('aspirate', source, source_well, run_uL))
+                worklist += [('dispense', *x) for x in run]
+                run = []
+            if dispense is not None:
+                run.append(dispense)
+
+    return worklist
+
+def split_volume(volume_uL, tip_volume_uL):
+    """
+    Split the given volume into pieces that each fit in one tip.
+    """
+    volumes = []
+    while volume_uL > tip_volume_uL:
+        volumes.append(tip_volume_uL)
+        volume_uL -= tip_volume_uL
+    volumes.append(volume_uL)
+    return volumes
+
+def serpentine_order(transfer):
+    """
+    Sort destinations row by row, alternating the direction of each row, so
+    the head never has to travel back across the plate.  Numbered labware
+    (e.g. "plate 2", "plate 10") is sorted by number.
+    """
+    labware, number = labware_regex.match(transfer.dest).groups()
+    row, col = parse_well(transfer.dest_well)
+    return labware, int(number or 1), row, col if row % 2 == 0 else -col
+
+def simulate(worklist, tip_volume_uL=200, plate=96):
+    """
+    Run the given worklist on an imaginary liquid handler, and count how many
+    tips, aspirates, dispenses, mixes, and head moves it needs.
+
+    Also returns the distance travelled by the head (in mm), an estimate of
+    how long the worklist would take (in seconds, see `robot_timings`), and the
+    net volume added to (or taken from) every well.  All the labware is assumed
+    to have the same well spacing as the given kind of plate.  Raises ValueError if the
+    worklist overfills a tip, or dispenses more than it aspirated.
+    """
+    from collections import Counter
+
+    timings = robot_timings
+    num_rows, num_cols = plate_shape(plate)
+    pitch_mm = timings['plate_mm'] / num_cols
+    counts = Counter()
+    volumes = Counter()
+    slots = {}
+    position = (0.0, 0.0)
+    distance_mm = 0
+    tip_uL = None
+
+    def locate(labware, well):
+        if labware is None:
+            return (-timings['slot_mm'], 0.0)
+        slot = slots.setdefault(labware, len(slots))
+        row, col = parse_well(well)
+        return (slot * timings['slot_mm'] + col * pitch_mm, row * pitch_mm)
+
+    def move_to(labware, well):
+        nonlocal position, distance_mm
+        xy = locate(labware, well)
+        if xy != position:
+            counts['moves'] += 1
+            distance_mm += ((xy[0] - position[0])**2 + (xy[1] - position[1])**2)**0.5
+            position = xy
+
+    for action, labware, well, volume_uL in worklist:
+        move_to(labware, well)
+
+        if action == 'tip':
+            counts['tips'] += 1
+            tip_uL = 0
+            continue
+
+        if tip_uL is None:
+            raise ValueError(f"{action} without a tip")
+
+        if action == 'aspirate':
+            counts['aspirates'] += 1
+            tip_uL += volume_uL
+            volumes[labware, well] -= volume_uL
+            if tip_uL > tip_volume_uL + 1e-6:
+                raise ValueError(f"can't fit {tip_uL:g} μL in a {tip_volume_uL:g} μL tip")
+
+        elif action == 'dispense':
+            counts['dispenses'] += 1
+            tip_uL -= volume_uL
+            volumes[labware, well] += volume_uL
+            if tip_uL < -1e-6:
+                raise ValueError(f"can't dispense {volume_uL:g} μL from a tip with {tip_uL + volume_uL:g} μL")
+
+        elif action == 'mix':
+            counts['mixes'] += 1
+
+        else:
+            raise ValueError(f"unknown action: '{action}'")
+
+    seconds = \
+            counts['tips'] * timings['tip_s'] + \
+            counts['aspirates'] * timings['aspirate_s'] + \
+            counts['dispenses'] * timings['dispense_s'] + \
+            counts['mixes'] * timings['mix_s'] + \
+            distance_mm / timings['speed_mm_s']
+
+    return {
+            'tips': counts['tips'],
+            'aspirates': counts['aspirates'],
+            'dispenses': counts['dispenses'],
+            'mixes': counts['mixes'],
+            'moves': counts['moves'],
+            'distance_mm': distance_mm,
+            'seconds': seconds,
+            'volumes': dict(volumes),
+    }
+
+def write_worklist(f, worklist):
+    """
+    Write the given worklist to the given file object, as CSV.
+    """
+    import csv
+
+    writer = csv.writer(f)
+    writer.writerow(['action', 'labware', 'well', 'volume_uL'])
+
+    for action, labware, well, volume_uL in worklist:
+        writer.writerow([
+            action, labware or '', well or '',
+            '' if volume_uL is None else f'{volume_uL:.2f}',
+        ])
+
+def test_reaction_transfers():
+    from pytest import approx, raises
+
+    table = [
+        {'reagent': 'water', 'volume': 5.0, 'volume_unit': 'µL', 'master_mix': 55.0},
+        {'reagent': 'buffer', 'volume': 1.0, 'volume_unit': 'μL', 'master_mix': 11.0},
+        {'reagent': 'dna', 'volume': 500.0, 'volume_unit': 'nL', 'master_mix': None},
+    ]
+    transfers = reaction_transfers(table, 10)
+
+    assert transfers[0] == Transfer('reagents', 'A1', 'reagents', 'A4', 55.0)
+    assert transfers[1] == Transfer('reagents', 'A2', 'reagents', 'A4', 11.0)
+    assert transfers[2] == Transfer('reagents', 'A4', 'plate', 'A1', 6.0)
+    assert transfers[3] == Transfer('reagents', 'A3', 'plate', 'A1', 0.5)
+    assert len(transfers) == 2 + 2 * 10
+
+    assert well_names(98)[-3:] == [('plate', 'H12'), ('plate 2', 'A1'), ('plate 2', 'A2')]
+
+    with raises(ValueError, match='48'):
+        well_names(1, plate=48)
+
+    # Plates are visited in numeric order.
+    transfers = [
+            Transfer('reagents', 'A1', dest, 'A1', 1)
+            for dest in ['plate 10', 'plate 2', 'plate']
+    ]
+    dests = [x.dest for x in sorted(transfers, key=serpentine_order)]
+    assert dests == ['plate', 'plate 2', 'plate 10']
+
+def test_plan_worklist():
+    import golden_gate, wetlab_server
+    from pytest import approx
+
+    frags = golden_gate.fragments_from_strs(['bb:50:3000', 'ins:20:500'])
+    reaction = golden_gate.make_reaction(frags, num_reactions=384)
+    table = wetlab_server.reaction_table(reaction)
+    transfers = reaction_transfers(table, 384, plate=384)
+
+    naive = simulate(naive_worklist(transfers), float('inf'), 384)
+    planned = simulate(plan_worklist(transfers), 200, 384)
+
+    # Both worklists put the same volumes in the same wells.
+    assert planned['volumes'].keys() == naive['volumes'].keys()
+    for key, volume_uL in naive['volumes'].items():
+        assert planned['volumes'][key] == approx(volume_uL), key
+
+    # One tip for each source, rather than one for each transfer.
+    assert naive['tips'] == len(transfers)
+    assert planned['tips'] == len(table) + 1
+    assert planned['moves'] < naive['moves'] / 2
+    assert planned['seconds'] < naive['seconds'] / 4
+
+def test_plan_worklist_dilutions():
+    import serial_dilution
+    from pytest import approx, raises
+
+    conc, initial_volume, transfer = serial_dilution.plan_plate(
+            20, [100, 100, 10], [1, 10, 1], [5, 3, 4])
+    transfers = dilution_transfers(20, initial_volume, transfer, conc)
+    worklist = plan_worklist(transfers)
+    result = simulate(worklist)
+
+    # One tip for the diluent, one for each material, and one for each
+    # transfer between wells.
+    assert result['tips'] == 1 + 3 + (4 + 2 + 3)
+    assert result['mixes'] == 4 + 2 + 3
+
+    # Every well ends up with the given volume, except the last in each
+    # series.
+    assert result['volumes']['plate', 'A1'] == approx(20)
+    assert result['volumes']['plate', 'A4'] == approx(20)
+    assert result['volumes']['plate', 'A5'] == approx(20 + transfer[0])
+    assert result['volumes']['plate', 'B3'] == approx(20 + transfer[1])
+
+    # The diluent is dispensed before any transfers between wells.
+    first_mix = next(i for i, x in enumerate(worklist) if x[0] == 'mix')
+    last_diluent = max(i for i, x in enumerate(worklist) if x[1:3] == ('reagents', 'A1'))
+    assert last_diluent < first_mix
+
+    with raises(ValueError):
+        simulate([('tip', None, None, None), ('aspirate', 'reagents', 'A1', 300)])
+
+def test_plan_worklist_big_transfers():
+    import serial_dilution
+    from pytest import approx
+
+    # Both the diluent and the transfers between wells need several tips' 
+    # worth of liquid.
+    conc, initial_volume, transfer = serial_dilution.plan_plate(250, 100, 50, 3)
+    transfers = dilution_transfers(250, initial_volume, transfer, conc)
+    assert transfer[0] > 200
+
+    worklist = plan_worklist(transfers, 200)
+    result = simulate(worklist, 200)
+    naive = simulate(naive_worklist(transfers), float('inf'))
+
+    for key, volume_uL in naive['volumes'].items():
+        assert result['volumes'][key] == approx(volume_uL), key
+
+    assert result['mixes'] == 2
+    assert all(x[3] <= 200 for x in worklist if x[0] != 'tip')
+
+
+def main(argv=None):
+    import sys
+    import docopt
+
+    args = docopt.docopt(__doc__, argv=argv)
+
+    try:
+        plate = int(args['--plate'])
+        plate_shape(plate)
+        tip_volume_uL = float(args['--tip-volume'])
+
+        if args['reaction']:
+            import json
+            from wetlab_server import handle_request
+
+            path = args['<request>']
+            with (sys.stdin if path == '-' else open(path)) as f:
+                request = json.load(f)
+
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            if 'args' in request:
+                raise ValueError("the request must have \"params\", not \"args\"")
+
+            num_reactions = int(args['--wells']) if args['--wells'] else \
+                    request.get('params', {}).get('num_reactions', 1)
+            params = request.setdefault('params', {})
+            params['num_reactions'] = num_reactions
+            request['format'] = 'table'
+
+            response = handle_request(request)
+            if 'error' in response:
+                raise ValueError(response['error'])
+
+            transfers = reaction_transfers(
+                    response['table'], num_reactions, plate)
+
+        else:
+            import numpy as np
+            from serial_dilution import plan_plate
+
+            def parse_list(arg):
+                return np.array(eval(f'[{arg}]'), dtype=float)
+
+            volume = eval(args['<volume>'])
+            conc, initial_volume, transfer = plan_plate(
+                    volume=volume,
+                    high=parse_list(args['<high>']),
+                    low=parse_list(args['<low>']),
+                    steps=parse_list(args['<steps>']),
+                    num_series=args['--num-series'] and int(args['--num-series']),
+                    plate=plate,
+                    by_column=args['--by-column'],
+            )
+            transfers = dilution_transfers(
+                    volume, initial_volume, transfer, conc,
+                    by_column=args['--by-column'])
+
+    except ValueError as err:
+        raise SystemExit(f"Error: {err}")
+
+    naive = naive_worklist(transfers)
+    worklist = naive if args['--naive'] else \
+            plan_worklist(transfers, tip_volume_uL)
+
+    if args['--output']:
+        with open(args['--output'], 'w', newline='') as f:
+            write_worklist(f, worklist)
+    else:
+        write_worklist(sys.stdout, worklist)
+
+    if args['--simulate']:
+        from tabulate import tabulate
+
+        rows = []
+        results = [
+                simulate(worklist, tip_volume_uL, plate),
+                simulate(naive, float('inf'), plate),
+        ]
+        for key in ['tips', 'aspirates', 'dispenses', 'mixes', 'moves']:
+            rows.append([key, *(str(x[key]) for x in results)])
+        rows.append(['distance (m)', *(f"{x['distance_mm'] / 1e3:.1f}" for x in results)])
+        rows.append(['time (min)', *(f"{x['seconds'] / 60:.1f}" for x in results)])
+
+        print(tabulate(
+            rows,
+            headers=['', 'worklist', 'naive'],
+            colalign=['left', 'right', 'right'],
+            disable_numparse=True,
+        ), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()